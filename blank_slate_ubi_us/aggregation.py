@@ -0,0 +1,262 @@
+"""
+Weighted aggregation over integer group codes using np.bincount.
+"""
+
+from typing import Dict, Union
+import weakref
+import numpy as np
+import pandas as pd
+
+Columns = Union[np.ndarray, Dict[str, np.ndarray]]
+
+
+def quantile_rank(
+    values: np.ndarray, weights: np.ndarray = None, n: int = 10
+) -> np.ndarray:
+    """Weighted quantile group of each observation, from 1 to n, matching
+    MicroSeries.decile_rank (n=10) and percentile_rank (n=100).
+
+    :param values: Values to rank.
+    :type values: np.ndarray
+    :param weights: Weight of each observation, defaults to equal weights.
+    :type weights: np.ndarray, optional
+    :param n: Number of quantile groups, defaults to 10.
+    :type n: int
+    :return: Quantile group of each observation.
+    :rtype: np.ndarray
+    """
+    values = np.asarray(values)
+    if weights is None:
+        weights = np.ones(len(values))
+    weights = np.asarray(weights, dtype=float)
+    order = np.argsort(values, kind="stable")
+    rank = np.empty(len(values))
+    rank[order] = np.cumsum(weights[order]) / weights.sum()
+    return np.clip(np.ceil(rank * n), 1, n).astype(int)
+
+
+class GroupAggregator:
+    """Weighted sums, counts and means of many columns by group.
+
+    All requested columns are summed in a single np.bincount over
+    (group, column) cells, so the cost is one pass over the microdata
+    regardless of how many statistics a chart needs.
+
+    :param codes: Integer group code of each observation, from 0.
+    :type codes: np.ndarray
+    :param weights: Weight of each observation, defaults to equal weights.
+    :type weights: np.ndarray, optional
+    :param labels: Label of each group code, defaults to the codes.
+    :type labels: np.ndarray, optional
+    """
+
+    def __init__(
+        self,
+        codes: np.ndarray,
+        weights: np.ndarray = None,
+        labels: np.ndarray = None,
+    ):
+        self.codes = np.asarray(codes).astype(np.int64)
+        if weights is None:
+            weights = np.ones(len(self.codes))
+        self.weights = np.asarray(weights, dtype=float)
+        if labels is None:
+            labels = np.arange(self.codes.max() + 1 if len(self.codes) else 0)
+        self.labels = np.asarray(labels)
+        self._count = None
+
+    @classmethod
+    def from_values(
+        cls, values: np.ndarray, weights: np.ndarray = None
+    ) -> "GroupAggregator":
+        """Groups observations by their distinct values, e.g. state codes.
+
+        :param values: Group value of each observation.
+        :type values: np.ndarray
+        :param weights: Weight of each observation.
+        :type weights: np.ndarray, optional
+        :return: Aggregator with one group per distinct value.
+        :rtype: GroupAggregator
+        """
+        labels, codes = np.unique(np.asarray(values), return_inverse=True)
+        return cls(codes, weights, labels)
+
+    def _sum_matrix(self, matrix: np.ndarray) -> np.ndarray:
+        n_groups, n_columns = len(self.labels), matrix.shape[1]
+        cells = self.codes[:, None] * n_columns + np.arange(n_columns)
+        return np.bincount(
+            cells.ravel(),
+            weights=(matrix * self.weights[:, None]).ravel(),
+            minlength=n_groups * n_columns,
+        ).reshape(n_groups, n_columns)
+
+    def sum(self, columns: Columns) -> Union[pd.Series, pd.DataFrame]:
+        """Weighted sum of each column by group.
+
+        :param columns: One array, or a dict of named arrays.
+        :type columns: Union[np.ndarray, Dict[str, np.ndarray]]
+        :return: Series for one array, otherwise a DataFrame with one column
+            per named array, indexed by group label.
+        :rtype: Union[pd.Series, pd.DataFrame]
+        """
+        if isinstance(columns, dict):
+            matrix = np.column_stack(
+                [np.asarray(v, dtype=float) for v in columns.values()]
+            )
+            return pd.DataFrame(
+                self._sum_matrix(matrix),
+                index=self.labels,
+                columns=list(columns),
+            )
+        matrix = np.asarray(columns, dtype=float)[:, None]
+        return pd.Series(self._sum_matrix(matrix)[:, 0], index=self.labels)
+
+    def count(self) -> pd.Series:
+        """Weighted count of each group.
+
+        :return: Total weight by group label.
+        :rtype: pd.Series
+        """
+        if self._count is None:
+            self._count = np.bincount(
+                self.codes, weights=self.weights, minlength=len(self.labels)
+            )
+        return pd.Series(self._count, index=self.labels)
+
+    def mean(self, columns: Columns) -> Union[pd.Series, pd.DataFrame]:
+        """Weighted mean of each column by group. For boolean columns this
+        is the share of each group with the flag set.
+
+        :param columns: One array, or a dict of named arrays.
+        :type columns: Union[np.ndarray, Dict[str, np.ndarray]]
+        :return: Weighted means, shaped as for ``sum``.
+        :rtype: Union[pd.Series, pd.DataFrame]
+        """
+        return self.sum(columns).div(self.count(), axis=0)
+
+    def aggregate(self, columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """Weighted count, and the sum and mean of each column, by group.
+
+        :param columns: Named arrays to aggregate.
+        :type columns: Dict[str, np.ndarray]
+        :return: DataFrame with a "count" column and "<name>_sum" and
+            "<name>_mean" columns, indexed by group label.
+        :rtype: pd.DataFrame
+        """
+        sums = self.sum(columns)
+        count = self.count()
+        result = pd.DataFrame(dict(count=count))
+        for name in sums.columns:
+            result[name + "_sum"] = sums[name]
+            result[name + "_mean"] = sums[name] / count
+        return result
+
+
+class StateIndex:
+    """Maps households and people to integer state codes.
+
+    The codes are built once per simulation from ``state_code`` and reused
+    for every quantity aggregated by state, including quantities from
+    reformed simulations over the same population.
+
+    :param simulation: Simulation to read states and weights from.
+    :type simulation: Microsimulation
+    """
+
+    def __init__(self, simulation):
+        household_state = simulation.calc("state_code")
+        household = GroupAggregator.from_values(
+            household_state.values, household_state.weights.values
+        )
+        person_codes = simulation.map_result(
+            household.codes, "household", "person"
+        )
+        person = GroupAggregator(
+            person_codes,
+            simulation.calc("person_weight").values,
+            household.labels,
+        )
+        self.states = household.labels
+        self.aggregators = dict(household=household, person=person)
+
+    def total(self, entity: str = "household") -> pd.Series:
+        """Total weight of each state.
+
+        :param entity: "household" or "person".
+        :type entity: str
+        :return: Weighted count by state.
+        :rtype: pd.Series
+        """
+        return self.aggregators[entity].count()
+
+    def sum(
+        self, values: Columns, entity: str = "household"
+    ) -> Union[pd.Series, pd.DataFrame]:
+        """Weighted sum of a quantity by state.
+
+        :param values: Values for each household or person, or a dict of
+            named arrays to sum together.
+        :type values: Union[np.ndarray, Dict[str, np.ndarray]]
+        :param entity: "household" or "person".
+        :type entity: str
+        :return: Weighted sum by state.
+        :rtype: Union[pd.Series, pd.DataFrame]
+        """
+        return self.aggregators[entity].sum(values)
+
+    def mean(
+        self, values: Columns, entity: str = "household"
+    ) -> Union[pd.Series, pd.DataFrame]:
+        """Weighted mean of a quantity by state. For boolean values this is
+        the share of the state's households or people with the flag set.
+
+        :param values: Values for each household or person, or a dict of
+            named arrays.
+        :type values: Union[np.ndarray, Dict[str, np.ndarray]]
+        :param entity: "household" or "person".
+        :type entity: str
+        :return: Weighted mean by state.
+        :rtype: Union[pd.Series, pd.DataFrame]
+        """
+        return self.aggregators[entity].mean(values)
+
+    rate = mean
+
+    def ratio(
+        self,
+        numerator: np.ndarray,
+        denominator: np.ndarray,
+        entity: str = "household",
+    ) -> pd.Series:
+        """Ratio of two weighted sums by state, e.g. aggregate gain over
+        aggregate income.
+
+        :param numerator: Numerator values for each household or person.
+        :type numerator: np.ndarray
+        :param denominator: Denominator values for each household or person.
+        :type denominator: np.ndarray
+        :param entity: "household" or "person".
+        :type entity: str
+        :return: Ratio of weighted sums by state.
+        :rtype: pd.Series
+        """
+        sums = self.sum(
+            dict(numerator=numerator, denominator=denominator), entity
+        )
+        return sums.numerator / sums.denominator
+
+
+_STATE_INDICES: Dict = weakref.WeakKeyDictionary()
+
+
+def state_index(simulation) -> StateIndex:
+    """Returns the state index for a simulation, building it on first use.
+
+    :param simulation: Simulation to index.
+    :type simulation: Microsimulation
+    :return: State index shared by every caller with the same simulation.
+    :rtype: StateIndex
+    """
+    if simulation not in _STATE_INDICES:
+        _STATE_INDICES[simulation] = StateIndex(simulation)
+    return _STATE_INDICES[simulation]
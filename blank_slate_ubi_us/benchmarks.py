@@ -0,0 +1,278 @@
+"""
+Benchmarks of the solver, metric and chart data code on synthetic
+microdata, with timing and peak-memory reports and regression checks
+against a saved baseline.
+
+    results = run_benchmarks(n_units=100_000)
+    save_baseline(results, "benchmarks.json")
+    ...
+    check_regressions(run_benchmarks(100_000), "benchmarks.json")
+"""
+
+from typing import Callable, Dict, Iterable
+import json
+import time
+import tracemalloc
+import pandas as pd
+from blank_slate_ubi_us.aggregation import (
+    GroupAggregator,
+    quantile_rank,
+    state_index,
+)
+from blank_slate_ubi_us.inequality import IncomeDistribution
+from blank_slate_ubi_us.policy import BlankSlatePolicy, create_funding_reform
+from blank_slate_ubi_us.poverty import poverty_by_age
+from blank_slate_ubi_us.sweep import run_sweep
+from blank_slate_ubi_us.synthetic import SyntheticMicrodata
+
+AMOUNTS = (3_000, 5_000, 8_000, 10_000)
+
+# A benchmark is slower than its baseline when it takes longer than this
+# multiple of the baseline time.
+DEFAULT_TOLERANCE = 1.25
+
+
+class BenchmarkContext:
+    """Synthetic data, a policy and a reformed simulation, built once and
+    shared by every benchmark.
+
+    :param n_units: Number of synthetic SPM units.
+    :type n_units: int
+    :param seed: Random seed, defaults to 0.
+    :type seed: int
+    """
+
+    def __init__(self, n_units: int, seed: int = 0):
+        self.data = SyntheticMicrodata(n_units, seed)
+        self.policy = BlankSlatePolicy(0.4, simulation=self.data)
+        self.policy.solve(method="powell", maxiter=5)
+        self.baseline = self.policy.baseline
+        self.reformed = self.data(
+            create_funding_reform(0.4), self.policy.amounts()
+        )
+
+
+def _policy_init(context: BenchmarkContext) -> None:
+    BlankSlatePolicy(0.4, simulation=context.data)
+
+
+def _mean_percentage_loss(context: BenchmarkContext) -> None:
+    for _ in range(100):
+        context.policy.mean_percentage_loss(*AMOUNTS)
+
+
+def _chunked_mean_percentage_loss(context: BenchmarkContext) -> None:
+    from blank_slate_ubi_us.chunked import ArraySource, ChunkedPolicy
+
+    source = ArraySource(
+        {name: values.values for name, values in context.policy.df.items()},
+        chunk_size=max(len(context.policy.df) // 8, 1),
+    )
+    policy = ChunkedPolicy(source, 0.4)
+    for _ in range(10):
+        policy.mean_percentage_loss(*AMOUNTS)
+
+
+def _solve(context: BenchmarkContext) -> None:
+    context.policy.solve(maxiter=10, seed=0)
+
+
+def _poverty_by_age(context: BenchmarkContext) -> None:
+    poverty_by_age(context.baseline)
+    poverty_by_age(context.reformed)
+
+
+def _inequality(context: BenchmarkContext) -> None:
+    for simulation in (context.baseline, context.reformed):
+        IncomeDistribution.from_microseries(
+            simulation.calc("spm_unit_net_income", map_to="person")
+        ).summary()
+
+
+def _deciles(context: BenchmarkContext) -> None:
+    income = context.baseline.calc("spm_unit_oecd_equiv_net_income")
+    decile = quantile_rank(income.values, income.weights.values)
+    gain = (
+        context.reformed.calc("spm_unit_net_income").values
+        - context.baseline.calc("spm_unit_net_income").values
+    )
+    GroupAggregator(decile - 1, income.weights.values).aggregate(
+        dict(gain=gain, income=income.values)
+    )
+
+
+def _states(context: BenchmarkContext) -> None:
+    # Rebuild rather than reuse the cached index.
+    index = type(state_index(context.baseline))(context.baseline)
+    gain = (
+        context.reformed.calc("spm_unit_net_income").values
+        - context.baseline.calc("spm_unit_net_income").values
+    )
+    index.sum(gain)
+    index.rate(
+        context.reformed.calc("spm_unit_is_in_spm_poverty", map_to="person"),
+        "person",
+    )
+
+
+def _comparison(context: BenchmarkContext) -> None:
+    from blank_slate_ubi_us.charts.comparison import ReformComparison
+    from blank_slate_ubi_us.charts.config import USResultsConfig
+
+    comparison = ReformComparison(
+        context.baseline,
+        dict(
+            optimal=context.reformed.calc("spm_unit_net_income").values,
+            funded=context.policy.df.funded_net_income.values,
+        ),
+        USResultsConfig,
+    )
+    comparison.decile_data()
+    comparison.age_data()
+    comparison.intra_decile_data()
+    comparison.program_data()
+    comparison.state_data()
+
+
+def _charts(context: BenchmarkContext) -> None:
+    # Needs the PolicyEngine chart dependencies.
+    from blank_slate_ubi_us.charts.export import CHART_BUILDERS
+
+    for build in CHART_BUILDERS.values():
+        build(context.baseline, context.reformed)
+
+
+def _sweep(context: BenchmarkContext) -> None:
+    run_sweep(
+        [0.3, 0.4, 0.5],
+        metrics=False,
+        simulation=context.data,
+        method="powell",
+        maxiter=5,
+    )
+
+
+BENCHMARKS: Dict[str, Callable[[BenchmarkContext], None]] = dict(
+    policy_init=_policy_init,
+    mean_percentage_loss=_mean_percentage_loss,
+    chunked_mean_percentage_loss=_chunked_mean_percentage_loss,
+    solve=_solve,
+    poverty_by_age=_poverty_by_age,
+    inequality=_inequality,
+    deciles=_deciles,
+    states=_states,
+    comparison=_comparison,
+    charts=_charts,
+    sweep=_sweep,
+)
+
+
+def _measure(function: Callable, context: BenchmarkContext, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(context)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function(context)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def run_benchmarks(
+    n_units: int = 100_000,
+    repeat: int = 3,
+    names: Iterable[str] = None,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Times each benchmark on synthetic microdata.
+
+    :param n_units: Number of synthetic SPM units, defaults to 100,000.
+    :type n_units: int
+    :param repeat: Timed runs per benchmark, defaults to 3. The fastest
+        is reported.
+    :type repeat: int
+    :param names: Benchmarks to run, defaults to all.
+    :type names: Iterable[str], optional
+    :param seed: Random seed of the synthetic data, defaults to 0.
+    :type seed: int
+    :return: Seconds and peak traced memory of each benchmark, with the
+        reason for any that were skipped.
+    :rtype: pd.DataFrame
+    """
+    context = BenchmarkContext(n_units, seed)
+    rows = []
+    for name in names or BENCHMARKS:
+        row = dict(benchmark=name, n_units=n_units)
+        try:
+            seconds, peak = _measure(BENCHMARKS[name], context, repeat)
+            row.update(seconds=seconds, peak_memory_bytes=peak)
+        except ImportError as e:
+            row.update(skipped=f"missing dependency: {e.name}")
+        rows.append(row)
+        print(
+            f"{name}: "
+            + (
+                f"{row['seconds']:.3f}s, "
+                f"{row['peak_memory_bytes'] / 1e6:.1f}MB peak"
+                if "seconds" in row
+                else row["skipped"]
+            )
+        )
+    return pd.DataFrame(rows).set_index("benchmark")
+
+
+def save_baseline(results: pd.DataFrame, path: str) -> None:
+    """Saves benchmark results as the baseline for regression checks.
+
+    :param results: Output of ``run_benchmarks``.
+    :type results: pd.DataFrame
+    :param path: JSON file to write.
+    :type path: str
+    """
+    timed = results.dropna(subset=["seconds"])
+    baseline = dict(
+        n_units=int(timed.n_units.iloc[0]),
+        seconds=timed.seconds.to_dict(),
+        peak_memory_bytes=timed.peak_memory_bytes.astype(int).to_dict(),
+    )
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+
+
+def check_regressions(
+    results: pd.DataFrame, path: str, tolerance: float = DEFAULT_TOLERANCE
+) -> pd.DataFrame:
+    """Compares benchmark results with a saved baseline.
+
+    :param results: Output of ``run_benchmarks``, at the baseline's scale.
+    :type results: pd.DataFrame
+    :param path: JSON file written by ``save_baseline``.
+    :type path: str
+    :param tolerance: Largest allowed ratio to the baseline, for both time
+        and peak memory, defaults to 1.25.
+    :type tolerance: float
+    :return: Results with baseline values, ratios and a "regressed" flag.
+    :rtype: pd.DataFrame
+    """
+    with open(path) as f:
+        baseline = json.load(f)
+    if int(results.n_units.iloc[0]) != baseline["n_units"]:
+        raise ValueError(
+            f"Baseline was run with {baseline['n_units']} units, results "
+            f"with {int(results.n_units.iloc[0])}."
+        )
+    results = results.copy()
+    for metric in ("seconds", "peak_memory_bytes"):
+        results["baseline_" + metric] = pd.Series(baseline[metric])
+        results[metric + "_ratio"] = (
+            results[metric] / results["baseline_" + metric]
+        )
+    results["regressed"] = (
+        (results.seconds_ratio > tolerance)
+        | (results.peak_memory_bytes_ratio > tolerance)
+    ).fillna(False)
+    return results
@@ -0,0 +1,304 @@
+"""
+Compact storage for collections of chart JSON.
+
+Numeric arrays are stored as base64-encoded typed buffers using the
+``{"dtype", "bdata", "shape"}`` convention that plotly.js also reads, layout
+templates are stored once per bundle and referenced by hash, and the whole
+bundle can optionally be gzip-compressed.
+"""
+
+from typing import Any, Dict, Union
+import base64
+import gzip
+import hashlib
+import json
+import time
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Smallest lossless dtype is chosen in this order.
+INTEGER_DTYPES = ("i1", "i2", "i4")
+FLOAT_DTYPES = ("f4", "f8")
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _is_numeric_list(value: Any, min_length: int) -> bool:
+    return (
+        isinstance(value, list)
+        and len(value) >= min_length
+        and all(
+            isinstance(x, (int, float)) and not isinstance(x, bool)
+            for x in value
+        )
+    )
+
+
+def encode_array(values: Union[list, np.ndarray]) -> dict:
+    """Encodes a numeric array as a typed base64 buffer, using the smallest
+    dtype that represents every value exactly.
+
+    :param values: Numeric values.
+    :type values: Union[list, np.ndarray]
+    :return: Dict with dtype, bdata and (for 2D arrays) shape.
+    :rtype: dict
+    """
+    array = np.asarray(values)
+    candidates = (
+        INTEGER_DTYPES if np.issubdtype(array.dtype, np.integer) else ()
+    ) + FLOAT_DTYPES
+    for dtype in candidates:
+        cast = array.astype(dtype)
+        if np.array_equal(cast, array, equal_nan=True):
+            break
+    encoded = dict(
+        dtype=dtype,
+        bdata=base64.b64encode(cast.astype("<" + dtype).tobytes()).decode(),
+    )
+    if cast.ndim > 1:
+        encoded["shape"] = ",".join(map(str, cast.shape))
+    return encoded
+
+
+def decode_array(encoded: dict) -> np.ndarray:
+    """Decodes a typed base64 buffer produced by ``encode_array``.
+
+    :param encoded: Dict with dtype, bdata and optionally shape.
+    :type encoded: dict
+    :return: Decoded array.
+    :rtype: np.ndarray
+    """
+    array = np.frombuffer(
+        base64.b64decode(encoded["bdata"]), dtype="<" + encoded["dtype"]
+    )
+    if "shape" in encoded:
+        array = array.reshape(tuple(map(int, encoded["shape"].split(","))))
+    return array
+
+
+def _is_encoded_array(value: Any) -> bool:
+    return isinstance(value, dict) and set(value) in (
+        {"dtype", "bdata"},
+        {"dtype", "bdata", "shape"},
+    )
+
+
+def pack(value: Any, min_length: int = 8) -> Any:
+    """Recursively replaces numeric lists with typed base64 buffers.
+
+    :param value: Plotly JSON, or any part of it.
+    :type value: Any
+    :param min_length: Shortest list worth encoding, defaults to 8.
+    :type min_length: int
+    :return: Packed copy of the value.
+    :rtype: Any
+    """
+    if isinstance(value, dict):
+        return {k: pack(v, min_length) for k, v in value.items()}
+    if _is_numeric_list(value, min_length):
+        return encode_array(value)
+    if isinstance(value, np.ndarray) and np.issubdtype(value.dtype, np.number):
+        return encode_array(value)
+    if isinstance(value, list):
+        return [pack(v, min_length) for v in value]
+    return value
+
+
+def unpack(value: Any) -> Any:
+    """Reverses ``pack``, returning numpy arrays for typed buffers.
+
+    :param value: Packed Plotly JSON, or any part of it.
+    :type value: Any
+    :return: Unpacked copy of the value.
+    :rtype: Any
+    """
+    if _is_encoded_array(value):
+        return decode_array(value)
+    if isinstance(value, dict):
+        return {k: unpack(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [unpack(v) for v in value]
+    return value
+
+
+def _figure_json(figure: Union[dict, go.Figure]) -> dict:
+    if isinstance(figure, go.Figure):
+        return json.loads(figure.to_json())
+    return figure
+
+
+class ChartBundle:
+    """A named collection of charts with shared layout templates.
+
+    :param figures: Chart name to Plotly JSON or figure.
+    :type figures: Dict[str, Union[dict, go.Figure]], optional
+    """
+
+    def __init__(self, figures: Dict[str, Union[dict, go.Figure]] = None):
+        self.figures = {}
+        self.templates = {}
+        for name, figure in (figures or {}).items():
+            self.add(name, figure)
+
+    def add(self, name: str, figure: Union[dict, go.Figure]) -> None:
+        """Packs a chart into the bundle.
+
+        :param name: Chart name.
+        :type name: str
+        :param figure: Plotly JSON (e.g. from ``formatted_fig_json``) or
+            figure.
+        :type figure: Union[dict, go.Figure]
+        """
+        figure = _figure_json(figure)
+        layout = dict(figure.get("layout", {}))
+        if "template" in layout:
+            template = json.dumps(layout["template"], sort_keys=True)
+            key = hashlib.sha1(template.encode()).hexdigest()[:12]
+            self.templates.setdefault(key, layout["template"])
+            layout["template"] = {"$ref": key}
+        self.figures[name] = pack(dict(figure, layout=layout))
+
+    def to_json(self, name: str) -> dict:
+        """Rebuilds the full Plotly JSON of a chart.
+
+        :param name: Chart name.
+        :type name: str
+        :return: Plotly JSON with numpy arrays in place of typed buffers.
+        :rtype: dict
+        """
+        figure = unpack(self.figures[name])
+        layout = figure.get("layout", {})
+        template = layout.get("template")
+        if isinstance(template, dict) and "$ref" in template:
+            layout["template"] = self.templates[template["$ref"]]
+        return figure
+
+    def to_figure(self, name: str) -> go.Figure:
+        """Rebuilds a chart as a Plotly figure.
+
+        :param name: Chart name.
+        :type name: str
+        :return: Plotly figure.
+        :rtype: go.Figure
+        """
+        figure = self.to_json(name)
+        return go.Figure(
+            data=figure["data"],
+            layout=figure.get("layout"),
+            frames=figure.get("frames"),
+        )
+
+    def dumps(self, compress: bool = True) -> bytes:
+        """Serializes the bundle.
+
+        :param compress: Whether to gzip the output, defaults to True.
+        :type compress: bool
+        :return: Serialized bundle.
+        :rtype: bytes
+        """
+        body = json.dumps(
+            dict(templates=self.templates, figures=self.figures),
+            separators=(",", ":"),
+        ).encode()
+        return gzip.compress(body) if compress else body
+
+    @classmethod
+    def loads(cls, data: bytes) -> "ChartBundle":
+        """Deserializes a bundle written by ``dumps``, compressed or not.
+
+        :param data: Serialized bundle.
+        :type data: bytes
+        :return: Chart bundle.
+        :rtype: ChartBundle
+        """
+        if data[:2] == GZIP_MAGIC:
+            data = gzip.decompress(data)
+        content = json.loads(data)
+        bundle = cls()
+        bundle.templates = content["templates"]
+        bundle.figures = content["figures"]
+        return bundle
+
+    def save(self, path: str, compress: bool = True) -> None:
+        """Writes the bundle to a file.
+
+        :param path: Output path.
+        :type path: str
+        :param compress: Whether to gzip the output, defaults to True.
+        :type compress: bool
+        """
+        with open(path, "wb") as f:
+            f.write(self.dumps(compress))
+
+    @classmethod
+    def load(cls, path: str) -> "ChartBundle":
+        """Reads a bundle from a file.
+
+        :param path: Input path.
+        :type path: str
+        :return: Chart bundle.
+        :rtype: ChartBundle
+        """
+        with open(path, "rb") as f:
+            return cls.loads(f.read())
+
+
+def benchmark_serialization(
+    figures: Dict[str, Union[dict, go.Figure]], repeat: int = 3
+) -> pd.DataFrame:
+    """Compares payload size and round-trip time of plain Plotly JSON
+    against chart bundles.
+
+    :param figures: Chart name to Plotly JSON or figure.
+    :type figures: Dict[str, Union[dict, go.Figure]]
+    :param repeat: Number of timed round trips, defaults to 3.
+    :type repeat: int
+    :return: One row per format with bytes, relative size and mean write
+        and read (to ``go.Figure``) seconds.
+    :rtype: pd.DataFrame
+    """
+    figures = {name: _figure_json(fig) for name, fig in figures.items()}
+
+    def plain_write():
+        return json.dumps(figures).encode()
+
+    def plain_read(data):
+        return [
+            go.Figure(data=fig["data"], layout=fig["layout"])
+            for fig in json.loads(data).values()
+        ]
+
+    def bundle_write(compress):
+        return lambda: ChartBundle(figures).dumps(compress)
+
+    def bundle_read(data):
+        bundle = ChartBundle.loads(data)
+        return [bundle.to_figure(name) for name in bundle.figures]
+
+    formats = dict(
+        json=(plain_write, plain_read),
+        bundle=(bundle_write(False), bundle_read),
+        bundle_gzip=(bundle_write(True), bundle_read),
+    )
+    rows = []
+    for name, (write, read) in formats.items():
+        write_times, read_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = write()
+            write_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            read(data)
+            read_times.append(time.perf_counter() - start)
+        rows.append(
+            dict(
+                format=name,
+                bytes=len(data),
+                write_seconds=np.mean(write_times),
+                read_seconds=np.mean(read_times),
+            )
+        )
+    result = pd.DataFrame(rows).set_index("format")
+    result["relative_size"] = result.bytes / result.bytes["json"]
+    return result
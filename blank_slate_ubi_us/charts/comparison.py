@@ -0,0 +1,433 @@
+"""
+Chart data for many reforms compared against one baseline.
+
+Baseline-side quantities (deciles, ages, program participation and state
+codes) are computed once, and every reform is evaluated as a column of a
+gain matrix, so a ten-reform comparison costs little more than one.
+"""
+
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from blank_slate_ubi_us.aggregation import (
+    GroupAggregator,
+    quantile_rank,
+    state_index,
+)
+from blank_slate_ubi_us.charts.policyengine.utils import (
+    DARK_GRAY,
+    DARK_GREEN,
+    GRAY,
+    LIGHT_GRAY,
+    LIGHT_GREEN,
+    add_zero_line,
+    formatted_fig_json,
+)
+
+PROGRAMS = dict(
+    ssi="SSI",
+    snap="SNAP",
+    wic="WIC",
+    tanf="TANF",
+    spm_unit_capped_housing_subsidy="Housing subsidies",
+)
+
+OUTCOMES = (
+    "Gain more than 5%",
+    "Gain less than 5%",
+    "No change",
+    "Lose less than 5%",
+    "Lose more than 5%",
+)
+
+# Upper bounds of the relative change bands, from "Lose more than 5%" up.
+OUTCOME_BOUNDS = (-0.05, -1e-3, 1e-3, 0.05)
+
+OUTCOME_COLORS = (DARK_GREEN, LIGHT_GREEN, LIGHT_GRAY, GRAY, DARK_GRAY)
+
+
+class ReformComparison:
+    """Baseline-side chart inputs, shared by any number of reforms.
+
+    :param baseline: Baseline microsimulation.
+    :type baseline: Microsimulation
+    :param reformed_net_incomes: Reform label to the net income of each
+        household entity (SPM unit) under that reform, e.g. from
+        ``BlankSlatePolicy.net_income``.
+    :type reformed_net_incomes: Dict[str, np.ndarray]
+    :param config: The country metadata.
+    :type config: Type
+    :param programs: Program variable to display name, for participation
+        breakdowns.
+    :type programs: Dict[str, str]
+    """
+
+    def __init__(
+        self,
+        baseline,
+        reformed_net_incomes: Dict[str, np.ndarray],
+        config,
+        programs: Dict[str, str] = PROGRAMS,
+    ):
+        entity = config.household_entity
+        baseline_income = baseline.calc(config.household_net_income_variable)
+        self.reforms = [str(label) for label in reformed_net_incomes]
+        self.weight = baseline_income.weights.values
+        self.baseline_income = baseline_income.values.astype(float)
+        self.reformed_income = np.column_stack(
+            [
+                np.asarray(income, dtype=float)
+                for income in reformed_net_incomes.values()
+            ]
+        )
+        self.gain = self.reformed_income - self.baseline_income[:, None]
+        # Household-level deciles with each decile holding the same number
+        # of people.
+        self.size = baseline.calc("people", map_to=entity).values
+        equiv_income = baseline.calc(
+            config.equiv_household_net_income_variable
+        )
+        self.decile = quantile_rank(
+            equiv_income.values, equiv_income.weights.values * self.size
+        )
+        # Person-level pieces.
+        self.person_unit = np.asarray(
+            baseline.map_result(np.arange(len(self.weight)), entity, "person")
+        ).astype(np.int64)
+        age = baseline.calc("age")
+        self.age = age.values
+        self.person_weight = age.weights.values
+        self.person_decile = quantile_rank(
+            baseline.calc(
+                config.equiv_household_net_income_variable, map_to="person"
+            ).values,
+            self.person_weight,
+        )
+        self.programs = {
+            name: np.asarray(
+                baseline.map_result(
+                    baseline.calc(program, map_to="household").values,
+                    "household",
+                    "person",
+                )
+            )
+            > 0
+            for program, name in programs.items()
+        }
+        self.state = state_index(baseline)
+        self._outcomes = None
+
+    def _columns(self, matrix: np.ndarray) -> Dict[str, np.ndarray]:
+        return dict(zip(self.reforms, matrix.T))
+
+    def _person_outcomes(self) -> np.ndarray:
+        if self._outcomes is None:
+            self._outcomes = self._compute_person_outcomes()
+        return self._outcomes
+
+    def _compute_person_outcomes(self) -> np.ndarray:
+        person_gain = self.gain[self.person_unit]
+        baseline_income = self.baseline_income[self.person_unit]
+        rel_gain = person_gain / np.maximum(baseline_income, 1)[:, None]
+        # Index into OUTCOMES, from "Gain more than 5%" down.
+        return (
+            len(OUTCOMES)
+            - 1
+            - np.digitize(rel_gain, OUTCOME_BOUNDS, right=True)
+        )
+
+    def decile_data(self) -> pd.DataFrame:
+        """Relative and average change in net income by income decile.
+
+        :return: Long DataFrame with columns reform, Decile, Relative change
+            and Average change.
+        :rtype: pd.DataFrame
+        """
+        aggregator = GroupAggregator(
+            self.decile - 1, self.weight, labels=np.arange(1, 11)
+        )
+        sums = aggregator.sum(
+            dict(self._columns(self.gain), __baseline__=self.baseline_income)
+        )
+        baseline_income = sums.pop("__baseline__")
+        relative = sums.div(baseline_income, axis=0)
+        average = sums.div(aggregator.count(), axis=0)
+        return pd.DataFrame(
+            {
+                "reform": np.repeat(self.reforms, 10),
+                "Decile": np.tile(np.arange(1, 11), len(self.reforms)),
+                "Relative change": relative.values.T.ravel(),
+                "Average change": average.values.T.ravel(),
+            }
+        )
+
+    def age_data(self) -> pd.DataFrame:
+        """Average change in household net income by single year of age.
+
+        :return: Long DataFrame with columns reform, Age and Average
+            increase.
+        :rtype: pd.DataFrame
+        """
+        mean_gain = GroupAggregator.from_values(
+            self.age, self.person_weight
+        ).mean(self._columns(self.gain[self.person_unit]))
+        return (
+            mean_gain.rename_axis("Age")
+            .reset_index()
+            .melt("Age", var_name="reform", value_name="Average increase")
+        )
+
+    def _outcome_shares(
+        self, codes: np.ndarray, n_groups: int, mask: np.ndarray = None
+    ) -> np.ndarray:
+        # One bincount over (reform, group, outcome) cells.
+        outcomes = self._person_outcomes()
+        weight = self.person_weight
+        if mask is not None:
+            codes, outcomes, weight = codes[mask], outcomes[mask], weight[mask]
+        n_outcomes = len(OUTCOMES)
+        cells = (
+            np.arange(len(self.reforms)) * n_groups + codes[:, None]
+        ) * n_outcomes + outcomes
+        counts = np.bincount(
+            cells.ravel(),
+            weights=np.repeat(weight, len(self.reforms)),
+            minlength=len(self.reforms) * n_groups * n_outcomes,
+        ).reshape(len(self.reforms), n_groups, n_outcomes)
+        return counts / counts.sum(axis=2, keepdims=True)
+
+    def intra_decile_data(self) -> pd.DataFrame:
+        """Share of people in each decile, and overall, by outcome.
+
+        :return: Long DataFrame with columns reform, decile, outcome and
+            fraction.
+        :rtype: pd.DataFrame
+        """
+        shares = np.concatenate(
+            [
+                self._outcome_shares(np.zeros_like(self.person_decile), 1),
+                self._outcome_shares(self.person_decile - 1, 10),
+            ],
+            axis=1,
+        )
+        return self._outcome_frame(
+            shares, "decile", ["All"] + list(map(str, range(1, 11)))
+        )
+
+    def program_data(self) -> pd.DataFrame:
+        """Share of each program's baseline participants by outcome.
+
+        :return: Long DataFrame with columns reform, program, outcome and
+            fraction.
+        :rtype: pd.DataFrame
+        """
+        shares = np.concatenate(
+            [
+                self._outcome_shares(
+                    np.zeros(len(self.age), dtype=np.int64), 1, on_program
+                )
+                for on_program in self.programs.values()
+            ],
+            axis=1,
+        )
+        return self._outcome_frame(shares, "program", list(self.programs))
+
+    def _outcome_frame(
+        self, shares: np.ndarray, group_name: str, groups: List[str]
+    ) -> pd.DataFrame:
+        n_reforms, n_groups, n_outcomes = shares.shape
+        return pd.DataFrame(
+            {
+                "reform": np.repeat(self.reforms, n_groups * n_outcomes),
+                group_name: np.tile(np.repeat(groups, n_outcomes), n_reforms),
+                "outcome": np.tile(OUTCOMES, n_reforms * n_groups),
+                "fraction": shares.ravel(),
+            }
+        )
+
+    def state_data(self) -> pd.DataFrame:
+        """Aggregate and relative change in net income by state.
+
+        Each household entity's gain is split equally between its members
+        and summed by state with person weights.
+
+        :return: Long DataFrame with columns reform, State, Net gain and
+            Relative gain.
+        :rtype: pd.DataFrame
+        """
+        per_person = (self.gain / self.size[:, None])[self.person_unit]
+        sums = self.state.sum(
+            dict(
+                self._columns(per_person),
+                __baseline__=(self.baseline_income / self.size)[
+                    self.person_unit
+                ],
+            ),
+            "person",
+        )
+        baseline_income = sums.pop("__baseline__")
+        relative = sums.div(baseline_income, axis=0)
+        return pd.DataFrame(
+            {
+                "reform": np.repeat(self.reforms, len(sums)),
+                "State": np.tile(sums.index, len(self.reforms)),
+                "Net gain": sums.values.T.ravel(),
+                "Relative gain": relative.values.T.ravel(),
+            }
+        )
+
+
+def _facet_or_animate(animate: bool, n_reforms: int) -> dict:
+    if animate:
+        return dict(animation_frame="reform")
+    return dict(facet_col="reform", facet_col_wrap=min(n_reforms, 4))
+
+
+def decile_comparison_chart(
+    comparison: ReformComparison,
+    metric: str = "Relative change",
+    animate: bool = False,
+) -> dict:
+    """Change to net income by income decile for each reform.
+
+    :param comparison: Reforms to compare.
+    :type comparison: ReformComparison
+    :param metric: "Relative change" or "Average change".
+    :type metric: str
+    :param animate: Whether to animate across reforms instead of faceting.
+    :type animate: bool
+    :return: Plotly JSON.
+    :rtype: dict
+    """
+    df = comparison.decile_data()
+    fig = px.bar(
+        df,
+        x="Decile",
+        y=metric,
+        color=np.where(df[metric] > 0, "gain", "loss"),
+        color_discrete_map=dict(gain=DARK_GREEN, loss=GRAY),
+        **_facet_or_animate(animate, len(comparison.reforms)),
+    ).update_layout(
+        title="Change to net income by income decile",
+        yaxis_tickformat=",~%" if metric == "Relative change" else ",",
+        showlegend=False,
+    )
+    fig.update_xaxes(tickvals=list(range(1, 11)))
+    add_zero_line(fig)
+    return formatted_fig_json(fig)
+
+
+def age_comparison_chart(
+    comparison: ReformComparison, animate: bool = False
+) -> dict:
+    """Average net income increase by age for each reform.
+
+    :param comparison: Reforms to compare.
+    :type comparison: ReformComparison
+    :param animate: Whether to animate across reforms instead of faceting.
+    :type animate: bool
+    :return: Plotly JSON.
+    :rtype: dict
+    """
+    df = comparison.age_data()
+    fig = px.bar(
+        df,
+        x="Age",
+        y="Average increase",
+        color=np.where(df["Average increase"] > 0, "gain", "loss"),
+        color_discrete_map=dict(gain=DARK_GREEN, loss=GRAY),
+        **_facet_or_animate(animate, len(comparison.reforms)),
+    ).update_layout(
+        title="Average net income increase by age",
+        yaxis_tickformat=",.0f",
+        showlegend=False,
+    )
+    fig.update_xaxes(tickvals=list(range(0, 100, 10)))
+    add_zero_line(fig)
+    return formatted_fig_json(fig)
+
+
+def intra_decile_comparison_chart(
+    comparison: ReformComparison, animate: bool = False
+) -> dict:
+    """Distribution of gains and losses by income decile for each reform.
+
+    :param comparison: Reforms to compare.
+    :type comparison: ReformComparison
+    :param animate: Whether to animate across reforms instead of faceting.
+    :type animate: bool
+    :return: Plotly JSON.
+    :rtype: dict
+    """
+    fig = px.bar(
+        comparison.intra_decile_data(),
+        x="fraction",
+        y="decile",
+        color="outcome",
+        orientation="h",
+        color_discrete_sequence=OUTCOME_COLORS,
+        **_facet_or_animate(animate, len(comparison.reforms)),
+    ).update_layout(
+        barmode="stack",
+        title="Distribution of gains and losses by income decile",
+    )
+    fig.update_xaxes(tickformat=",.0%", title="Population share")
+    return formatted_fig_json(fig)
+
+
+def program_comparison_chart(
+    comparison: ReformComparison, animate: bool = False
+) -> dict:
+    """Distribution of gains and losses by program participation for each
+    reform.
+
+    :param comparison: Reforms to compare.
+    :type comparison: ReformComparison
+    :param animate: Whether to animate across reforms instead of faceting.
+    :type animate: bool
+    :return: Plotly JSON.
+    :rtype: dict
+    """
+    fig = px.bar(
+        comparison.program_data(),
+        x="fraction",
+        y="program",
+        color="outcome",
+        orientation="h",
+        color_discrete_sequence=OUTCOME_COLORS,
+        **_facet_or_animate(animate, len(comparison.reforms)),
+    ).update_layout(
+        barmode="stack",
+        title="Distribution of gains and losses by program participation",
+    )
+    fig.update_xaxes(tickformat=",.0%", title="Population share")
+    return formatted_fig_json(fig)
+
+
+def state_comparison_chart(
+    comparison: ReformComparison, animate: bool = True
+) -> dict:
+    """Relative change in net income by U.S. State for each reform.
+
+    :param comparison: Reforms to compare.
+    :type comparison: ReformComparison
+    :param animate: Whether to animate across reforms instead of faceting.
+    :type animate: bool
+    :return: Plotly JSON.
+    :rtype: dict
+    """
+    df = comparison.state_data()
+    fig = px.choropleth(
+        df,
+        locations="State",
+        color="Relative gain",
+        locationmode="USA-states",
+        scope="usa",
+        **_facet_or_animate(animate, len(comparison.reforms)),
+    ).update_layout(
+        title="Average gain by U.S. State",
+        coloraxis_colorbar_tickformat=".0%",
+        coloraxis_colorbar_title="",
+    )
+    return formatted_fig_json(fig)
@@ -0,0 +1,277 @@
+"""
+Batch export of the full chart set for many flat tax rates.
+
+Each rate is solved and charted in its own worker process and written as a
+ChartBundle to the output directory. An ``index.json`` manifest records the
+inputs behind every artifact, so re-running the export only rebuilds rates
+whose inputs changed. From the command line, run ``blank-slate report``.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List
+import hashlib
+import json
+import time
+from blank_slate_ubi_us.objectives import DEFAULT_OBJECTIVE, get_objective
+from blank_slate_ubi_us.policy import (
+    BlankSlatePolicy,
+    package_version,
+    solve_inputs,
+)
+from blank_slate_ubi_us.store import ResultStore
+from blank_slate_ubi_us.charts.artifacts import ChartBundle
+from blank_slate_ubi_us.charts.config import USResultsConfig
+from blank_slate_ubi_us.charts.policyengine import (
+    decile_chart,
+    inequality_chart,
+    intra_decile_chart,
+    poverty_chart,
+    waterfall_chart,
+)
+from blank_slate_ubi_us.charts.policyengine.age import age_chart
+from blank_slate_ubi_us.charts.age_winners import age_winner_chart
+from blank_slate_ubi_us.charts.program_winners import program_winner_chart
+from blank_slate_ubi_us.charts.state_analysis import get_state_rankings
+from blank_slate_ubi_us.charts.state_choropleth import us_state_choropleth
+from blank_slate_ubi_us.charts.state_poverty_choropleth import (
+    us_state_poverty_choropleth,
+)
+
+config = USResultsConfig
+
+CHART_BUILDERS = dict(
+    budget=lambda b, r: waterfall_chart(b, r, config),
+    inequality=lambda b, r: inequality_chart(b, r, config),
+    rel_income_decile=lambda b, r: decile_chart(b, r, config)[0],
+    avg_income_decile=lambda b, r: decile_chart(b, r, config)[1],
+    poverty=lambda b, r: poverty_chart(b, r, False, config),
+    deep_poverty=lambda b, r: poverty_chart(b, r, True, config),
+    intra_income_decile=lambda b, r: intra_decile_chart(b, r, config),
+    age=lambda b, r: age_chart(b, r, config),
+    age_winners=lambda b, r: age_winner_chart(b, r, config),
+    program_winners=lambda b, r: program_winner_chart(b, r, config),
+    state_rankings=get_state_rankings,
+    state_choropleth=us_state_choropleth,
+    state_poverty_choropleth=us_state_poverty_choropleth,
+)
+
+CHARTS = tuple(CHART_BUILDERS)
+
+MANIFEST = "index.json"
+
+
+def artifact_name(flat_tax_rate: float, year: int = None) -> str:
+    """File name of the chart bundle for a flat tax rate.
+
+    :param flat_tax_rate: Flat tax rate.
+    :type flat_tax_rate: float
+    :param year: Year, if not the default.
+    :type year: int, optional
+    :return: File name.
+    :rtype: str
+    """
+    prefix = "" if year is None else f"year_{year}_"
+    return f"{prefix}flat_tax_{flat_tax_rate:.4f}.json.gz"
+
+
+def input_key(
+    flat_tax_rate: float,
+    charts: Iterable[str],
+    solve_options: dict = None,
+    year: int = None,
+) -> str:
+    """Hash of everything an artifact depends on.
+
+    :param flat_tax_rate: Flat tax rate.
+    :type flat_tax_rate: float
+    :param charts: Names of the charts in the artifact.
+    :type charts: Iterable[str]
+    :param solve_options: Options passed to ``BlankSlatePolicy.solve``,
+        keyed as the solve inputs they resolve to.
+    :type solve_options: dict, optional
+    :param year: Year, if not the default.
+    :type year: int, optional
+    :return: Hex digest.
+    :rtype: str
+    """
+    options = dict(solve_options or {})
+    method = options.pop("method", "auto")
+    if method == "auto":
+        # Keyed on the method the solve resolves to, so an explicit choice
+        # and "auto" share artifacts when they run the same solver.
+        method = get_objective(
+            options.get("objective", DEFAULT_OBJECTIVE)
+        ).method()
+    inputs = dict(
+        flat_tax_rate=round(float(flat_tax_rate), 6),
+        charts=sorted(charts),
+        solve=solve_inputs(flat_tax_rate, method, year=year, **options),
+        package_version=package_version(),
+    )
+    if year is not None:
+        # Only keyed when given, so default-year keys are unchanged.
+        inputs["year"] = year
+    return hashlib.sha256(
+        json.dumps(inputs, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def build_chart_bundle(
+    flat_tax_rate: float,
+    charts: Iterable[str] = CHARTS,
+    solve_options: dict = None,
+    store: ResultStore = None,
+    year: int = None,
+) -> ChartBundle:
+    """Solves the blank slate policy at a flat tax rate and builds its charts.
+
+    :param flat_tax_rate: Flat tax rate.
+    :type flat_tax_rate: float
+    :param charts: Names of the charts to build, defaults to all.
+    :type charts: Iterable[str]
+    :param solve_options: Options passed to ``BlankSlatePolicy.solve``,
+        keyed as the solve inputs they resolve to.
+    :type solve_options: dict, optional
+    :param store: Result store to reuse the solved reform from.
+    :type store: ResultStore, optional
+    :param year: Year to chart, defaults to 2023 reforms at the
+        simulation's default period.
+    :type year: int, optional
+    :return: Bundle of the charts.
+    :rtype: ChartBundle
+    """
+    # Imported in the worker, whose rates share its baseline simulation.
+    from blank_slate_ubi_us.metrics_by_flat_tax import simulations
+
+    policy = BlankSlatePolicy(
+        flat_tax_rate=flat_tax_rate, simulation=simulations, year=year
+    )
+    reform = policy.solve(store=store, **(solve_options or {}))
+    reformed = policy.reformed_simulation(reform)
+    bundle = ChartBundle()
+    for name in charts:
+        bundle.add(name, CHART_BUILDERS[name](policy.baseline, reformed))
+    return bundle
+
+
+def _export_one(
+    flat_tax_rate: float,
+    charts: List[str],
+    output: str,
+    key: str,
+    solve_options: dict,
+    store: ResultStore,
+    year: int = None,
+) -> dict:
+    start = time.time()
+    bundle = build_chart_bundle(
+        flat_tax_rate, charts, solve_options, store, year
+    )
+    path = Path(output) / artifact_name(flat_tax_rate, year)
+    bundle.save(str(path))
+    return dict(
+        flat_tax_rate=flat_tax_rate,
+        year=year,
+        file=path.name,
+        input_key=key,
+        charts=list(charts),
+        bytes=path.stat().st_size,
+        seconds=time.time() - start,
+    )
+
+
+def read_manifest(output: str) -> Dict[str, dict]:
+    """Reads the manifest of an export directory.
+
+    :param output: Export directory.
+    :type output: str
+    :return: Artifact file name to its manifest entry.
+    :rtype: Dict[str, dict]
+    """
+    path = Path(output) / MANIFEST
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def _write_manifest(output: str, manifest: Dict[str, dict]) -> None:
+    path = Path(output) / MANIFEST
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    tmp.replace(path)
+
+
+def export_charts(
+    flat_tax_rates: Iterable[float],
+    output: str,
+    charts: Iterable[str] = CHARTS,
+    workers: int = None,
+    force: bool = False,
+    solve_options: dict = None,
+    store: ResultStore = None,
+    year: int = None,
+) -> Dict[str, dict]:
+    """Builds and writes chart bundles for many flat tax rates in parallel.
+
+    :param flat_tax_rates: Flat tax rates to export.
+    :type flat_tax_rates: Iterable[float]
+    :param output: Export directory, created if missing.
+    :type output: str
+    :param charts: Names of the charts to build, defaults to all.
+    :type charts: Iterable[str]
+    :param workers: Number of worker processes, defaults to the CPU count.
+    :type workers: int, optional
+    :param force: Whether to rebuild artifacts whose inputs are unchanged.
+    :type force: bool
+    :param solve_options: Options passed to ``BlankSlatePolicy.solve``,
+        keyed as the solve inputs they resolve to.
+    :type solve_options: dict, optional
+    :param store: Result store to reuse solved reforms from.
+    :type store: ResultStore, optional
+    :param year: Year to chart, defaults to 2023 reforms at the
+        simulation's default period.
+    :type year: int, optional
+    :return: The updated manifest.
+    :rtype: Dict[str, dict]
+    """
+    charts = list(charts)
+    Path(output).mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(output)
+    pending = {}
+    for rate in flat_tax_rates:
+        name = artifact_name(rate, year)
+        key = input_key(rate, charts, solve_options, year)
+        entry = manifest.get(name)
+        up_to_date = (
+            entry is not None
+            and entry["input_key"] == key
+            and (Path(output) / name).exists()
+        )
+        if force or not up_to_date:
+            pending[name] = (float(rate), key)
+    if not pending:
+        return manifest
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _export_one,
+                rate,
+                charts,
+                output,
+                key,
+                solve_options,
+                store,
+                year,
+            )
+            for rate, key in pending.values()
+        ]
+        for future in as_completed(futures):
+            entry = future.result()
+            manifest[entry["file"]] = entry
+            _write_manifest(output, manifest)
+            print(
+                f"Flat tax: {entry['flat_tax_rate']:.0%}, "
+                f"wrote {entry['file']} in {entry['seconds']:.0f}s"
+            )
+    return manifest
@@ -4,6 +4,7 @@ import numpy as np
 from openfisca_tools import Microsimulation
 import pandas as pd
 from .utils import *
+from blank_slate_ubi_us.aggregation import GroupAggregator
 
 
 def age_chart(
@@ -30,9 +31,11 @@ def age_chart(
         config.household_net_income_variable,
         map_to="person",
     )
-    age = baseline.calc("age")
+    age = baseline.calc("age").values
     gain = reform_household_net_income - baseline_household_net_income
-    gain_by_age = gain.groupby(age).sum() / gain.groupby(age).count()
+    gain_by_age = GroupAggregator.from_values(age, gain.weights.values).mean(
+        gain.values
+    )
     df = pd.DataFrame(
         {
             "Age": gain_by_age.index,
@@ -5,6 +5,7 @@ from openfisca_tools import Microsimulation
 import pandas as pd
 from policyengine.impact.utils import *
 from policyengine.country.results_config import PolicyEngineResultsConfig
+from blank_slate_ubi_us.aggregation import GroupAggregator, quantile_rank
 
 
 def individual_decile_chart(
@@ -73,24 +74,27 @@ def decile_chart(
     household_size = baseline.calc("people", map_to=config.household_entity)
     # Group households in decile such that each decile has the same
     # number of people
-    baseline_household_equiv_income.weights *= household_size
-    household_decile = baseline_household_equiv_income.decile_rank()
-    agg_gain_by_decile = household_gain.groupby(household_decile).sum()
-    households_by_decile = baseline_household_net_income.groupby(
-        household_decile
-    ).count()
-    baseline_agg_income_by_decile = baseline_household_net_income.groupby(
-        household_decile
-    ).sum()
-    reform_agg_income_by_decile = reform_household_net_income.groupby(
-        household_decile
-    ).sum()
-    baseline_mean_income_by_decile = (
-        baseline_agg_income_by_decile / households_by_decile
+    household_decile = quantile_rank(
+        baseline_household_equiv_income.values,
+        baseline_household_equiv_income.weights.values * household_size.values,
+        10,
     )
-    reform_mean_income_by_decile = (
-        reform_agg_income_by_decile / households_by_decile
+    by_decile = GroupAggregator(
+        household_decile - 1,
+        baseline_household_net_income.weights.values,
+        labels=np.arange(1, 11),
+    ).aggregate(
+        dict(
+            gain=household_gain.values,
+            baseline=baseline_household_net_income.values,
+            reform=reform_household_net_income.values,
+        )
     )
+    agg_gain_by_decile = by_decile.gain_sum
+    households_by_decile = by_decile["count"]
+    baseline_agg_income_by_decile = by_decile.baseline_sum
+    baseline_mean_income_by_decile = by_decile.baseline_mean
+    reform_mean_income_by_decile = by_decile.reform_mean
     # Total decile gain / total decile income.
     rel_agg_changes = (
         (agg_gain_by_decile / baseline_agg_income_by_decile)
@@ -4,6 +4,7 @@ import numpy as np
 from openfisca_tools import Microsimulation
 import pandas as pd
 from .utils import *
+from blank_slate_ubi_us.inequality import IncomeDistribution
 
 
 def inequality_chart(
@@ -11,35 +12,28 @@ def inequality_chart(
     reformed: Microsimulation,
     config: Type,
 ) -> dict:
-    equiv_income = baseline.calc(
-        config.equiv_household_net_income_variable, map_to="person"
+    baseline_distribution = IncomeDistribution.from_microseries(
+        baseline.calc(
+            config.equiv_household_net_income_variable, map_to="person"
+        )
     )
-    reform_equiv_income = reformed.calc(
-        config.equiv_household_net_income_variable, map_to="person"
+    reform_distribution = IncomeDistribution.from_microseries(
+        reformed.calc(
+            config.equiv_household_net_income_variable, map_to="person"
+        )
     )
-    print(equiv_income.describe())
-    baseline_gini = equiv_income.gini()
-    reform_gini = reform_equiv_income.gini()
+    baseline_metrics = baseline_distribution.summary()
+    reform_metrics = reform_distribution.summary()
+    baseline_gini = baseline_metrics["gini"]
+    reform_gini = reform_metrics["gini"]
     gini_change = reform_gini / baseline_gini - 1
-    baseline_top_ten_pct_share = (
-        equiv_income[equiv_income.decile_rank() == 10].sum()
-        / equiv_income.sum()
-    )
-    reform_top_ten_pct_share = (
-        reform_equiv_income[reform_equiv_income.decile_rank() == 10].sum()
-        / reform_equiv_income.sum()
-    )
+    baseline_top_ten_pct_share = baseline_metrics["top_ten_pct_share"]
+    reform_top_ten_pct_share = reform_metrics["top_ten_pct_share"]
     top_ten_pct_share_change = (
         reform_top_ten_pct_share / baseline_top_ten_pct_share - 1
     )
-    baseline_top_one_pct_share = (
-        equiv_income[equiv_income.percentile_rank() == 100].sum()
-        / equiv_income.sum()
-    )
-    reform_top_one_pct_share = (
-        reform_equiv_income[reform_equiv_income.percentile_rank() == 100].sum()
-        / reform_equiv_income.sum()
-    )
+    baseline_top_one_pct_share = baseline_metrics["top_one_pct_share"]
+    reform_top_one_pct_share = reform_metrics["top_one_pct_share"]
     top_one_pct_share_change = (
         reform_top_one_pct_share / baseline_top_one_pct_share - 1
     )
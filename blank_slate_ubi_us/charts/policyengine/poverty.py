@@ -1,4 +1,4 @@
-from typing import Tuple, Type
+from typing import Dict, Tuple, Type
 import plotly.express as px
 import numpy as np
 from openfisca_tools import Microsimulation
@@ -9,6 +9,7 @@ from policyengine.impact.population.metrics import (
     poverty_rate,
 )
 from policyengine.country.results_config import PolicyEngineResultsConfig
+from blank_slate_ubi_us.poverty import AGE_GROUPS, poverty_by_age
 
 
 def pov_chg(
@@ -62,6 +63,7 @@ def poverty_chart(
     reformed: Microsimulation,
     is_deep: bool,
     config: Type,
+    groups: Dict[str, Tuple[float, float]] = AGE_GROUPS,
 ) -> dict:
     """Chart of poverty impact by age group and overall.
 
@@ -69,6 +71,9 @@ def poverty_chart(
     :type baseline: Microsimulation
     :param reformed: Reform microsimulation.
     :type reformed: Microsimulation
+    :param groups: Group name to [lower, upper) age bounds, defaults to
+        children, working-age adults and seniors.
+    :type groups: Dict[str, Tuple[float, float]]
     :return: JSON representation of Plotly chart with poverty impact for:
         - Children (under 18)
         - Working age adults (18 to State Pension age)
@@ -77,43 +82,27 @@ def poverty_chart(
     :rtype: dict
     """
     if is_deep:
-        f_pov_chg = deep_pov_chg
-        f_poverty_rate = deep_poverty_rate
+        rate_column = "deep_poverty_rate"
         metric_name = "Deep poverty"
     else:
-        f_pov_chg = pov_chg
-        f_poverty_rate = poverty_rate
+        rate_column = "poverty_rate"
         metric_name = "Poverty"
+    baseline_rates, reformed_rates = [
+        poverty_by_age(
+            simulation,
+            groups,
+            in_poverty_variable=config.in_poverty_variable,
+            in_deep_poverty_variable=config.in_deep_poverty_variable,
+            net_income_variable=config.household_net_income_variable,
+        )[rate_column]
+        for simulation in (baseline, reformed)
+    ]
     df = pd.DataFrame(
         {
-            "group": ["Child", "Working-age", "Senior", "All"],
-            "pov_chg": [
-                f_pov_chg(baseline, reformed, i, config)
-                for i in [
-                    config.child_variable,
-                    config.working_age_variable,
-                    config.senior_variable,
-                    config.person_variable,
-                ]
-            ],
-            "baseline": [
-                f_poverty_rate(baseline, i, config)
-                for i in [
-                    config.child_variable,
-                    config.working_age_variable,
-                    config.senior_variable,
-                    config.person_variable,
-                ]
-            ],
-            "reformed": [
-                f_poverty_rate(reformed, i, config)
-                for i in [
-                    config.child_variable,
-                    config.working_age_variable,
-                    config.senior_variable,
-                    config.person_variable,
-                ]
-            ],
+            "group": baseline_rates.index,
+            "pov_chg": (reformed_rates / baseline_rates - 1).values,
+            "baseline": baseline_rates.values,
+            "reformed": reformed_rates.values,
         }
     )
     df["abs_chg_str"] = df.pov_chg.abs().map("{:.1%}".format)
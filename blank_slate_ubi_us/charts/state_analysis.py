@@ -2,14 +2,15 @@ import plotly.express as px
 import pandas as pd
 from ubicenter import format_fig
 from ubicenter.plotly import BLUE
+from blank_slate_ubi_us.aggregation import state_index
 
 
 def get_state_rankings(baseline, reformed):
-    gain = reformed.calc(
-        "spm_unit_net_income", map_to="household"
-    ) - baseline.calc("spm_unit_net_income", map_to="household")
-    state = baseline.calc("state_code")
-    gain_by_state = gain.groupby(state).sum().sort_values()
+    gain = (
+        reformed.calc("spm_unit_net_income", map_to="household").values
+        - baseline.calc("spm_unit_net_income", map_to="household").values
+    )
+    gain_by_state = state_index(baseline).sum(gain).sort_values()
     gain_by_state = pd.concat(
         [
             gain_by_state[:5],
@@ -1,18 +1,16 @@
 import plotly.express as px
 import pandas as pd
 from ubicenter import format_fig
+from blank_slate_ubi_us.aggregation import state_index
 
 
 def us_state_choropleth(baseline, reformed):
-    gain = reformed.calc(
-        "spm_unit_net_income", map_to="household"
-    ) - baseline.calc("spm_unit_net_income", map_to="household")
-    people = pd.Series(
-        baseline.calc("person_weight", map_to="household").values
+    income = baseline.calc("spm_unit_net_income", map_to="household").values
+    gain = (
+        reformed.calc("spm_unit_net_income", map_to="household").values
+        - income
     )
-    income = baseline.calc("spm_unit_net_income", map_to="household")
-    state = baseline.calc("state_code")
-    gain_by_state = gain.groupby(state).sum() / income.groupby(state).sum()
+    gain_by_state = state_index(baseline).ratio(gain, income)
     df = pd.DataFrame(
         {
             "State": gain_by_state.index,
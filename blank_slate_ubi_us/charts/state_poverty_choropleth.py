@@ -1,19 +1,18 @@
 import plotly.express as px
 import pandas as pd
 from ubicenter import format_fig
+from blank_slate_ubi_us.aggregation import state_index
 
 
 def us_state_poverty_choropleth(baseline, reformed):
-    state = baseline.calc("state_code", map_to="person")
-    baseline_poverty = (
-        baseline.calc("spm_unit_is_in_spm_poverty", map_to="person")
-        .groupby(state)
-        .mean()
+    index = state_index(baseline)
+    baseline_poverty = index.rate(
+        baseline.calc("spm_unit_is_in_spm_poverty", map_to="person").values,
+        "person",
     )
-    reform_poverty = (
-        reformed.calc("spm_unit_is_in_spm_poverty", map_to="person")
-        .groupby(state)
-        .mean()
+    reform_poverty = index.rate(
+        reformed.calc("spm_unit_is_in_spm_poverty", map_to="person").values,
+        "person",
     )
     rel_change = reform_poverty / baseline_poverty - 1
     df = pd.DataFrame(
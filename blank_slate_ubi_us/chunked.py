@@ -0,0 +1,553 @@
+"""
+Out-of-core evaluation of Blank Slate policies over chunked columnar data.
+
+A source yields the columns of a BlankSlatePolicy frame (baseline and
+funded net income, per-band person counts and weights, one row per SPM
+unit) a chunk at a time, from memory-mapped .npy files or Parquet row
+groups. Funding, the senior amount, the loss objective, poverty and decile
+aggregates are accumulated as weighted partial sums, so peak memory is
+bounded by the chunk size rather than the number of records.
+
+    write_arrays(policy.df, "frame/")
+    chunked = ChunkedPolicy(ArraySource.from_directory("frame/"), 0.4)
+    chunked.solve()
+"""
+
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Sequence,
+    Tuple,
+    Union,
+)
+import hashlib
+import numpy as np
+import pandas as pd
+from blank_slate_ubi_us.aggregation import GroupAggregator
+from blank_slate_ubi_us.instrumentation import timed
+from blank_slate_ubi_us.objectives import DEFAULT_OBJECTIVE
+from blank_slate_ubi_us.policy import (
+    AGE_BANDS,
+    BlankSlatePolicy,
+    funding_parameters,
+)
+from blank_slate_ubi_us.poverty import AGE_GROUPS, POVERTY_COLUMNS
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# Bins of the histogram that locates decile boundaries. Only rows in bins
+# that straddle a boundary are held in memory to rank them exactly.
+DECILE_BINS = 4096
+
+Chunk = Dict[str, np.ndarray]
+# A column name, or a function computing an array from a chunk.
+Column = Union[str, Callable[[Chunk], np.ndarray]]
+
+
+class ArraySource:
+    """Columns of equal length, read a chunk of rows at a time. Memory-mapped
+    arrays are only paged in as each chunk is read.
+
+    :param columns: Column name to array, e.g. from ``np.load(path,
+        mmap_mode="r")``.
+    :type columns: Mapping[str, np.ndarray]
+    :param chunk_size: Rows per chunk, defaults to 1,000,000.
+    :type chunk_size: int
+    :param key: Identifier of the data for the result store, defaults to
+        none.
+    :type key: str, optional
+    """
+
+    def __init__(
+        self,
+        columns: Mapping[str, np.ndarray],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        key: str = None,
+    ):
+        self.columns = dict(columns)
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {lengths}")
+        self.n_rows = lengths.pop() if lengths else 0
+        self.chunk_size = chunk_size
+        self.dataset_key = key
+
+    @classmethod
+    def from_frame(
+        cls, frame: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> "ArraySource":
+        """Reads an in-memory frame in chunks.
+
+        :param frame: Frame with one column per array.
+        :type frame: pd.DataFrame
+        :param chunk_size: Rows per chunk, defaults to 1,000,000.
+        :type chunk_size: int
+        :return: Source keyed by a hash of the frame's contents.
+        :rtype: ArraySource
+        """
+        digest = pd.util.hash_pandas_object(frame, index=False).sum()
+        return cls(
+            {name: values.values for name, values in frame.items()},
+            chunk_size,
+            key=f"frame:{digest}",
+        )
+
+    @classmethod
+    def from_directory(
+        cls, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> "ArraySource":
+        """Memory-maps the .npy files written by ``write_arrays``.
+
+        :param path: Directory with one <column>.npy file per column.
+        :type path: str
+        :param chunk_size: Rows per chunk, defaults to 1,000,000.
+        :type chunk_size: int
+        :return: Source keyed by the directory and its file sizes.
+        :rtype: ArraySource
+        """
+        files = sorted(Path(path).glob("*.npy"))
+        digest = hashlib.sha256(
+            str(
+                [(f.name, f.stat().st_size, f.stat().st_mtime) for f in files]
+            ).encode()
+        ).hexdigest()[:16]
+        return cls(
+            {f.stem: np.load(f, mmap_mode="r") for f in files},
+            chunk_size,
+            key=f"arrays:{Path(path).resolve()}:{digest}",
+        )
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def chunks(self, columns: List[str] = None) -> Iterator[Chunk]:
+        """Yields consecutive chunks of rows.
+
+        :param columns: Columns to read, defaults to all.
+        :type columns: List[str], optional
+        :return: Column name to in-memory array, per chunk.
+        :rtype: Iterator[Dict[str, np.ndarray]]
+        """
+        names = list(self.columns) if columns is None else columns
+        for start in range(0, self.n_rows, self.chunk_size):
+            stop = start + self.chunk_size
+            yield {
+                name: np.asarray(self.columns[name][start:stop])
+                for name in names
+            }
+
+
+class ParquetSource:
+    """Reads a Parquet file one row group at a time. Needs pyarrow.
+
+    :param path: Parquet file, e.g. written with ``DataFrame.to_parquet(path,
+        row_group_size=...)``.
+    :type path: str
+    :param key: Identifier of the data for the result store, defaults to the
+        path and file size.
+    :type key: str, optional
+    """
+
+    def __init__(self, path: str, key: str = None):
+        import pyarrow.parquet as pq
+
+        self.file = pq.ParquetFile(path)
+        self.n_rows = self.file.metadata.num_rows
+        self.dataset_key = key or (
+            f"parquet:{Path(path).resolve()}:{Path(path).stat().st_size}"
+        )
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def chunks(self, columns: List[str] = None) -> Iterator[Chunk]:
+        """Yields one chunk per row group.
+
+        :param columns: Columns to read, defaults to all.
+        :type columns: List[str], optional
+        :return: Column name to in-memory array, per row group.
+        :rtype: Iterator[Dict[str, np.ndarray]]
+        """
+        for i in range(self.file.num_row_groups):
+            table = self.file.read_row_group(i, columns=columns)
+            yield {
+                name: table.column(name).to_numpy()
+                for name in table.column_names
+            }
+
+
+def write_arrays(frame: pd.DataFrame, path: str) -> None:
+    """Writes each column of a frame, e.g. ``BlankSlatePolicy.df``, to its
+    own .npy file for ``ArraySource.from_directory``.
+
+    :param frame: Frame to write.
+    :type frame: pd.DataFrame
+    :param path: Directory, created if missing.
+    :type path: str
+    """
+    Path(path).mkdir(parents=True, exist_ok=True)
+    for name, values in frame.items():
+        np.save(Path(path) / f"{name}.npy", values.values)
+
+
+def _column(chunk: Chunk, column: Column) -> np.ndarray:
+    return chunk[column] if isinstance(column, str) else column(chunk)
+
+
+def _bands_in(lower: float, upper: float) -> List[str]:
+    bands = [
+        band
+        for band, (band_lower, band_upper) in AGE_BANDS.items()
+        if lower <= band_lower and band_upper <= upper
+    ]
+    covered = sum(AGE_BANDS[band][1] - AGE_BANDS[band][0] for band in bands)
+    if covered != upper - lower:
+        raise ValueError(
+            f"Ages [{lower}, {upper}) do not fall on the edges of the age "
+            f"bands {dict(AGE_BANDS)}"
+        )
+    return bands
+
+
+class ChunkedPolicy(BlankSlatePolicy):
+    """A BlankSlatePolicy evaluated over a chunked source instead of an
+    in-memory frame, for microdata larger than memory. ``solve`` and the
+    objective behave as for BlankSlatePolicy and give the same results up
+    to floating-point summation order.
+
+    :param source: Source of the policy frame columns, e.g. an ArraySource
+        or ParquetSource.
+    :type source: Any
+    :param flat_tax_rate: Flat tax rate of the funding reform the source
+        was computed under, defaults to 0.40.
+    :type flat_tax_rate: float
+    :param overrides: Parameter overrides of the funding reform.
+    :type overrides: Dict[str, Any], optional
+    :param year: Year the source was computed for, if not the default.
+    :type year: int, optional
+    """
+
+    in_memory = False
+
+    def __init__(
+        self,
+        source: Any,
+        flat_tax_rate: float = 0.40,
+        overrides: Dict[str, Any] = None,
+        year: int = None,
+    ):
+        self.source = source
+        self.year = year
+        self.flat_tax_rate = flat_tax_rate
+        self.overrides = overrides
+        self.base_reform = funding_parameters(flat_tax_rate, overrides)
+        self.simulation = None
+        self.dataset = getattr(source, "dataset_key", None)
+        self._baseline = None
+        self._blank_slate_funded = None
+        self.timings = {}
+        with timed(self.timings, "get_ubi_funding"):
+            self.totals = self._weighted_totals()
+            self.ubi_funding = self.totals["funding"]
+
+    def _weighted_totals(self) -> Dict[str, float]:
+        # Funding and weighted person counts, in one pass.
+        counts = [f"count_{band}" for band in AGE_BANDS] + ["count_person"]
+        totals = dict.fromkeys(["funding"] + counts, 0.0)
+        for chunk in self.source.chunks(
+            ["baseline_net_income", "funded_net_income", "weight"] + counts
+        ):
+            weight = chunk["weight"].astype(float)
+            totals["funding"] += np.dot(
+                chunk["baseline_net_income"] - chunk["funded_net_income"],
+                weight,
+            )
+            for name in counts:
+                totals[name] += np.dot(chunk[name].astype(float), weight)
+        return totals
+
+    def get_ubi_funding(self) -> float:
+        return self._weighted_totals()["funding"]
+
+    def get_senior_amount(
+        self,
+        young_child: float,
+        older_child: float,
+        young_adult: float,
+        adult: float,
+    ) -> float:
+        return (
+            self.ubi_funding
+            - young_child * self.totals["count_young_child"]
+            - older_child * self.totals["count_older_child"]
+            - young_adult * self.totals["count_young_adult"]
+            - adult * self.totals["count_adult"]
+        ) / self.totals["count_senior"]
+
+    def unspent_funding(self) -> float:
+        x = list(self.amounts().values())[:4]
+        return (self.get_senior_amount(*x) - self.senior) * self.totals[
+            "count_senior"
+        ]
+
+    def chunk_net_income(
+        self,
+        chunk: Chunk,
+        young_child: float,
+        older_child: float,
+        young_adult: float,
+        adult: float,
+        senior: float = None,
+    ) -> np.ndarray:
+        """Net income of each SPM unit of a chunk under the given amounts.
+
+        :param chunk: Chunk with funded net income and per-band counts.
+        :type chunk: Dict[str, np.ndarray]
+        :param senior: Senior amount, defaults to the funding's residual.
+        :type senior: float, optional
+        :return: Net income including the UBI.
+        :rtype: np.ndarray
+        """
+        amounts = list(
+            map(float, (young_child, older_child, young_adult, adult))
+        )
+        if senior is None:
+            senior = self.get_senior_amount(*amounts)
+        amounts.append(float(senior))
+        net_income = chunk["funded_net_income"].astype(float)
+        for band, amount in zip(AGE_BANDS, amounts):
+            net_income = net_income + chunk[f"count_{band}"] * amount
+        return net_income
+
+    def net_income(self, *amounts: float) -> pd.Series:
+        # Materialises every row, so only for sources that fit in memory.
+        return pd.Series(
+            np.concatenate(
+                [
+                    self.chunk_net_income(chunk, *amounts)
+                    for chunk in self.source.chunks()
+                ]
+            )
+        )
+
+    def mean_percentage_loss(
+        self,
+        young_child: float,
+        older_child: float,
+        young_adult: float,
+        adult: float,
+        senior: float = None,
+    ) -> float:
+        columns = ["baseline_net_income", "funded_net_income", "weight"]
+        columns += [f"count_{band}" for band in AGE_BANDS] + ["count_person"]
+        total_loss = total_weight = 0.0
+        for chunk in self.source.chunks(columns):
+            final_net_income = self.chunk_net_income(
+                chunk, young_child, older_child, young_adult, adult, senior
+            )
+            baseline = chunk["baseline_net_income"]
+            absolute_loss = np.maximum(0, baseline - final_net_income)
+            pct_loss = absolute_loss / np.maximum(100, baseline)
+            weight = chunk["weight"] * chunk["count_person"].astype(float)
+            total_loss += np.dot(pct_loss, weight)
+            total_weight += weight.sum()
+        return total_loss / total_weight
+
+    def objective_function(
+        self,
+        objective: str,
+        bounds: Sequence[Tuple[float, float]] = None,
+    ) -> Callable:
+        # Only the mean percentage loss is streamed over the chunks.
+        if objective != DEFAULT_OBJECTIVE:
+            raise ValueError(
+                f"Chunked policies only support the {DEFAULT_OBJECTIVE} "
+                "objective."
+            )
+        return self.mean_percentage_loss
+
+    def band_totals(self) -> np.ndarray:
+        return np.array([self.totals[f"count_{band}"] for band in AGE_BANDS])
+
+    def equal_amount(self) -> float:
+        return self.ubi_funding / self.totals["count_person"]
+
+    def memory_report(self) -> Dict[str, Any]:
+        return dict(
+            rows=len(self.source),
+            chunk_size=getattr(self.source, "chunk_size", None),
+            simulations_held=[],
+        )
+
+
+def chunked_poverty_by_age(
+    source: Any,
+    net_income: Column = "baseline_net_income",
+    groups: Dict[str, tuple] = AGE_GROUPS,
+    threshold: str = "spm_threshold",
+) -> pd.DataFrame:
+    """Poverty and deep poverty rates and gaps by age group, as
+    ``poverty_by_age`` computes them, from SPM unit rows in chunks.
+
+    Each SPM unit counts its members in every age band, so groups must
+    start and end on band edges. A unit is in poverty when its net income
+    is below its threshold and in deep poverty when below half of it.
+
+    :param source: Source with per-band counts, weights and thresholds.
+    :type source: Any
+    :param net_income: Net income column, or a function of a chunk such as
+        ``partial(policy.chunk_net_income, young_child=...)``, defaults to
+        baseline net income.
+    :type net_income: Union[str, Callable]
+    :param groups: Group name to [lower, upper) age bounds, defaults to
+        children, working-age adults and seniors.
+    :type groups: Dict[str, tuple]
+    :param threshold: SPM unit poverty threshold column, defaults to the
+        one ``BlankSlatePolicy.df`` and so ``write_arrays`` include.
+    :type threshold: str
+    :return: DataFrame indexed by group, plus "All", with the columns of
+        ``poverty_by_age``.
+    :rtype: pd.DataFrame
+    """
+    bounds = dict(groups, All=(0, np.inf))
+    bands = {name: _bands_in(*group) for name, group in bounds.items()}
+    sums = {band: np.zeros(5) for band in AGE_BANDS}
+    for chunk in source.chunks():
+        income = _column(chunk, net_income)
+        line = chunk[threshold]
+        weight = chunk["weight"].astype(float)
+        shortfall = line - income
+        size = np.maximum(chunk["count_person"].astype(float), 1)
+        # Per-member flags and gaps of each unit.
+        per_person = np.column_stack(
+            [
+                np.ones_like(income),
+                shortfall > 0,
+                shortfall > line / 2,
+                np.maximum(0, shortfall) / size,
+                np.maximum(0, shortfall - line / 2) / size,
+            ]
+        )
+        for band in AGE_BANDS:
+            people = chunk[f"count_{band}"] * weight
+            sums[band] += people @ per_person
+    totals = pd.DataFrame(
+        [sum(sums[band] for band in bands[name]) for name in bounds],
+        index=list(bounds),
+        columns=["population", "poor", "deep_poor"]
+        + list(POVERTY_COLUMNS[3:]),
+    )
+    totals["poverty_rate"] = totals.poor / totals.population
+    totals["deep_poverty_rate"] = totals.deep_poor / totals.population
+    return totals[list(POVERTY_COLUMNS)]
+
+
+def _decile(rank: np.ndarray, total: float, n: int) -> np.ndarray:
+    return np.clip(np.ceil(rank / total * n), 1, n).astype(int)
+
+
+def chunked_quantile_aggregate(
+    source: Any,
+    rank_by: Column,
+    columns: Dict[str, Column],
+    weight: Column = "weight",
+    n: int = 10,
+) -> pd.DataFrame:
+    """Weighted count, sums and means of columns by quantile group, as
+    ``GroupAggregator(quantile_rank(...) - 1, ...).aggregate`` computes
+    them, from rows in chunks.
+
+    Quantile boundaries are located with a weighted histogram, and only
+    the rows in histogram bins that straddle a boundary are held in memory
+    and ranked exactly, breaking ties by row order as ``quantile_rank``
+    does. Heavily tied values at a boundary, e.g. many zero incomes, are
+    all held.
+
+    :param source: Source of the rows.
+    :type source: Any
+    :param rank_by: Values to rank rows by.
+    :type rank_by: Union[str, Callable]
+    :param columns: Names and values to aggregate.
+    :type columns: Dict[str, Union[str, Callable]]
+    :param weight: Row weights, defaults to the "weight" column.
+    :type weight: Union[str, Callable]
+    :param n: Number of quantile groups, defaults to 10 (deciles).
+    :type n: int
+    :return: DataFrame indexed by quantile group from 1 to n, with a
+        "count" column and "<name>_sum" and "<name>_mean" columns.
+    :rtype: pd.DataFrame
+    """
+
+    def values(chunk):
+        return _column(chunk, rank_by), _column(chunk, weight).astype(float)
+
+    lowest, highest, total = np.inf, -np.inf, 0.0
+    for chunk in source.chunks():
+        value, w = values(chunk)
+        if len(value):
+            lowest = min(lowest, value.min())
+            highest = max(highest, value.max())
+        total += w.sum()
+    scale = DECILE_BINS / (highest - lowest) if highest > lowest else 0
+
+    def bin_of(value):
+        return np.minimum(
+            ((value - lowest) * scale).astype(np.int64), DECILE_BINS - 1
+        )
+
+    histogram = np.zeros(DECILE_BINS)
+    for chunk in source.chunks():
+        value, w = values(chunk)
+        histogram += np.bincount(bin_of(value), w, minlength=DECILE_BINS)
+    after = np.cumsum(histogram)
+    before = after - histogram
+    bin_group = _decile(after, total, n)
+    mixed = _decile(before, total, n) != bin_group
+
+    # Rank the rows of mixed bins exactly, in value then row order.
+    held = dict(position=[], value=[], weight=[])
+    offset = 0
+    for chunk in source.chunks():
+        value, w = values(chunk)
+        rows = np.flatnonzero(mixed[bin_of(value)])
+        held["position"].append(offset + rows)
+        held["value"].append(value[rows])
+        held["weight"].append(w[rows])
+        offset += len(value)
+    position, value, w = (np.concatenate(held[k]) for k in held)
+    order = np.lexsort((position, value))
+    position, value, w = position[order], value[order], w[order]
+    bins = bin_of(value)
+    cumulative = np.cumsum(w)
+    first = np.searchsorted(bins, bins)
+    rank = before[bins] + cumulative - (cumulative[first] - w[first])
+    order = np.argsort(position)
+    held_position, held_group = position[order], _decile(rank, total, n)[order]
+
+    labels = np.arange(1, n + 1)
+    sums = pd.DataFrame(0.0, index=labels, columns=list(columns))
+    count = pd.Series(0.0, index=labels)
+    offset = 0
+    for chunk in source.chunks():
+        value, w = values(chunk)
+        group = bin_group[bin_of(value)]
+        lower, upper = np.searchsorted(
+            held_position, [offset, offset + len(value)]
+        )
+        group[held_position[lower:upper] - offset] = held_group[lower:upper]
+        aggregator = GroupAggregator(group - 1, w, labels)
+        sums += aggregator.sum(
+            {name: _column(chunk, c) for name, c in columns.items()}
+        )
+        count += aggregator.count()
+        offset += len(value)
+    result = pd.DataFrame(dict(count=count))
+    for name in sums.columns:
+        result[name + "_sum"] = sums[name]
+        result[name + "_mean"] = sums[name] / count
+    return result
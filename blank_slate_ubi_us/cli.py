@@ -0,0 +1,412 @@
+"""
+The ``blank-slate`` command-line interface.
+
+    blank-slate solve --rate 0.4
+    blank-slate solve --rate 0.4 --objective share_losing_over_5pct
+    blank-slate sweep --start 0 --stop 0.5 --workers 8 -o sweep.csv
+    blank-slate sweep --adaptive --tolerance 0.005 --budget 20
+    blank-slate target poverty_rate_change --target 0
+    blank-slate frontier --rate 0.4 -o frontier.csv
+    blank-slate report charts/ --start 0.3 --stop 0.5 --step 0.05
+    blank-slate serve --workers 4 --preload 0.3 0.4
+    blank-slate bench --units 100000 --baseline benchmarks.json
+
+Every subcommand accepts the solver options and ``--profile``.
+"""
+
+from pathlib import Path
+from typing import List
+import argparse
+import cProfile
+import json
+import pstats
+import sys
+import numpy as np
+from blank_slate_ubi_us.objectives import DEFAULT_OBJECTIVE, OBJECTIVES
+from blank_slate_ubi_us.policy import SOLVER_METHODS
+from blank_slate_ubi_us.store import ResultStore
+from blank_slate_ubi_us.sweep import (
+    OUTPUT_FORMATS,
+    adaptive_sweep,
+    run_sweep,
+    run_year_sweep,
+    sweep_row,
+    write_table,
+)
+from blank_slate_ubi_us.targeting import TARGET_METRICS, target_flat_tax
+
+
+def _rates(args: argparse.Namespace) -> np.ndarray:
+    return np.arange(args.start, args.stop + args.step / 2, args.step)
+
+
+def _solve_options(args: argparse.Namespace) -> dict:
+    return dict(
+        method=args.method,
+        objective=args.objective,
+        maxiter=args.maxiter,
+        seed=args.seed,
+        plateau=args.plateau,
+        min_improvement=args.min_improvement,
+    )
+
+
+def _store(args: argparse.Namespace) -> ResultStore:
+    if args.cache_dir is None:
+        return None
+    return ResultStore(Path(args.cache_dir) / "results.db")
+
+
+def solve(args: argparse.Namespace) -> None:
+    row = sweep_row(
+        args.rate,
+        metrics=False,
+        store=_store(args),
+        trace_path=args.trace,
+        year=args.year,
+        **_solve_options(args),
+    )
+    text = json.dumps(dict(row, solver=_solve_options(args)), indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+def sweep(args: argparse.Namespace) -> None:
+    options = dict(
+        workers=args.workers,
+        metrics=not args.no_metrics,
+        store=_store(args),
+        **_solve_options(args),
+    )
+    if args.years:
+        if args.adaptive:
+            raise SystemExit("--adaptive does not support --years.")
+        df = run_year_sweep(args.years, _rates(args), **options)
+    elif args.adaptive:
+        df = adaptive_sweep(
+            args.start,
+            args.stop,
+            coarse_step=args.coarse_step,
+            min_step=args.step,
+            tolerance=args.tolerance,
+            budget=args.budget,
+            year=args.year,
+            **options,
+        )
+    else:
+        df = run_sweep(_rates(args), year=args.year, **options)
+    write_table(df, args.output, args.format)
+
+
+def target(args: argparse.Namespace) -> None:
+    result = target_flat_tax(
+        args.metric,
+        args.target,
+        lower=args.lower,
+        upper=args.upper,
+        xtol=args.xtol,
+        warm_start=not args.cold_start,
+        year=args.year,
+        store=_store(args),
+        **_solve_options(args),
+    )
+    print(
+        json.dumps(
+            dict(
+                {k: v for k, v in result.items() if k != "rows"},
+                solver=_solve_options(args),
+            ),
+            indent=2,
+        )
+    )
+
+
+def frontier(args: argparse.Namespace) -> None:
+    from blank_slate_ubi_us.pareto import pareto_frontier
+    from blank_slate_ubi_us.policy import BlankSlatePolicy
+
+    df = pareto_frontier(
+        BlankSlatePolicy(args.rate, lean=True),
+        population=args.population,
+        generations=args.generations,
+        seed=args.seed,
+    )
+    write_table(df, args.output, args.format)
+
+
+def report(args: argparse.Namespace) -> None:
+    # The chart stack is only imported when charts are requested.
+    from blank_slate_ubi_us.charts.export import CHARTS, export_charts
+
+    export_charts(
+        _rates(args),
+        args.output,
+        charts=args.charts or CHARTS,
+        workers=args.workers,
+        force=args.force,
+        solve_options=_solve_options(args),
+        store=_store(args),
+        year=args.year,
+    )
+
+
+def serve(args: argparse.Namespace) -> None:
+    from blank_slate_ubi_us.server import serve
+
+    serve(
+        args.host,
+        args.port,
+        workers=args.workers,
+        preload=args.preload,
+        store=_store(args),
+    )
+
+
+def bench(args: argparse.Namespace) -> None:
+    from blank_slate_ubi_us.benchmarks import (
+        check_regressions,
+        run_benchmarks,
+        save_baseline,
+    )
+
+    results = run_benchmarks(
+        args.units, repeat=args.repeat, names=args.names, seed=args.seed
+    )
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+    if args.baseline:
+        results = check_regressions(results, args.baseline, args.tolerance)
+        print(results.to_string())
+        if results.regressed.any():
+            sys.exit(
+                "Regressed: " + ", ".join(results.index[results.regressed])
+            )
+
+
+def _add_solver_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("solver")
+    group.add_argument(
+        "--objective",
+        choices=list(OBJECTIVES),
+        default=DEFAULT_OBJECTIVE,
+        help="What the amounts minimise.",
+    )
+    group.add_argument(
+        "--method",
+        choices=SOLVER_METHODS,
+        default="auto",
+        help="Solver, by default the fastest the objective allows.",
+    )
+    group.add_argument("--maxiter", type=int, default=int(1e3))
+    group.add_argument("--seed", type=int, default=None)
+    group.add_argument(
+        "--plateau",
+        type=int,
+        default=None,
+        help="Stop after this many generations without improvement.",
+    )
+    group.add_argument("--min-improvement", type=float, default=0.0)
+    group.add_argument(
+        "--year",
+        type=int,
+        default=None,
+        help="Year to analyse, defaults to 2023 reforms at the "
+        "simulation's default period.",
+    )
+    group.add_argument(
+        "--cache-dir",
+        help="Directory of a result store to reuse solved rates from.",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="Profile the command and write cProfile stats to PATH.",
+    )
+
+
+def _add_rate_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("flat tax rates")
+    group.add_argument("--start", type=float, default=0.0)
+    group.add_argument("--stop", type=float, default=0.5)
+    group.add_argument("--step", type=float, default=0.01)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Builds the argument parser of the ``blank-slate`` command.
+
+    :return: Parser with solve, sweep, report, serve and bench
+        subcommands.
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        prog="blank-slate",
+        description="Solve and analyse Blank Slate UBI policies.",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    solve_parser = subparsers.add_parser(
+        "solve", help="Solve the optimal UBI amounts for one flat tax rate."
+    )
+    solve_parser.add_argument("--rate", type=float, default=0.4)
+    solve_parser.add_argument("-o", "--output", default="-")
+    solve_parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write the per-generation convergence trace as JSONL.",
+    )
+    _add_solver_arguments(solve_parser)
+    solve_parser.set_defaults(func=solve)
+
+    sweep_parser = subparsers.add_parser(
+        "sweep", help="Solve a range of flat tax rates."
+    )
+    _add_rate_arguments(sweep_parser)
+    sweep_parser.add_argument("--workers", type=int, default=1)
+    sweep_parser.add_argument(
+        "--years",
+        type=int,
+        nargs="+",
+        help="Sweep every rate in each of these years, one worker per year.",
+    )
+    sweep_parser.add_argument(
+        "--no-metrics",
+        action="store_true",
+        help="Skip poverty and Gini changes, which need a reformed "
+        "simulation per rate.",
+    )
+    adaptive = sweep_parser.add_argument_group(
+        "adaptive sweep",
+        "Solve a coarse grid, then bisect intervals where the loss and "
+        "poverty curves bend, down to --step.",
+    )
+    adaptive.add_argument("--adaptive", action="store_true")
+    adaptive.add_argument("--coarse-step", type=float, default=0.1)
+    adaptive.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.005,
+        help="Largest interpolation error as a share of each curve's range.",
+    )
+    adaptive.add_argument(
+        "--budget", type=int, default=None, help="Most rates to solve."
+    )
+    sweep_parser.add_argument("-o", "--output", default="-")
+    sweep_parser.add_argument("--format", choices=OUTPUT_FORMATS, default=None)
+    _add_solver_arguments(sweep_parser)
+    sweep_parser.set_defaults(func=sweep)
+
+    target_parser = subparsers.add_parser(
+        "target",
+        help="Find the flat tax rate at which a metric hits a target.",
+    )
+    target_parser.add_argument(
+        "metric",
+        choices=TARGET_METRICS,
+    )
+    target_parser.add_argument("--target", type=float, default=0.0)
+    target_parser.add_argument("--lower", type=float, default=0.0)
+    target_parser.add_argument("--upper", type=float, default=0.5)
+    target_parser.add_argument(
+        "--xtol", type=float, default=0.001, help="Precision of the rate."
+    )
+    target_parser.add_argument(
+        "--cold-start",
+        action="store_true",
+        help="Solve each rate from scratch rather than from the nearest "
+        "solved rate.",
+    )
+    _add_solver_arguments(target_parser)
+    target_parser.set_defaults(func=target)
+
+    frontier_parser = subparsers.add_parser(
+        "frontier",
+        help="Trade off mean loss against the poverty rate at one rate.",
+    )
+    frontier_parser.add_argument("--rate", type=float, default=0.4)
+    frontier_parser.add_argument("--population", type=int, default=64)
+    frontier_parser.add_argument("--generations", type=int, default=100)
+    frontier_parser.add_argument("--seed", type=int, default=None)
+    frontier_parser.add_argument("-o", "--output", default="-")
+    frontier_parser.add_argument(
+        "--format", choices=OUTPUT_FORMATS, default=None
+    )
+    frontier_parser.add_argument("--profile", metavar="PATH")
+    frontier_parser.set_defaults(func=frontier)
+
+    report_parser = subparsers.add_parser(
+        "report", help="Export chart bundles for a range of flat tax rates."
+    )
+    report_parser.add_argument("output", help="Directory to write to.")
+    _add_rate_arguments(report_parser)
+    report_parser.add_argument(
+        "--charts", nargs="+", help="Charts to build, defaults to all."
+    )
+    report_parser.add_argument("--workers", type=int, default=None)
+    report_parser.add_argument("--force", action="store_true")
+    _add_solver_arguments(report_parser)
+    report_parser.set_defaults(func=report)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Serve solve requests from warm policies over HTTP."
+    )
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--workers", type=int, default=2)
+    serve_parser.add_argument(
+        "--preload",
+        type=float,
+        nargs="*",
+        default=[],
+        help="Flat tax rates to build policies for before serving.",
+    )
+    serve_parser.add_argument("--cache-dir")
+    serve_parser.add_argument("--profile", metavar="PATH")
+    serve_parser.set_defaults(func=serve)
+
+    bench_parser = subparsers.add_parser(
+        "bench", help="Benchmark the solver and metrics on synthetic data."
+    )
+    bench_parser.add_argument("--units", type=int, default=100_000)
+    bench_parser.add_argument("--repeat", type=int, default=3)
+    bench_parser.add_argument("--seed", type=int, default=0)
+    bench_parser.add_argument(
+        "--names", nargs="+", help="Benchmarks to run, defaults to all."
+    )
+    bench_parser.add_argument(
+        "--baseline",
+        metavar="PATH",
+        help="Fail if any benchmark regressed against this baseline.",
+    )
+    bench_parser.add_argument("--tolerance", type=float, default=1.25)
+    bench_parser.add_argument(
+        "--save-baseline", metavar="PATH", help="Save results as a baseline."
+    )
+    bench_parser.add_argument("--profile", metavar="PATH")
+    bench_parser.set_defaults(func=bench)
+    return parser
+
+
+def main(argv: List[str] = None) -> None:
+    """Runs the ``blank-slate`` command.
+
+    :param argv: Command-line arguments, defaults to ``sys.argv[1:]``.
+    :type argv: List[str], optional
+    """
+    args = build_parser().parse_args(argv)
+    if args.profile is None:
+        args.func(args)
+        return
+    profiler = cProfile.Profile()
+    profiler.runcall(args.func, args)
+    profiler.dump_stats(args.profile)
+    pstats.Stats(profiler, stream=sys.stderr).sort_stats(
+        "cumulative"
+    ).print_stats(20)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Inequality metrics computed from a single weighted sort of incomes.
+"""
+
+from typing import Dict, Union
+import numpy as np
+
+
+class IncomeDistribution:
+    """Weighted income distribution, sorted once.
+
+    Gini, top shares, the Palma ratio and arbitrary quantile shares are all
+    read off the same cumulative weight and cumulative income arrays, so
+    each simulation pays for one sort regardless of how many metrics are
+    requested.
+
+    :param income: Income of each observation.
+    :type income: np.ndarray
+    :param weights: Weight of each observation, defaults to equal weights.
+    :type weights: np.ndarray, optional
+    """
+
+    def __init__(self, income: np.ndarray, weights: np.ndarray = None):
+        income = np.asarray(income, dtype=float)
+        if weights is None:
+            weights = np.ones_like(income)
+        weights = np.asarray(weights, dtype=float)
+        order = np.argsort(income, kind="stable")
+        self.income = income[order]
+        self.weights = weights[order]
+        self.cumulative_weight = np.cumsum(self.weights)
+        self.cumulative_income = np.cumsum(self.income * self.weights)
+        self.total_weight = self.cumulative_weight[-1]
+        self.total_income = self.cumulative_income[-1]
+        # Lorenz curve knots, starting from the origin.
+        self._population_share = np.concatenate(
+            [[0], self.cumulative_weight / self.total_weight]
+        )
+        self._income_share = np.concatenate(
+            [[0], self.cumulative_income / self.total_income]
+        )
+
+    @classmethod
+    def from_microseries(cls, series) -> "IncomeDistribution":
+        """Builds the distribution from a weighted MicroSeries.
+
+        :param series: MicroSeries, e.g. the result of ``sim.calc(...)``.
+        :type series: MicroSeries
+        :return: Sorted income distribution.
+        :rtype: IncomeDistribution
+        """
+        return cls(series.values, series.weights.values)
+
+    def gini(self) -> float:
+        """Gini coefficient, matching the weighted microdf formula.
+
+        :return: Gini coefficient.
+        :rtype: float
+        """
+        w = self.cumulative_weight
+        x = self.cumulative_income
+        return float(np.sum(x[1:] * w[:-1] - x[:-1] * w[1:]) / (x[-1] * w[-1]))
+
+    def lorenz(
+        self, population_share: Union[float, np.ndarray]
+    ) -> Union[float, np.ndarray]:
+        """Share of total income held by the poorest ``population_share``.
+
+        Observations straddling the boundary are split pro rata by weight.
+
+        :param population_share: Population share(s) between 0 and 1.
+        :type population_share: Union[float, np.ndarray]
+        :return: Income share(s).
+        :rtype: Union[float, np.ndarray]
+        """
+        return np.interp(
+            population_share, self._population_share, self._income_share
+        )
+
+    def quantile_share(self, lower: float, upper: float) -> float:
+        """Share of income held between two population quantiles.
+
+        :param lower: Lower population quantile, e.g. 0.5.
+        :type lower: float
+        :param upper: Upper population quantile, e.g. 0.9.
+        :type upper: float
+        :return: Income share.
+        :rtype: float
+        """
+        low, high = self.lorenz([lower, upper])
+        return float(high - low)
+
+    def top_share(self, population_share: float) -> float:
+        """Share of income held by the richest ``population_share``.
+
+        :param population_share: Population share, e.g. 0.1 for the top 10%.
+        :type population_share: float
+        :return: Income share.
+        :rtype: float
+        """
+        return self.quantile_share(1 - population_share, 1)
+
+    def bottom_share(self, population_share: float) -> float:
+        """Share of income held by the poorest ``population_share``.
+
+        :param population_share: Population share, e.g. 0.4 for the bottom
+            40%.
+        :type population_share: float
+        :return: Income share.
+        :rtype: float
+        """
+        return self.quantile_share(0, population_share)
+
+    def palma_ratio(self) -> float:
+        """Top 10% income share divided by bottom 40% income share.
+
+        :return: Palma ratio.
+        :rtype: float
+        """
+        return self.top_share(0.1) / self.bottom_share(0.4)
+
+    def summary(self) -> Dict[str, float]:
+        """All headline inequality metrics.
+
+        :return: Gini, top 10% share, top 1% share and Palma ratio.
+        :rtype: Dict[str, float]
+        """
+        bottom_40, below_top_10, below_top_1 = self.lorenz([0.4, 0.9, 0.99])
+        top_10 = 1 - below_top_10
+        top_1 = 1 - below_top_1
+        return dict(
+            gini=self.gini(),
+            top_ten_pct_share=float(top_10),
+            top_one_pct_share=float(top_1),
+            palma_ratio=float(top_10 / bottom_40),
+        )
+
+
+def inequality_changes(
+    baseline: IncomeDistribution, reformed: IncomeDistribution
+) -> Dict[str, float]:
+    """Relative change in each headline inequality metric.
+
+    :param baseline: Baseline income distribution.
+    :type baseline: IncomeDistribution
+    :param reformed: Reform income distribution.
+    :type reformed: IncomeDistribution
+    :return: Metric name to relative change.
+    :rtype: Dict[str, float]
+    """
+    baseline_summary = baseline.summary()
+    reformed_summary = reformed.summary()
+    return {
+        metric: reformed_summary[metric] / baseline_summary[metric] - 1
+        for metric in baseline_summary
+    }
@@ -0,0 +1,126 @@
+"""
+Stage timers and convergence traces for BlankSlatePolicy solves.
+"""
+
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+import json
+import time
+import numpy as np
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str):
+    """Adds the wall time of a block to ``timings[stage]``.
+
+    :param timings: Stage name to seconds.
+    :type timings: Dict[str, float]
+    :param stage: Name of the stage.
+    :type stage: str
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0) + time.perf_counter() - start
+
+
+class SolverTrace:
+    """Counts objective evaluations and records one entry per solver
+    generation (per iteration for local methods).
+
+    Each entry has the generation number, cumulative evaluations, the best
+    loss so far, and the mean and standard deviation (the population
+    spread) of the losses evaluated during the generation.
+
+    :param plateau: Stop once the best loss has improved by less than
+        ``min_improvement`` over this many generations, defaults to never.
+        Only differential evolution can be stopped early.
+    :type plateau: int, optional
+    :param min_improvement: Smallest improvement that resets the plateau,
+        defaults to 0.
+    :type min_improvement: float
+    :param path: JSONL file to write each entry to as it is recorded.
+    :type path: str, optional
+    """
+
+    def __init__(
+        self,
+        plateau: int = None,
+        min_improvement: float = 0.0,
+        path: str = None,
+    ):
+        self.plateau = plateau
+        self.min_improvement = min_improvement
+        self.path = path
+        self.evaluations = 0
+        self.generations: List[dict] = []
+        self.stopped_early = False
+        self._losses: List[float] = []
+        self._best = np.inf
+        self._start = time.perf_counter()
+        if path is not None:
+            open(path, "w").close()
+
+    def objective(self, function: Callable) -> Callable:
+        """Wraps an objective to count and record its evaluations.
+
+        :param function: Objective of the amounts vector, or of a (4,
+            candidates) matrix for vectorized solvers.
+        :type function: Callable
+        :return: Counting objective.
+        :rtype: Callable
+        """
+
+        def counted(x):
+            loss = function(*x)
+            losses = np.atleast_1d(loss)
+            self.evaluations += len(losses)
+            self._losses.extend(losses.tolist())
+            if len(losses):
+                self._best = min(self._best, losses.min())
+            return loss
+
+        return counted
+
+    def record(self) -> bool:
+        """Records the generation that just ended.
+
+        :return: Whether the solver should stop on a plateau.
+        :rtype: bool
+        """
+        losses = np.array(self._losses) if self._losses else np.full(1, np.nan)
+        entry = dict(
+            generation=len(self.generations) + 1,
+            evaluations=self.evaluations,
+            best_loss=float(self._best),
+            mean_loss=float(np.mean(losses)),
+            spread=float(np.std(losses)),
+            seconds=time.perf_counter() - self._start,
+        )
+        self._losses = []
+        self.generations.append(entry)
+        if self.path is not None:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        if self.plateau is None or len(self.generations) <= self.plateau:
+            return False
+        previous = self.generations[-1 - self.plateau]["best_loss"]
+        self.stopped_early = (
+            previous - entry["best_loss"] <= self.min_improvement
+        )
+        return self.stopped_early
+
+    def to_dict(self) -> dict:
+        """Summary of the trace.
+
+        :return: Evaluation and generation counts, whether the solve
+            stopped early, and the per-generation entries.
+        :rtype: dict
+        """
+        return dict(
+            evaluations=self.evaluations,
+            n_generations=len(self.generations),
+            stopped_early=self.stopped_early,
+            generations=self.generations,
+        )
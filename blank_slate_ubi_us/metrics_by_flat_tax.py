@@ -2,53 +2,51 @@
 
 from typing import Tuple
 from blank_slate_ubi_us.policy import BlankSlatePolicy
-from policyengine import PolicyEngineUS
-import pandas as pd
+from blank_slate_ubi_us.inequality import (
+    IncomeDistribution,
+    inequality_changes,
+)
+from blank_slate_ubi_us.periods import SimulationCache
+from blank_slate_ubi_us.poverty import poverty_by_age
 import numpy as np
 
-us = PolicyEngineUS()
+# Simulations shared by the policies of each flat tax rate.
+simulations = SimulationCache()
 
-def get_metrics_by_flat_tax(flat_tax: float) -> Tuple[float]:
-    policy = BlankSlatePolicy(flat_tax_rate=flat_tax)
-    optimal_ubi_reform = policy.solve()
+
+def get_metrics(policy: BlankSlatePolicy, reform: dict) -> Tuple[float]:
     baseline = policy.baseline
-    _, reformed = us.create_microsimulations(optimal_ubi_reform)
+    reformed = policy.reformed_simulation(reform)
 
-    poverty_rate_baseline = baseline.calc("spm_unit_is_in_spm_poverty", map_to="person").mean()
-    poverty_rate_reformed = reformed.calc("spm_unit_is_in_spm_poverty", map_to="person").mean()
-    poverty_rate_change = (poverty_rate_reformed - poverty_rate_baseline) / poverty_rate_baseline
+    poverty_rate_baseline = poverty_by_age(baseline).poverty_rate["All"]
+    poverty_rate_reformed = poverty_by_age(reformed).poverty_rate["All"]
+    poverty_rate_change = (
+        poverty_rate_reformed - poverty_rate_baseline
+    ) / poverty_rate_baseline
 
-    equiv_income = baseline.calc(
-        "spm_unit_net_income", map_to="person"
+    baseline_income = IncomeDistribution.from_microseries(
+        baseline.calc("spm_unit_net_income", map_to="person")
     )
-    reform_equiv_income = reformed.calc(
-        "spm_unit_net_income", map_to="person"
+    reform_income = IncomeDistribution.from_microseries(
+        reformed.calc("spm_unit_net_income", map_to="person")
     )
-    baseline_gini = equiv_income.gini()
-    reform_gini = reform_equiv_income.gini()
-    gini_change = reform_gini / baseline_gini - 1
+    gini_change = inequality_changes(baseline_income, reform_income)["gini"]
 
     return poverty_rate_change, gini_change
 
-if __name__ == "__main__":
 
-    flat_taxes = []
-    poverty_rate_changes = []
-    gini_changes = []
-
-    for flat_tax in np.arange(0.0, 0.51, 0.01):
-        poverty_change, gini_change = get_metrics_by_flat_tax(flat_tax)
-        flat_taxes.append(flat_tax)
-        poverty_rate_changes.append(poverty_change)
-        gini_changes.append(gini_change)
-        print(f"Flat tax: {flat_tax:.0%}, poverty rate change: {poverty_change:.2%}, gini change: {gini_change:.2%}")
-
-    df = pd.DataFrame(
-        dict(
-            flat_tax=flat_taxes,
-            poverty_rate_change=poverty_rate_changes,
-            gini_change=gini_changes,
-        )
+def get_metrics_by_flat_tax(flat_tax: float, year: int = None) -> Tuple[float]:
+    policy = BlankSlatePolicy(
+        flat_tax_rate=flat_tax, simulation=simulations, year=year
     )
+    return get_metrics(policy, policy.solve())
+
 
-    df.to_csv("metrics_by_flat_tax.csv", index=False)
\ No newline at end of file
+if __name__ == "__main__":
+    from blank_slate_ubi_us.store import ResultStore
+    from blank_slate_ubi_us.sweep import run_sweep
+
+    df = run_sweep(np.arange(0.0, 0.51, 0.01), store=ResultStore())
+    df[["flat_tax", "poverty_rate_change", "gini_change"]].to_csv(
+        "metrics_by_flat_tax.csv", index=False
+    )
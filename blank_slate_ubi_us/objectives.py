@@ -0,0 +1,588 @@
+"""
+Objectives the UBI amounts can be optimised for, written against the
+compact per-SPM-unit arrays of a policy.
+
+Every objective evaluates a whole matrix of candidate amount vectors at
+once. Each declares what else it supports, which ``BlankSlatePolicy.solve``
+uses to pick a method when asked for ``method="auto"``:
+
+- a ``hinge`` form, sum_i c_i max(0, t_i - net_i), is convex and piecewise
+  linear in the amounts, so it is solved exactly as a linear program;
+- other ``convex`` objectives are solved by a local method;
+- anything else by differential evolution, evaluating each generation as
+  one batch.
+
+Within the solver bounds, hinge objectives are evaluated over an
+``ActiveSet``: only the units whose loss can change sign there.
+
+New objectives are added to ``OBJECTIVES``.
+"""
+
+from typing import Callable, Dict, List, Sequence, Tuple
+import copy
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linprog
+
+DEFAULT_OBJECTIVE = "mean_percentage_loss"
+
+# Unit losses are divided by baseline net income floored at this.
+INCOME_FLOOR = 100
+
+# Units within this many dollars of their hinge target are at its kink.
+KINK_TOLERANCE = 0.01
+
+
+class UnitArrays:
+    """Per-SPM-unit arrays of a policy, as float64 numpy arrays.
+
+    :param df: Policy frame with baseline and funded net income, per-band
+        person counts, weights and SPM thresholds.
+    :type df: pd.DataFrame
+    :param ubi_funding: Total UBI funding.
+    :type ubi_funding: float
+    :param bands: Age bands, the last of which gets the residual amount.
+    :type bands: List[str]
+    """
+
+    def __init__(self, df: pd.DataFrame, ubi_funding: float, bands: List[str]):
+        self.baseline = df.baseline_net_income.values.astype(float)
+        self.funded = df.funded_net_income.values.astype(float)
+        self.counts = df[[f"count_{band}" for band in bands]].values.astype(
+            float
+        )
+        self.weight = df.weight.values.astype(float)
+        self.people = df.count_person.values.astype(float)
+        self.person_weight = self.weight * self.people
+        self.threshold = (
+            df.spm_threshold.values.astype(float)
+            if "spm_threshold" in df
+            else None
+        )
+        self.band_totals = self.weight @ self.counts
+        self.ubi_funding = ubi_funding
+        # Net income is affine in the first four amounts: base + gradient @ x.
+        # Each unit gets residual dollars per dollar of funding.
+        self.residual = self.counts[:, -1] / self.band_totals[-1]
+        self.base = self.funded + self.residual * ubi_funding
+        self.gradient = self.counts[:, :-1] - np.outer(
+            self.residual, self.band_totals[:-1]
+        )
+
+    def net_income(self, amounts: np.ndarray) -> np.ndarray:
+        """Net income of every unit under each candidate.
+
+        :param amounts: (candidates, 4) amounts, the residual band's then
+            absorbing the budget, or (candidates, 5) amounts of every band.
+        :type amounts: np.ndarray
+        :return: (units, candidates) net incomes.
+        :rtype: np.ndarray
+        """
+        amounts = np.atleast_2d(amounts)
+        if amounts.shape[1] == self.counts.shape[1]:
+            return self.funded[:, None] + self.counts @ amounts.T
+        return self.base[:, None] + self.gradient @ amounts.T
+
+    def residual_amount(self, amounts: np.ndarray) -> float:
+        """Whole-dollar amount of the residual band that the funding pays
+        for given the other amounts, rounded down so the reform never
+        spends more than the funding.
+
+        :param amounts: Amounts of the other bands.
+        :type amounts: np.ndarray
+        :return: Residual band amount.
+        :rtype: float
+        """
+        unspent = self.ubi_funding - self.band_totals[:-1] @ amounts
+        return float(np.floor(unspent / self.band_totals[-1]))
+
+    def percentage_loss(self, net_income: np.ndarray) -> np.ndarray:
+        return np.maximum(0, self.baseline[:, None] - net_income) / (
+            np.maximum(INCOME_FLOOR, self.baseline)[:, None]
+        )
+
+
+Hinge = Callable[[UnitArrays], Tuple[np.ndarray, np.ndarray]]
+
+
+class Objective:
+    """An objective of the UBI amounts, to be minimised.
+
+    :param function: Takes the unit arrays and a (units, candidates) net
+        income matrix and returns one value per candidate. Derived from
+        ``hinge`` if not given.
+    :type function: Callable, optional
+    :param hinge: For objectives of the form sum_i c_i max(0, t_i -
+        net_i), returns the coefficients c and targets t. These are convex
+        and solved as linear programs.
+    :type hinge: Callable, optional
+    :param convex: Whether the objective is convex in the amounts, so a
+        local method finds its optimum. Implied by ``hinge``.
+    :type convex: bool
+    :param vectorized: Whether the function evaluates many candidates in
+        one call, defaults to True.
+    :type vectorized: bool
+    :param description: One line description.
+    :type description: str
+    """
+
+    def __init__(
+        self,
+        function: Callable = None,
+        hinge: Hinge = None,
+        convex: bool = False,
+        vectorized: bool = True,
+        description: str = "",
+    ):
+        if function is None and hinge is None:
+            raise ValueError("An objective needs a function or a hinge.")
+        self.hinge = hinge
+        self.function = function or self._hinge_function
+        self.convex = convex or hinge is not None
+        self.vectorized = vectorized
+        self.description = description
+
+    @property
+    def linear_program(self) -> bool:
+        return self.hinge is not None
+
+    def method(self, in_memory: bool = True) -> str:
+        """Fastest solver method the objective allows.
+
+        :param in_memory: Whether the policy holds its unit arrays in
+            memory, which linear programs need, defaults to True.
+        :type in_memory: bool
+        :return: Method name for ``BlankSlatePolicy.solve``.
+        :rtype: str
+        """
+        if self.linear_program and in_memory:
+            return "linprog"
+        if self.convex:
+            return "powell"
+        return "differential_evolution"
+
+    def _hinge_function(
+        self, units: UnitArrays, net_income: np.ndarray
+    ) -> np.ndarray:
+        coefficients, targets = self.hinge(units)
+        return coefficients @ np.maximum(0, targets[:, None] - net_income)
+
+    def __call__(self, units: UnitArrays, amounts: np.ndarray) -> np.ndarray:
+        """Values of candidate amount vectors.
+
+        :param units: Unit arrays of the policy.
+        :type units: UnitArrays
+        :param amounts: (candidates, 4) amounts, or (candidates, 5) with
+            the residual band's.
+        :type amounts: np.ndarray
+        :return: One value per candidate.
+        :rtype: np.ndarray
+        """
+        amounts = np.atleast_2d(np.asarray(amounts, dtype=float))
+        if not len(amounts):
+            # A constrained generation can have no feasible candidates.
+            return np.empty(0)
+        if not self.vectorized:
+            return np.array(
+                [self.function(units, units.net_income(x))[0] for x in amounts]
+            )
+        # Bound the (units, candidates) matrices to about 2^24 cells.
+        block = max(1, 2**24 // max(len(units.baseline), 1))
+        return np.concatenate(
+            [
+                self.function(units, units.net_income(amounts[i : i + block]))
+                for i in range(0, len(amounts), block)
+            ]
+        )
+
+    def subgradient(
+        self, units: UnitArrays, amounts: Sequence[float]
+    ) -> Dict[str, np.ndarray]:
+        """Exact derivatives of a hinge objective with respect to the four
+        amounts, the residual band absorbing the budget, and to the funding
+        pool. Only units with a positive hinge move the objective, and units
+        at its kink only when they start to lose.
+
+        :param units: Unit arrays of the policy.
+        :type units: UnitArrays
+        :param amounts: The four amounts.
+        :type amounts: Sequence[float]
+        :return: Per dollar of each amount then of funding, the ``gradient``
+            from the units with a positive hinge and the one-sided
+            derivatives for an ``increase`` and a ``decrease``, and the
+            ``active`` mask of those units.
+        :rtype: Dict[str, np.ndarray]
+        """
+        if not self.linear_program:
+            raise ValueError(
+                "Only objectives with a hinge form have exact subgradients."
+            )
+        coefficients, targets = self.hinge(units)
+        gap = targets - units.net_income(amounts)[:, 0]
+        active = gap > KINK_TOLERANCE
+        at_kink = coefficients * (np.abs(gap) <= KINK_TOLERANCE)
+        slopes = np.column_stack([units.gradient, units.residual])
+        gradient = -(coefficients * active) @ slopes
+        return dict(
+            gradient=gradient,
+            increase=gradient + at_kink @ np.maximum(0, -slopes),
+            decrease=-gradient + at_kink @ np.maximum(0, slopes),
+            active=active,
+        )
+
+    def solve_linear_program(
+        self, units: UnitArrays, bounds: Sequence[Tuple[float, float]]
+    ) -> np.ndarray:
+        """Exact optimum of a hinge objective within bounds, see
+        ``ActiveSet.solve_linear_program``.
+
+        :param units: Unit arrays of the policy.
+        :type units: UnitArrays
+        :param bounds: Bounds of the amounts.
+        :type bounds: Sequence[Tuple[float, float]]
+        :return: Optimal amounts.
+        :rtype: np.ndarray
+        """
+        return ActiveSet(units, self, bounds).solve_linear_program()
+
+
+class ActiveSet:
+    """A hinge objective restricted to a box of amounts, evaluated only
+    over the units whose hinge can change sign in the box.
+
+    Each unit's gap t_i - net_i is affine in the amounts, so its range
+    over the box follows from the box corners. Units whose gap is never
+    positive never count and are dropped. Units whose gap is never
+    negative count linearly everywhere, and are collapsed into one
+    constant and one slope. Only the remaining, ambiguous units are
+    evaluated per candidate. Amounts outside the box give wrong values.
+
+    :param units: Unit arrays of the policy.
+    :type units: UnitArrays
+    :param objective: Objective with a hinge form.
+    :type objective: Objective
+    :param bounds: Bounds of the amounts.
+    :type bounds: Sequence[Tuple[float, float]]
+    """
+
+    def __init__(
+        self,
+        units: UnitArrays,
+        objective: Objective,
+        bounds: Sequence[Tuple[float, float]],
+    ):
+        if not objective.linear_program:
+            raise ValueError("Only objectives with a hinge form are pruned.")
+        coefficients, targets = objective.hinge(units)
+        self.coefficients = coefficients
+        self.gap = targets - units.base
+        self.gradient = units.gradient
+        # The residual band's amount is non-negative only while the other
+        # bands spend no more than the funding.
+        self.spending = units.band_totals[:-1]
+        self.funding = units.ubi_funding
+        self.constant = 0.0
+        self.slope = np.zeros(units.gradient.shape[1])
+        self.bounds = None
+        self._prune(bounds)
+
+    def _prune(self, bounds: Sequence[Tuple[float, float]]) -> None:
+        lower, upper = np.transpose(bounds)
+        at_lower = self.gradient * lower
+        at_upper = self.gradient * upper
+        most = self.gap - np.minimum(at_lower, at_upper).sum(axis=1)
+        least = self.gap - np.maximum(at_lower, at_upper).sum(axis=1)
+        counted = self.coefficients > 0
+        linear = counted & (least >= 0)
+        ambiguous = counted & (most > 0) & ~linear
+        self.constant += self.coefficients[linear] @ self.gap[linear]
+        self.slope -= self.coefficients[linear] @ self.gradient[linear]
+        self.coefficients = self.coefficients[ambiguous]
+        self.gap = self.gap[ambiguous]
+        self.gradient = self.gradient[ambiguous]
+        self.bounds = [tuple(bound) for bound in bounds]
+
+    def contains(self, bounds: Sequence[Tuple[float, float]]) -> bool:
+        """Whether a box lies inside the pruned one.
+
+        :param bounds: Bounds of the amounts.
+        :type bounds: Sequence[Tuple[float, float]]
+        :return: True if every bound is inside the current ones.
+        :rtype: bool
+        """
+        lower, upper = np.transpose(bounds)
+        current_lower, current_upper = np.transpose(self.bounds)
+        return bool(
+            (lower >= current_lower).all() and (upper <= current_upper).all()
+        )
+
+    def tighten(self, bounds: Sequence[Tuple[float, float]]) -> "ActiveSet":
+        """The active set within a smaller box, pruning only the units
+        still ambiguous.
+
+        :param bounds: Bounds inside the current ones.
+        :type bounds: Sequence[Tuple[float, float]]
+        :return: A new, smaller active set.
+        :rtype: ActiveSet
+        """
+        if not self.contains(bounds):
+            raise ValueError(
+                f"Bounds {bounds} are not inside the pruned box "
+                f"{self.bounds}."
+            )
+        tightened = copy.copy(self)
+        tightened.slope = self.slope.copy()
+        tightened._prune(bounds)
+        return tightened
+
+    def __len__(self) -> int:
+        return len(self.gap)
+
+    def __call__(self, amounts: np.ndarray) -> np.ndarray:
+        """Values of candidate amount vectors inside the box.
+
+        :param amounts: (candidates, 4) amounts.
+        :type amounts: np.ndarray
+        :return: One value per candidate.
+        :rtype: np.ndarray
+        """
+        amounts = np.atleast_2d(np.asarray(amounts, dtype=float))
+        if not len(amounts):
+            return np.empty(0)
+        block = max(1, 2**24 // max(len(self), 1))
+        return (
+            self.constant
+            + amounts @ self.slope
+            + np.concatenate(
+                [
+                    self.coefficients
+                    @ np.maximum(
+                        0,
+                        self.gap[:, None]
+                        - self.gradient @ amounts[i : i + block].T,
+                    )
+                    for i in range(0, len(amounts), block)
+                ]
+            )
+        )
+
+    def solve_linear_program(self) -> np.ndarray:
+        """Exact optimum within the box, with one slack variable per
+        ambiguous unit: minimise slope @ x + c @ s subject to s >= gap -
+        gradient @ x, s >= 0 and spending @ x <= funding, so that the
+        residual band's amount is not negative.
+
+        :return: Optimal amounts.
+        :rtype: np.ndarray
+        """
+        n_units, n_amounts = self.gradient.shape
+        costs = np.concatenate([self.slope, self.coefficients])
+        # Costs and the funding row are rescaled so that HiGHS's absolute
+        # tolerances do not stop it short; interior point is much faster
+        # than simplex with a column per unit.
+        scale = np.abs(costs).max() or 1.0
+        funding_scale = max(abs(self.funding), 1.0)
+        budget = sparse.hstack(
+            [
+                sparse.csr_matrix(self.spending / funding_scale),
+                sparse.csr_matrix((1, n_units)),
+            ]
+        )
+        constraints = sparse.vstack(
+            [
+                sparse.hstack(
+                    [
+                        sparse.csr_matrix(-self.gradient),
+                        -sparse.identity(n_units, format="csr"),
+                    ]
+                ),
+                budget,
+            ]
+        ).tocsr()
+        result = linprog(
+            costs / scale,
+            A_ub=constraints,
+            b_ub=np.append(-self.gap, self.funding / funding_scale),
+            bounds=self.bounds + [(0, None)] * n_units,
+            method="highs-ipm",
+        )
+        if not result.success:
+            raise RuntimeError(f"Linear program failed: {result.message}")
+        return result.x[:n_amounts]
+
+
+def _mean_percentage_loss(units: UnitArrays):
+    coefficients = units.person_weight / np.maximum(
+        INCOME_FLOOR, units.baseline
+    )
+    return coefficients / units.person_weight.sum(), units.baseline
+
+
+def _mean_dollar_loss(units: UnitArrays):
+    return units.weight / units.person_weight.sum(), units.baseline
+
+
+def _poverty_gap(units: UnitArrays):
+    return units.weight, units.threshold
+
+
+def _share_losing_over_5pct(units: UnitArrays, net_income: np.ndarray):
+    losing = units.percentage_loss(net_income) > 0.05
+    return units.person_weight @ losing / units.person_weight.sum()
+
+
+def _poverty_rate(units: UnitArrays, net_income: np.ndarray):
+    poor = net_income < units.threshold[:, None]
+    return units.person_weight @ poor / units.person_weight.sum()
+
+
+def _log_utility(income: np.ndarray) -> np.ndarray:
+    # Log income, continued linearly below the floor so it stays concave
+    # and penalises losses there instead of capping them.
+    floor = INCOME_FLOOR
+    return (
+        np.log(np.maximum(income, floor))
+        + np.minimum(income - floor, 0) / floor
+    )
+
+
+def _log_utility_loss(units: UnitArrays, net_income: np.ndarray):
+    utility_loss = _log_utility(units.baseline)[:, None] - _log_utility(
+        net_income
+    )
+    return units.person_weight @ utility_loss / units.person_weight.sum()
+
+
+OBJECTIVES: Dict[str, Objective] = dict(
+    mean_percentage_loss=Objective(
+        hinge=_mean_percentage_loss,
+        description="Mean loss per person as a share of baseline net "
+        "income (floored at $100).",
+    ),
+    mean_dollar_loss=Objective(
+        hinge=_mean_dollar_loss,
+        description="Mean dollar loss of SPM units, per person.",
+    ),
+    poverty_gap=Objective(
+        hinge=_poverty_gap,
+        description="Total SPM poverty gap in dollars.",
+    ),
+    share_losing_over_5pct=Objective(
+        _share_losing_over_5pct,
+        description="Share of people losing more than 5% of net income.",
+    ),
+    poverty_rate=Objective(
+        _poverty_rate, description="SPM poverty rate of people."
+    ),
+    log_utility_loss=Objective(
+        _log_utility_loss,
+        convex=True,
+        description="Mean fall in log net income per person, linear below "
+        "$100.",
+    ),
+)
+
+
+def get_objective(name: str) -> Objective:
+    """Looks up an objective.
+
+    :param name: Name in ``OBJECTIVES``.
+    :type name: str
+    :return: The objective.
+    :rtype: Objective
+    """
+    if name not in OBJECTIVES:
+        raise ValueError(
+            f"Unknown objective {name!r}, expected one of "
+            f"{', '.join(OBJECTIVES)}"
+        )
+    return OBJECTIVES[name]
+
+
+def polish_amounts(
+    units: UnitArrays,
+    objective: Objective,
+    amounts: Sequence[float],
+    bounds: Sequence[Tuple[float, float]],
+    max_moves: int = 1000,
+) -> Tuple[np.ndarray, float]:
+    """Whole-dollar amounts near continuous ones, from rounding them and
+    then moving one amount by a dollar at a time while that improves the
+    objective. The residual band's amount is rounded down at every step,
+    so the reform never spends more than the funding, and moves that would
+    make it negative are not taken. It is not exactly
+    budget-neutral: up to a dollar per person of the residual band is left
+    unspent, which ``BlankSlatePolicy.unspent_funding`` reports.
+
+    Hinge objectives are updated incrementally: a move only changes the
+    net income of units with people in the moved or residual band.
+
+    :param units: Unit arrays of the policy.
+    :type units: UnitArrays
+    :param objective: Objective to polish for.
+    :type objective: Objective
+    :param amounts: Continuous amounts of the first four bands.
+    :type amounts: Sequence[float]
+    :param bounds: Bounds of the four amounts.
+    :type bounds: Sequence[Tuple[float, float]]
+    :param max_moves: Most dollar moves to make, defaults to 1,000.
+    :type max_moves: int
+    :return: The five whole-dollar amounts and the objective under them.
+    :rtype: Tuple[np.ndarray, float]
+    """
+    lower, upper = np.transpose(bounds)
+    x = np.clip(np.round(amounts), np.ceil(lower), np.floor(upper))
+    if units.residual_amount(x) < 0:
+        # Rounding up can overspend amounts that spend all the funding.
+        x = np.clip(np.floor(amounts), np.ceil(lower), np.floor(upper))
+    full = np.append(x, units.residual_amount(x))
+    net_income = units.net_income(full)[:, 0]
+    if objective.linear_program:
+        coefficients, targets = objective.hinge(units)
+    value = objective.function(units, net_income[:, None])[0]
+    # Units each move touches: those with people in the band or residual.
+    members = [
+        np.flatnonzero(units.counts[:, band] + units.counts[:, -1])
+        for band in range(len(x))
+    ]
+    for _ in range(max_moves):
+        best = None, 0.0
+        for band, step in [(b, s) for b in range(len(x)) for s in (-1, 1)]:
+            moved = x.copy()
+            moved[band] += step
+            if not lower[band] <= moved[band] <= upper[band]:
+                continue
+            residual = units.residual_amount(moved)
+            if residual < 0:
+                continue
+            residual_step = residual - full[-1]
+            idx = members[band]
+            change = (
+                step * units.counts[idx, band]
+                + residual_step * units.counts[idx, -1]
+            )
+            if objective.linear_program:
+                gap = targets[idx] - net_income[idx]
+                delta = coefficients[idx] @ (
+                    np.maximum(0, gap - change) - np.maximum(0, gap)
+                )
+            else:
+                candidate = net_income.copy()
+                candidate[idx] += change
+                delta = (
+                    objective.function(units, candidate[:, None])[0] - value
+                )
+            # Ignore changes within rounding error, which could cycle.
+            if delta < min(best[1], -1e-12 * abs(value)):
+                best = (band, step, residual_step, idx, change), delta
+        if best[0] is None:
+            break
+        (band, step, residual_step, idx, change), delta = best
+        x[band] += step
+        full = np.append(x, full[-1] + residual_step)
+        net_income[idx] += change
+        value += delta
+    # Recomputed in full so the value is exactly the published amounts'.
+    value = objective(units, full)[0]
+    return full, float(value)
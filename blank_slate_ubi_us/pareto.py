@@ -0,0 +1,183 @@
+"""
+The trade-off between mean percentage loss and the SPM poverty rate across
+age-band UBI amounts, at one flat tax rate.
+
+A single population-based search (differential evolution variation with
+non-dominated sorting and crowding selection, as in NSGA-II) evaluates
+every generation's candidates together through
+``BlankSlatePolicy.objectives`` and keeps an archive of the non-dominated
+amount vectors it finds. Candidates that spend more than the funding, so
+that the residual senior amount would be negative, rank below every
+feasible one, by how much they overspend, and never enter the archive.
+
+    frontier = pareto_frontier(BlankSlatePolicy(0.4), seed=0)
+"""
+
+from typing import List
+import numpy as np
+import pandas as pd
+from blank_slate_ubi_us.policy import AGE_BANDS, AMOUNT_BOUNDS
+
+OBJECTIVES = ("mean_percentage_loss", "poverty_rate")
+
+
+def non_dominated(points: np.ndarray) -> np.ndarray:
+    """Which points no other point is at least as good as in every
+    objective and better in one, for minimised objectives.
+
+    :param points: (points, objectives) matrix.
+    :type points: np.ndarray
+    :return: Boolean mask of the non-dominated points.
+    :rtype: np.ndarray
+    """
+    no_worse = (points[:, None, :] <= points[None, :, :]).all(axis=-1)
+    better = (points[:, None, :] < points[None, :, :]).any(axis=-1)
+    return ~(no_worse & better).any(axis=0)
+
+
+def _fronts(points: np.ndarray) -> np.ndarray:
+    # Front number of each point: 0 for the non-dominated set, 1 for the
+    # non-dominated set of the rest, and so on.
+    front = np.full(len(points), -1)
+    remaining = np.arange(len(points))
+    number = 0
+    while len(remaining):
+        mask = non_dominated(points[remaining])
+        front[remaining[mask]] = number
+        remaining = remaining[~mask]
+        number += 1
+    return front
+
+
+def _crowding(points: np.ndarray) -> np.ndarray:
+    # Sum over objectives of the normalised gap between each point's
+    # neighbours; boundary points are kept first.
+    distance = np.zeros(len(points))
+    for values in points.T:
+        order = np.argsort(values)
+        spread = values[order[-1]] - values[order[0]]
+        distance[order[[0, -1]]] = np.inf
+        if spread > 0 and len(points) > 2:
+            distance[order[1:-1]] += (
+                values[order[2:]] - values[order[:-2]]
+            ) / spread
+    return distance
+
+
+def _overspend(policy, amounts: np.ndarray) -> np.ndarray:
+    # Spending of each candidate beyond the funding, as a share of it, or
+    # zero for feasible candidates.
+    funding = max(policy.ubi_funding, 0)
+    spent = amounts @ policy.band_totals()[:4]
+    return np.maximum(spent - funding, 0) / max(funding, 1)
+
+
+def _select(
+    points: np.ndarray, overspend: np.ndarray, size: int
+) -> np.ndarray:
+    # Feasible candidates by front then crowding, then infeasible ones by
+    # how much they overspend.
+    feasible = overspend == 0
+    front = np.full(len(points), len(points))
+    front[feasible] = _fronts(points[feasible])
+    crowding = np.zeros(len(points))
+    for number in np.unique(front[feasible]):
+        members = front == number
+        crowding[members] = _crowding(points[members])
+    return np.lexsort((-crowding, overspend, front))[:size]
+
+
+def _offspring(
+    population: np.ndarray,
+    rng: np.random.Generator,
+    mutation: float,
+    recombination: float,
+) -> np.ndarray:
+    # DE/rand/1/bin: each parent is crossed with a mutant of three others.
+    size, dimensions = population.shape
+    others: List[np.ndarray] = [
+        rng.choice(np.delete(np.arange(size), i), 3, replace=False)
+        for i in range(size)
+    ]
+    a, b, c = (population[idx] for idx in np.transpose(others))
+    mutant = a + mutation * (b - c)
+    cross = rng.random((size, dimensions)) < recombination
+    cross[np.arange(size), rng.integers(dimensions, size=size)] = True
+    lower, upper = np.transpose(AMOUNT_BOUNDS)
+    return np.clip(np.where(cross, mutant, population), lower, upper)
+
+
+def pareto_frontier(
+    policy,
+    population: int = 64,
+    generations: int = 100,
+    seed: int = None,
+    mutation: float = 0.5,
+    recombination: float = 0.7,
+) -> pd.DataFrame:
+    """Non-dominated UBI amounts trading off mean percentage loss against
+    the SPM poverty rate, for one policy's flat tax rate.
+
+    The search starts from random amounts within the funding, the equal
+    per-person amount and any amounts the policy has been solved for.
+    Every amount vector returned leaves a non-negative senior amount.
+
+    :param policy: Policy to search, built with its funding reform.
+    :type policy: BlankSlatePolicy
+    :param population: Candidates per generation, defaults to 64.
+    :type population: int
+    :param generations: Number of generations, defaults to 100.
+    :type generations: int
+    :param seed: Random seed, defaults to none.
+    :type seed: int, optional
+    :param mutation: Differential weight, defaults to 0.5.
+    :type mutation: float
+    :param recombination: Crossover probability, defaults to 0.7.
+    :type recombination: float
+    :return: One row per non-dominated amount vector, sorted by loss, with
+        the amount of each age band (the senior amount being the residual)
+        and both objectives.
+    :rtype: pd.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    lower, upper = np.transpose(AMOUNT_BOUNDS)
+    bands = list(AGE_BANDS)[:4]
+    starts = [[policy.equal_amount()] * 4]
+    if any(getattr(policy, band) for band in bands):
+        starts.append([getattr(policy, band) for band in bands])
+    amounts = np.vstack(
+        [
+            np.clip(starts, lower, upper),
+            policy.random_amounts(rng, population - len(starts)),
+        ]
+    )
+    points = policy.objectives(amounts)
+    overspend = _overspend(policy, amounts)
+    feasible = overspend == 0
+    archive_amounts, archive_points = amounts[feasible], points[feasible]
+    for _ in range(generations):
+        children = _offspring(amounts, rng, mutation, recombination)
+        child_points = policy.objectives(children)
+        child_overspend = _overspend(policy, children)
+        amounts = np.vstack([amounts, children])
+        points = np.vstack([points, child_points])
+        overspend = np.concatenate([overspend, child_overspend])
+        keep = _select(points, overspend, population)
+        amounts, points = amounts[keep], points[keep]
+        overspend = overspend[keep]
+        feasible = child_overspend == 0
+        archive_amounts = np.vstack([archive_amounts, children[feasible]])
+        archive_points = np.vstack([archive_points, child_points[feasible]])
+        mask = non_dominated(archive_points)
+        archive_amounts = archive_amounts[mask]
+        archive_points = archive_points[mask]
+    frontier = pd.DataFrame(archive_amounts, columns=bands)
+    frontier["senior"] = [
+        policy.get_senior_amount(*x) for x in archive_amounts
+    ]
+    frontier[list(OBJECTIVES)] = archive_points
+    return (
+        frontier.drop_duplicates(list(OBJECTIVES))
+        .sort_values(list(OBJECTIVES))
+        .reset_index(drop=True)
+    )
@@ -0,0 +1,174 @@
+"""
+Simulations of a chosen year, and a cache of simulations and extracted
+arrays keyed by reform spec, for multi-year analyses.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+# Reform parameters are set for this year unless another is chosen.
+DEFAULT_YEAR = 2023
+
+
+def reform_period(year: int = None) -> str:
+    """Period that reform parameter changes apply to.
+
+    :param year: Year, defaults to ``DEFAULT_YEAR``.
+    :type year: int, optional
+    :return: Period string, e.g. "year:2023:1".
+    :rtype: str
+    """
+    return f"year:{year or DEFAULT_YEAR}:1"
+
+
+class SimulationYear:
+    """A simulation whose ``calc`` and ``calculate`` default to one year,
+    so code that calls them without a period, such as the charts, reads
+    that year. Everything else is passed through to the simulation.
+
+    :param simulation: Simulation to read from.
+    :type simulation: Microsimulation
+    :param year: Year to calculate variables for.
+    :type year: int
+    """
+
+    def __init__(self, simulation: Any, year: int):
+        self.simulation = simulation
+        self.year = year
+
+    def calc(self, variable: str, *args, period: Any = None, **kwargs):
+        return self.simulation.calc(
+            variable, *args, period=period or self.year, **kwargs
+        )
+
+    def calculate(self, variable: str, *args, period: Any = None, **kwargs):
+        return self.simulation.calculate(
+            variable, *args, period=period or self.year, **kwargs
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.simulation, name)
+
+
+def at_year(simulation: Any, year: int = None) -> Any:
+    """Reads a simulation at a year.
+
+    :param simulation: Simulation to read from.
+    :type simulation: Microsimulation
+    :param year: Year, defaults to the simulation's own default period.
+    :type year: int, optional
+    :return: The simulation, wrapped in a SimulationYear if a year is
+        given.
+    :rtype: Any
+    """
+    return simulation if year is None else SimulationYear(simulation, year)
+
+
+class SimulationCache:
+    """Simulation factory that keeps the simulations it builds, and arrays
+    extracted from them, keyed by the content hash of their reform's spec,
+    which includes its periods. Policies built from one cache at different
+    flat tax rates share the baseline simulation and its arrays.
+
+    :param simulation: Factory to wrap, taking ``reform``, defaults to
+        PolicyEngine US.
+    :type simulation: Callable, optional
+    :param max_simulations: Simulations to keep, least recently used
+        first out, defaults to 4. Arrays are kept regardless.
+    :type max_simulations: int
+    """
+
+    def __init__(self, simulation: Callable = None, max_simulations: int = 4):
+        if simulation is None:
+            from blank_slate_ubi_us.policy import Microsimulation
+
+            simulation = Microsimulation
+        self.factory = simulation
+        self.dataset_key = getattr(simulation, "dataset_key", None)
+        self.max_simulations = max_simulations
+        self._simulations = OrderedDict()
+        self._arrays = {}
+
+    @staticmethod
+    def reform_key(reform: Any) -> tuple:
+        """Cache key of a reform built from a ReformSpec.
+
+        :param reform: Reform class.
+        :type reform: Type[Reform]
+        :return: Content hash of the reform's spec.
+        :rtype: tuple
+        """
+        spec = getattr(reform, "spec", None)
+        if spec is not None:
+            return (spec.key,)
+        # Reforms not built from a spec are only equal to themselves.
+        return (id(reform),)
+
+    def __call__(self, reform: Any = None, **kwargs) -> Any:
+        if kwargs:
+            return self.factory(reform=reform, **kwargs)
+        return self.get(
+            self.reform_key(reform), lambda: self.factory(reform=reform)
+        )
+
+    def get(self, key: Hashable, build: Callable) -> Any:
+        """A simulation built once per key, e.g. by another factory.
+
+        :param key: Cache key of the simulation.
+        :type key: Hashable
+        :param build: Builds the simulation.
+        :type build: Callable
+        :return: The cached simulation.
+        :rtype: Any
+        """
+        if key in self._simulations:
+            self._simulations.move_to_end(key)
+        else:
+            self._simulations[key] = build()
+            if len(self._simulations) > self.max_simulations:
+                self._simulations.popitem(last=False)
+        return self._simulations[key]
+
+    def __contains__(self, reform: Any) -> bool:
+        return self.reform_key(reform) in self._simulations
+
+    def release(self, reform: Any) -> None:
+        """Drops the simulation of a reform, keeping its arrays.
+
+        :param reform: Reform whose simulation to drop.
+        :type reform: Type[Reform]
+        """
+        self._simulations.pop(self.reform_key(reform), None)
+
+    def memo(
+        self,
+        reform: Any,
+        name: Hashable,
+        compute: Callable,
+        year: int = None,
+    ) -> Any:
+        """Arrays computed from the simulation of a reform, computed once.
+
+        :param reform: Reform the arrays come from.
+        :type reform: Type[Reform]
+        :param name: Name of the arrays, including anything else they
+            depend on.
+        :type name: Hashable
+        :param compute: Computes the arrays.
+        :type compute: Callable
+        :param year: Year the arrays are read at, if not the simulation's
+            default period. Keyed apart from the reform, whose spec is the
+            same for no year and the default year.
+        :type year: int, optional
+        :return: The cached arrays.
+        :rtype: Any
+        """
+        key = self.reform_key(reform) + (year, name)
+        if key not in self._arrays:
+            self._arrays[key] = compute()
+        return self._arrays[key]
+
+    def clear(self) -> None:
+        """Drops every cached simulation and array."""
+        self._simulations.clear()
+        self._arrays.clear()
@@ -1,41 +1,300 @@
 import pandas as pd
 import numpy as np
-from scipy.optimize import differential_evolution
-from policyengine_us import Microsimulation
-from policyengine_us.model_api import *
+import gc
+import hashlib
+import os
+import sys
+from functools import partial
+from importlib.metadata import PackageNotFoundError, version
+from typing import Any, Callable, Dict, Sequence, Tuple, Type
+from scipy.optimize import (
+    LinearConstraint,
+    differential_evolution,
+    minimize,
+)
+
+try:
+    from policyengine_us import Microsimulation
+    from policyengine_us.model_api import *
+except ImportError:
+    # Policies can still be built on synthetic microdata, see
+    # blank_slate_ubi_us.synthetic.
+    Microsimulation = None
+    Reform = object
+from blank_slate_ubi_us.instrumentation import SolverTrace, timed
+from blank_slate_ubi_us.objectives import (
+    DEFAULT_OBJECTIVE,
+    ActiveSet,
+    Objective,
+    UnitArrays,
+    get_objective,
+    polish_amounts,
+)
+from blank_slate_ubi_us.periods import (
+    SimulationCache,
+    at_year,
+    reform_period,
+)
+from blank_slate_ubi_us.reforms import ReformSpec
+from blank_slate_ubi_us.store import ResultStore
+
+
+def model_version() -> str:
+    try:
+        return version("policyengine-us")
+    except PackageNotFoundError:
+        return None
+
+
+def package_version() -> str:
+    try:
+        return version("blank_slate_ubi_us")
+    except PackageNotFoundError:
+        return None
+
+
+PERIOD = reform_period()
+
+# Just the SNAP EA abolition
+BASELINE_PARAMETERS = {
+    "gov.usda.snap.emergency_allotment.allowed": False,
+}
 
-def create_baseline_reform() -> Type[Reform]:
-    # Just the SNAP EA abolition
-    def modify_parameters(parameters):
-        parameters.gov.usda.snap.emergency_allotment.allowed.update(period="year:2023:1", value=False)
-        return parameters
-    
-    class baseline_reform(Reform):
-        def apply(self):
-            self.modify_parameters(modify_parameters)
 
-    return baseline_reform
+def funding_parameters(
+    flat_tax_rate: float, overrides: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    # Overrides replace or add parameter changes, e.g. keeping WIC with
+    # {"gov.usda.wic.abolish_wic": False}.
+    return {
+        "gov.contrib.ubi_center.flat_tax.abolish_federal_income_tax": True,
+        "gov.contrib.ubi_center.flat_tax.abolish_payroll_tax": True,
+        "gov.contrib.ubi_center.flat_tax.abolish_self_emp_tax": True,
+        "gov.hud.abolition": True,
+        "gov.hhs.tanf.abolish_tanf": True,
+        "gov.ssa.ssi.abolish_ssi": True,
+        "gov.usda.snap.abolish_snap": True,
+        "gov.usda.wic.abolish_wic": True,
+        "gov.contrib.ubi_center.flat_tax.rate": flat_tax_rate,
+        "gov.contrib.ubi_center.flat_tax.deduct_ptc": True,
+        "gov.usda.snap.emergency_allotment.allowed": False,
+        **(overrides or {}),
+    }
+
+
+def baseline_spec(year: int = None) -> ReformSpec:
+    return ReformSpec.from_values(BASELINE_PARAMETERS, year)
+
+
+def funding_spec(
+    flat_tax_rate: float, overrides: Dict[str, Any] = None, year: int = None
+) -> ReformSpec:
+    return ReformSpec.from_values(
+        funding_parameters(flat_tax_rate, overrides), year
+    )
+
+
+# Reform classes by spec key, so that identical specs share a class.
+_REFORMS: Dict[str, Type[Reform]] = {}
+
+
+def reform_from_spec(spec: ReformSpec, name: str = "reform") -> Type[Reform]:
+    if spec.key in _REFORMS:
+        return _REFORMS[spec.key]
 
-def create_funding_reform(flat_tax_rate: float) -> Type[Reform]:
     def modify_parameters(parameters):
-        parameters.gov.contrib.ubi_center.flat_tax.abolish_federal_income_tax.update(period="year:2023:1", value=True)
-        parameters.gov.contrib.ubi_center.flat_tax.abolish_payroll_tax.update(period="year:2023:1", value=True)
-        parameters.gov.contrib.ubi_center.flat_tax.abolish_self_emp_tax.update(period="year:2023:1", value=True)
-        parameters.gov.hud.abolition.update(period="year:2023:1", value=True)
-        parameters.gov.hhs.tanf.abolish_tanf.update(period="year:2023:1", value=True)
-        parameters.gov.ssa.ssi.abolish_ssi.update(period="year:2023:1", value=True)
-        parameters.gov.usda.snap.abolish_snap.update(period="year:2023:1", value=True)
-        parameters.gov.usda.wic.abolish_wic.update(period="year:2023:1", value=True)
-        parameters.gov.contrib.ubi_center.flat_tax.rate.update(period="year:2023:1", value=flat_tax_rate)
-        parameters.gov.contrib.ubi_center.flat_tax.deduct_ptc.update(period="year:2023:1", value=True)
-        parameters.gov.usda.snap.emergency_allotment.allowed.update(period="year:2023:1", value=False)
+        for path, period, value in spec.changes():
+            parameter = parameters
+            # Brackets of scales are indexed, as in "by_age[0].amount".
+            for child in path.split("."):
+                name, _, index = child.partition("[")
+                parameter = getattr(parameter, name)
+                if index:
+                    parameter = parameter[int(index[:-1])]
+            parameter.update(period=period, value=value)
         return parameters
-    
-    class funding_reform(Reform):
-        def apply(self):
-            self.modify_parameters(modify_parameters)
 
-    return funding_reform
+    def apply(self):
+        self.modify_parameters(modify_parameters)
+
+    # The spec, and the values and period for simulations that read them
+    # directly, such as synthetic ones, are kept on the class.
+    _REFORMS[spec.key] = type(
+        name,
+        (Reform,),
+        dict(
+            apply=apply,
+            spec=spec,
+            parameter_values=spec.values(),
+            period=(spec.periods or [PERIOD])[0],
+        ),
+    )
+    return _REFORMS[spec.key]
+
+
+def create_parameter_reform(
+    values: Dict[str, Any], name: str = "reform", year: int = None
+) -> Type[Reform]:
+    return reform_from_spec(ReformSpec.from_values(values, year), name)
+
+
+def create_baseline_reform(year: int = None) -> Type[Reform]:
+    return reform_from_spec(baseline_spec(year), "baseline_reform")
+
+
+def create_funding_reform(
+    flat_tax_rate: float, overrides: Dict[str, Any] = None, year: int = None
+) -> Type[Reform]:
+    return reform_from_spec(
+        funding_spec(flat_tax_rate, overrides, year), "funding_reform"
+    )
+
+
+# Lower (inclusive) and upper (exclusive) age of each UBI group.
+AGE_BANDS = dict(
+    young_child=(0, 6),
+    older_child=(6, 18),
+    young_adult=(18, 25),
+    adult=(25, 65),
+    senior=(65, np.inf),
+)
+
+# Solved reforms name each band's amount; PolicyEngine US pays it through
+# one bracket of the age scale of the UBI, with the band's lower age as its
+# threshold.
+REFORM_AMOUNTS = dict(
+    young_child="young_child_bi_amount",
+    older_child="older_child_bi_amount",
+    young_adult="young_adult_bi_amount",
+    adult="older_adult_bi_amount",
+    senior="senior_bi_amount",
+)
+UBI_SCALE = "gov.contrib.ubi_center.basic_income.amount.person.by_age"
+UBI_PARAMETERS = {
+    band: f"{UBI_SCALE}[{i}].amount" for i, band in enumerate(AGE_BANDS)
+}
+
+
+def solved_parameters(reform: Dict[str, Any]) -> Dict[str, Any]:
+    # Parameter changes of a reform returned by BlankSlatePolicy.solve.
+    bands = {name: band for band, name in REFORM_AMOUNTS.items()}
+    parameters = {
+        f"{UBI_SCALE}[{i}].threshold": lower
+        for i, (lower, _) in enumerate(AGE_BANDS.values())
+    }
+    for path, value in reform.items():
+        if path in bands:
+            path = UBI_PARAMETERS[bands[path]]
+        parameters[path] = value
+    return parameters
+
+
+def create_solved_reform(
+    reform: Dict[str, Any], year: int = None
+) -> Type[Reform]:
+    return reform_from_spec(
+        ReformSpec.from_values(solved_parameters(reform), year),
+        "solved_reform",
+    )
+
+
+AMOUNT_BOUNDS = [(0, 15e4)] * 4
+
+# Defaults of BlankSlatePolicy.loss_distribution: losses are shares of
+# baseline net income.
+LOSS_THRESHOLDS = (0, 0.05, 0.1)
+LOSS_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+LOSS_BINS = (0, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, np.inf)
+# Steps, in dollars, that BlankSlatePolicy.sensitivities reports changes
+# per: added to one band's amount, and to the funding pool.
+AMOUNT_STEP = 100
+FUNDING_STEP = 1e9
+# "auto" picks the fastest method the objective allows, see
+# blank_slate_ubi_us.objectives.
+SOLVER_METHODS = (
+    "auto",
+    "linprog",
+    "differential_evolution",
+    "powell",
+    "nelder-mead",
+)
+
+
+def solve_inputs(
+    flat_tax_rate: float,
+    method: str = "auto",
+    maxiter: int = int(1e3),
+    seed: int = None,
+    overrides: Dict[str, Any] = None,
+    plateau: int = None,
+    min_improvement: float = 0.0,
+    dataset: str = None,
+    x0: Sequence[float] = None,
+    year: int = None,
+    objective: str = DEFAULT_OBJECTIVE,
+    polish: bool = True,
+    bounds: Sequence[Tuple[float, float]] = AMOUNT_BOUNDS,
+) -> dict:
+    # Everything a solved reform depends on, used as its ResultStore key.
+    solver = dict(
+        method=method,
+        maxiter=maxiter,
+        seed=seed,
+        bounds=[list(bound) for bound in bounds],
+        plateau=plateau,
+        min_improvement=min_improvement,
+    )
+    if x0 is not None:
+        # Only keyed when given, so cold-start keys are unchanged.
+        solver["x0"] = [float(x) for x in x0]
+    if objective != DEFAULT_OBJECTIVE:
+        solver["objective"] = objective
+    if polish:
+        # Keyed when set, so unpolished solutions stored before polishing
+        # existed are not read back as polished ones.
+        solver["polish"] = True
+    return dict(
+        dataset=dataset,
+        baseline=baseline_spec(year).key,
+        funding=funding_spec(flat_tax_rate, overrides, year).key,
+        age_bands=AGE_BANDS,
+        solver=solver,
+        model_version=model_version(),
+    )
+
+
+# Candidate dtypes for lean policies, smallest first. Float columns stay
+# float64 so the objective is still computed in double precision.
+LEAN_DTYPES = ("uint8", "uint16", "uint32")
+
+
+def downcast_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Each column takes the smallest dtype that holds its values exactly.
+    columns = {}
+    for name, values in df.items():
+        columns[name] = values
+        if not np.isfinite(values).all() or (values < 0).any():
+            continue
+        for dtype in LEAN_DTYPES:
+            cast = values.astype(dtype)
+            if (cast == values).all():
+                columns[name] = cast
+                break
+    return pd.DataFrame(columns)
+
+
+def resident_memory() -> int:
+    # Current resident set size in bytes, or the peak where unavailable.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes.
+        return peak if sys.platform == "darwin" else peak * 1024
+
 
 class BlankSlatePolicy:
     young_child: float = 0
@@ -44,42 +303,163 @@ class BlankSlatePolicy:
     adult: float = 0
     senior: float = 0
     flat_tax_rate: float = 0.40
+    # Whether the unit arrays are held in memory, so objectives can be
+    # evaluated in batches and solved as linear programs.
+    in_memory: bool = True
+    # Hash of replacement SPM unit weights, see reweight.
+    weights_key: str = None
 
-    def __init__(self, flat_tax_rate: float = 0.40):
-        self.baseline = Microsimulation(reform=create_baseline_reform())
-        self.blank_slate_funded = Microsimulation(reform=create_funding_reform(flat_tax_rate))
-        self.df = self.create_dataframe()
-        self.ubi_funding = self.get_ubi_funding()
+    def __init__(
+        self,
+        flat_tax_rate: float = 0.40,
+        overrides: Dict[str, Any] = None,
+        lean: bool = False,
+        simulation: Callable = None,
+        year: int = None,
+    ):
+        self.flat_tax_rate = flat_tax_rate
+        # Year of the reforms and of every variable read, defaulting to
+        # 2023 reforms read at the simulation's default period.
+        self.year = year
+        self.overrides = overrides
+        # Parameter changes the solved amounts are added to.
+        self.base_reform = funding_parameters(flat_tax_rate, overrides)
+        # Builds a simulation from a reform, defaulting to PolicyEngine US
+        # on its default dataset.
+        self.simulation = simulation or Microsimulation
+        self.dataset = getattr(simulation, "dataset_key", None)
+        self._baseline = None
+        self._blank_slate_funded = None
+        self._units = None
+        self._active_sets = {}
+        # Seconds spent in each stage. Simulations are built lazily, so
+        # their build time is also part of create_dataframe.
+        self.timings = {}
+        with timed(self.timings, "create_dataframe"):
+            self.df = self.create_dataframe()
+        with timed(self.timings, "get_ubi_funding"):
+            self.ubi_funding = self.get_ubi_funding()
+        if lean:
+            # Keep only the arrays the solver needs.
+            self.df = downcast_frame(self.df)
+            self.release_simulations()
 
-    def create_dataframe(self) -> pd.DataFrame:
+    @property
+    def baseline(self) -> Microsimulation:
+        # Rebuilt on access if released.
+        if self._baseline is None:
+            with timed(self.timings, "baseline_simulation"):
+                self._baseline = at_year(
+                    self.simulation(reform=create_baseline_reform(self.year)),
+                    self.year,
+                )
+        return self._baseline
+
+    @property
+    def blank_slate_funded(self) -> Microsimulation:
+        if self._blank_slate_funded is None:
+            with timed(self.timings, "funded_simulation"):
+                self._blank_slate_funded = at_year(
+                    self.simulation(
+                        reform=create_funding_reform(
+                            self.flat_tax_rate, self.overrides, self.year
+                        )
+                    ),
+                    self.year,
+                )
+        return self._blank_slate_funded
+
+    def reformed_simulation(self, reform: Dict[str, Any]) -> Microsimulation:
+        """Simulation of a solved reform in the policy's year.
+
+        The simulation is built by the policy's simulation factory, as its
+        funded simulation is, so a SimulationCache shares it.
+
+        :param reform: Reform returned by ``solve``.
+        :type reform: Dict[str, Any]
+        :return: Simulation under the reform.
+        :rtype: Microsimulation
+        """
+        return at_year(
+            self.simulation(reform=create_solved_reform(reform, self.year)),
+            self.year,
+        )
+
+    def _simulation_reforms(self) -> Dict[str, Type[Reform]]:
+        return dict(
+            baseline=create_baseline_reform(self.year),
+            blank_slate_funded=create_funding_reform(
+                self.flat_tax_rate, self.overrides, self.year
+            ),
+        )
+
+    def _holds_simulation(self, name: str, reform: Type[Reform]) -> bool:
+        if getattr(self, "_" + name) is not None:
+            return True
+        return isinstance(self.simulation, SimulationCache) and (
+            reform in self.simulation
+        )
+
+    def release_simulations(self) -> None:
+        # A SimulationCache drops them too, keeping only its arrays, or
+        # the simulations would outlive the release.
+        self._baseline = None
+        self._blank_slate_funded = None
+        if isinstance(self.simulation, SimulationCache):
+            for reform in self._simulation_reforms().values():
+                self.simulation.release(reform)
+        gc.collect()
+
+    def memory_report(self) -> Dict[str, Any]:
+        return dict(
+            dataframe_bytes=int(self.df.memory_usage(deep=True).sum()),
+            dtypes=self.df.dtypes.astype(str).to_dict(),
+            simulations_held=[
+                name
+                for name, reform in self._simulation_reforms().items()
+                if self._holds_simulation(name, reform)
+            ],
+            resident_bytes=resident_memory(),
+        )
+
+    def baseline_columns(self) -> Dict[str, np.ndarray]:
+        # Columns that do not depend on the flat tax rate.
         age = self.baseline.calc("age").values
+        counts = {
+            f"count_{band}": self.baseline.map_result(
+                (age >= lower) & (age < upper), "person", "spm_unit"
+            )
+            for band, (lower, upper) in AGE_BANDS.items()
+        }
+        return dict(
+            baseline_net_income=self.baseline.calc(
+                "spm_unit_net_income"
+            ).values,
+            **counts,
+            count_person=self.baseline.map_result(
+                age >= 0, "person", "spm_unit"
+            ),
+            weight=self.baseline.calculate("spm_unit_weight").values,
+            spm_threshold=self.baseline.calc("spm_unit_spm_threshold").values,
+        )
+
+    def create_dataframe(self) -> pd.DataFrame:
+        if isinstance(self.simulation, SimulationCache):
+            # Shared by every policy built from the cache in this year.
+            columns = self.simulation.memo(
+                create_baseline_reform(self.year),
+                "policy_columns",
+                self.baseline_columns,
+                self.year,
+            )
+        else:
+            columns = self.baseline_columns()
         return pd.DataFrame(
             dict(
-                baseline_net_income=self.baseline.calc(
-                    "spm_unit_net_income"
-                ).values,
-                count_young_child=self.baseline.map_result(
-                    age < 6, "person", "spm_unit"
-                ),
-                count_older_child=self.baseline.map_result(
-                    (age >= 6) & (age < 18), "person", "spm_unit"
-                ),
-                count_young_adult=self.baseline.map_result(
-                    (age >= 18) & (age < 25), "person", "spm_unit"
-                ),
-                count_adult=self.baseline.map_result(
-                    (age >= 25) & (age < 65), "person", "spm_unit"
-                ),
-                count_senior=self.baseline.map_result(
-                    age >= 65, "person", "spm_unit"
-                ),
-                count_person=self.baseline.map_result(
-                    age >= 0, "person", "spm_unit"
-                ),
+                columns,
                 funded_net_income=self.blank_slate_funded.calculate(
                     "spm_unit_net_income"
                 ).values,
-                weight=self.baseline.calculate("spm_unit_weight").values,
             )
         )
 
@@ -89,6 +469,34 @@ class BlankSlatePolicy:
             * self.df.weight
         ).sum()
 
+    def reweight(self, weights: Sequence[float], **solve_kwargs) -> Any:
+        # Replaces the SPM unit weights, e.g. recalibrated to other
+        # population targets. Per-unit incomes do not depend on weights, so
+        # nothing is re-simulated: only the funding and the weighted totals
+        # are recomputed, in one pass. The policy is then solved under the
+        # new weights, iterative methods warm started from its amounts if
+        # it was solved before, and the solve's result returned.
+        # Simulations keep their own weights, so metrics read from them,
+        # such as the poverty rate change, are unaffected.
+        if not self.in_memory:
+            raise ValueError("Only in-memory policies can be reweighted.")
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape != (len(self.df),):
+            raise ValueError(
+                f"Expected {len(self.df)} SPM unit weights, got "
+                f"{weights.shape}."
+            )
+        self.df = self.df.assign(weight=weights)
+        self._units = None
+        self._active_sets = {}
+        self.weights_key = hashlib.sha256(weights.tobytes()).hexdigest()
+        with timed(self.timings, "get_ubi_funding"):
+            self.ubi_funding = self.get_ubi_funding()
+        previous = [getattr(self, band) for band in list(AGE_BANDS)[:4]]
+        if any(previous):
+            solve_kwargs.setdefault("x0", previous)
+        return self.solve(**solve_kwargs)
+
     def get_senior_amount(
         self,
         young_child: float,
@@ -104,17 +512,26 @@ class BlankSlatePolicy:
             - adult * (self.df.count_adult * self.df.weight).sum()
         ) / (self.df.count_senior * self.df.weight).sum()
 
-    def mean_percentage_loss(
+    def net_income(
         self,
         young_child: float,
         older_child: float,
         young_adult: float,
         adult: float,
-    ) -> float:
-        senior_amount = self.get_senior_amount(
-            young_child, older_child, young_adult, adult
+        senior: float = None,
+    ) -> pd.Series:
+        # Floats keep products with lean integer counts from overflowing.
+        young_child, older_child, young_adult, adult = map(
+            float, (young_child, older_child, young_adult, adult)
         )
-        final_net_income = (
+        # The senior amount defaults to the residual of the funding.
+        if senior is None:
+            senior_amount = self.get_senior_amount(
+                young_child, older_child, young_adult, adult
+            )
+        else:
+            senior_amount = float(senior)
+        return (
             self.df.funded_net_income
             + self.df.count_young_child * young_child
             + self.df.count_older_child * older_child
@@ -122,53 +539,487 @@ class BlankSlatePolicy:
             + self.df.count_adult * adult
             + self.df.count_senior * senior_amount
         )
+
+    def percentage_loss(
+        self,
+        young_child: float,
+        older_child: float,
+        young_adult: float,
+        adult: float,
+        senior: float = None,
+    ) -> pd.Series:
+        # Loss of each SPM unit as a share of its baseline net income,
+        # floored at $100.
+        final_net_income = self.net_income(
+            young_child, older_child, young_adult, adult, senior
+        )
         gain = final_net_income - self.df.baseline_net_income
         absolute_loss = np.maximum(0, -gain)
-        pct_loss = absolute_loss / np.maximum(100, self.df.baseline_net_income)
+        return absolute_loss / np.maximum(100, self.df.baseline_net_income)
+
+    def mean_percentage_loss(
+        self,
+        young_child: float,
+        older_child: float,
+        young_adult: float,
+        adult: float,
+        senior: float = None,
+    ) -> float:
+        pct_loss = self.percentage_loss(
+            young_child, older_child, young_adult, adult, senior
+        )
         average = np.average(
             pct_loss, weights=self.df.weight * self.df.count_person
         )
         return average
 
-    def solve(self, return_amounts: bool = False, return_loss: bool = False) -> dict:
+    def loss_distribution(
+        self,
+        young_child: float,
+        older_child: float,
+        young_adult: float,
+        adult: float,
+        senior: float = None,
+        thresholds: Sequence[float] = LOSS_THRESHOLDS,
+        quantiles: Sequence[float] = LOSS_QUANTILES,
+        bins: Sequence[float] = LOSS_BINS,
+    ) -> Dict[str, Any]:
+        # The mean loss with its person-weighted histogram, quantiles, and
+        # mean loss and shares losing more than each threshold overall and
+        # by age band, from one evaluation of the per-unit losses.
+        pct_loss = self.percentage_loss(
+            young_child, older_child, young_adult, adult, senior
+        ).values
+        counts = self.df[[f"count_{band}" for band in AGE_BANDS]].values
+        people = counts.astype(float) * self.df.weight.values[:, None]
+        people = np.column_stack([people, people.sum(axis=1)])
+        outcomes = np.column_stack(
+            [pct_loss] + [pct_loss > threshold for threshold in thresholds]
+        )
+        population = people.sum(axis=0)
+        by_band = pd.DataFrame(
+            (people.T @ outcomes) / population[:, None],
+            index=list(AGE_BANDS) + ["all"],
+            columns=["mean_loss"]
+            + [f"share_losing_over_{threshold:g}" for threshold in thresholds],
+        )
+        by_band.insert(0, "population", population)
+        weight = people[:, -1]
+        order = np.argsort(pct_loss)
+        cumulative = np.cumsum(weight[order]) / weight.sum()
+        positions = np.minimum(
+            np.searchsorted(cumulative, quantiles), len(order) - 1
+        )
+        histogram, edges = np.histogram(pct_loss, bins=bins, weights=weight)
+        return dict(
+            mean_loss=by_band.mean_loss["all"],
+            by_band=by_band,
+            quantiles=pd.Series(
+                pct_loss[order[positions]], index=list(quantiles)
+            ),
+            histogram=pd.DataFrame(
+                dict(
+                    lower=edges[:-1],
+                    upper=edges[1:],
+                    share=histogram / weight.sum(),
+                )
+            ),
+        )
+
+    @property
+    def units(self) -> UnitArrays:
+        # Compact per-SPM-unit arrays that objectives are evaluated on.
+        if self._units is None:
+            self._units = UnitArrays(
+                self.df, self.ubi_funding, list(AGE_BANDS)
+            )
+        return self._units
+
+    def active_set(
+        self,
+        objective: str = DEFAULT_OBJECTIVE,
+        bounds: Sequence[Tuple[float, float]] = AMOUNT_BOUNDS,
+    ) -> ActiveSet:
+        # Units of a hinge objective whose loss can change sign within the
+        # bounds. Pruned over the bounds passed in and kept per objective;
+        # boxes inside the kept one re-tighten it over the still ambiguous
+        # units, and any other box is pruned afresh and kept instead.
+        active = self._active_sets.get(objective)
+        if active is None or not active.contains(bounds):
+            active = self._active_sets[objective] = ActiveSet(
+                self.units, get_objective(objective), bounds
+            )
+        if [tuple(bound) for bound in bounds] == active.bounds:
+            return active
+        return active.tighten(bounds)
+
+    def objective_function(
+        self,
+        objective: str,
+        bounds: Sequence[Tuple[float, float]] = None,
+    ) -> Callable:
+        # Objective of the four amounts, each a float or, to evaluate a
+        # batch of candidates at once, an array. Given bounds, which the
+        # amounts must then stay inside, hinge objectives only evaluate the
+        # units of their active set.
+        spec = get_objective(objective)
+        if bounds is not None and spec.linear_program:
+            function = self.active_set(objective, bounds)
+        else:
+            function = partial(spec, self.units)
+
+        def evaluate(*amounts):
+            values = function(np.column_stack(amounts))
+            return values if np.ndim(amounts[0]) else float(values[0])
+
+        return evaluate
+
+    def objectives(
+        self,
+        amounts: np.ndarray,
+        names: Sequence[str] = ("mean_percentage_loss", "poverty_rate"),
+    ) -> np.ndarray:
+        # Objectives, by default mean percentage loss and SPM poverty rate,
+        # of each row of a (candidates, 4) matrix of young child, older
+        # child, young adult and adult amounts.
+        amounts = np.atleast_2d(np.asarray(amounts, dtype=float))
+        return np.column_stack(
+            [get_objective(name)(self.units, amounts) for name in names]
+        )
+
+    def polish(
+        self,
+        amounts: Sequence[float],
+        objective: str = DEFAULT_OBJECTIVE,
+        bounds: Sequence[Tuple[float, float]] = AMOUNT_BOUNDS,
+    ) -> np.ndarray:
+        # Whole-dollar amounts of all five bands near continuous amounts of
+        # the first four, the senior amount rounded down so the reform
+        # spends no more than the funding. In-memory policies search the
+        # dollar neighbourhood for the best under the objective.
+        if self.in_memory:
+            full, _ = polish_amounts(
+                self.units, get_objective(objective), amounts, bounds
+            )
+            return full
+        x = np.clip(np.round(amounts), *np.transpose(bounds))
+        if self.get_senior_amount(*x) < 0:
+            x = np.clip(np.floor(amounts), *np.transpose(bounds))
+        return np.append(x, np.floor(self.get_senior_amount(*x)))
+
+    def sensitivities(
+        self,
+        young_child: float = None,
+        older_child: float = None,
+        young_adult: float = None,
+        adult: float = None,
+        objective: str = DEFAULT_OBJECTIVE,
+    ) -> pd.DataFrame:
+        # Exact change in a hinge objective per AMOUNT_STEP added to each
+        # band, with the senior amount absorbing it, and per FUNDING_STEP
+        # added to the funding pool, from the units currently losing. At
+        # the continuous optimum of a linear program the increase and
+        # decrease columns are non-negative for amounts inside their
+        # bounds; polished whole-dollar amounts sit up to a dollar off it,
+        # so one of them can be slightly negative there. The funding row is
+        # what a higher flat tax rate buys through the pool. Amounts
+        # default to the solved ones.
+        x = [young_child, older_child, young_adult, adult]
+        x = [
+            getattr(self, band) if value is None else value
+            for band, value in zip(AGE_BANDS, x)
+        ]
+        subgradient = get_objective(objective).subgradient(self.units, x)
+        steps = np.array([AMOUNT_STEP] * 4 + [FUNDING_STEP])
+        df = pd.DataFrame(
+            dict(
+                step=steps,
+                marginal=subgradient["gradient"] * steps,
+                increase=subgradient["increase"] * steps,
+                decrease=subgradient["decrease"] * steps,
+            ),
+            index=list(AGE_BANDS)[:4] + ["funding"],
+        )
+        df.attrs["share_active"] = (
+            self.units.person_weight @ subgradient["active"]
+        ) / self.units.person_weight.sum()
+        return df
+
+    def unspent_funding(self) -> float:
+        # Funding the solved amounts leave unspent. Polishing rounds the
+        # senior amount down to whole dollars, leaving under a dollar per
+        # senior, so this is small but not zero.
+        x = list(self.amounts().values())[:4]
+        seniors = (self.df.count_senior * self.df.weight).sum()
+        return (self.get_senior_amount(*x) - self.senior) * seniors
+
+    def band_totals(self) -> np.ndarray:
+        # Weighted people in each age band, so that the first four bands'
+        # amounts spend band_totals()[:4] @ x of the funding.
+        return np.array(
+            [
+                (self.df[f"count_{band}"] * self.df.weight).sum()
+                for band in AGE_BANDS
+            ]
+        )
+
+    def feasible(self, amounts: Sequence[float]) -> np.ndarray:
+        # Amounts of the first four bands scaled down, if they spend more
+        # than the funding, to spend all of it, so the senior amount is
+        # not negative.
+        amounts = np.asarray(amounts, dtype=float)
+        spent = self.band_totals()[:4] @ amounts
+        if spent <= max(self.ubi_funding, 0):
+            return amounts
+        return amounts * max(self.ubi_funding, 0) / spent
+
+    def random_amounts(
+        self,
+        rng: np.random.Generator,
+        size: int,
+        bounds: Sequence[Tuple[float, float]] = AMOUNT_BOUNDS,
+    ) -> np.ndarray:
+        # Random amounts of the first four bands within the bounds, those
+        # that overspend scaled down to spend a random share of the
+        # funding. Uniform draws over the bounds almost all overspend.
+        lower, upper = np.transpose(bounds)
+        amounts = rng.uniform(lower, upper, (size, len(lower)))
+        spent = np.maximum(amounts @ self.band_totals()[:4], 1e-12)
+        share = rng.random(size) * max(self.ubi_funding, 0)
+        amounts *= np.minimum(1, share / spent)[:, None]
+        return np.clip(amounts, lower, upper)
+
+    def equal_amount(self) -> float:
+        # Per-person amount if the funding were split equally.
+        return self.ubi_funding / (self.df.count_person * self.df.weight).sum()
+
+    def amounts(self) -> Dict[str, float]:
+        return {band: getattr(self, band) for band in AGE_BANDS}
+
+    def _search(
+        self,
+        evaluate: Callable,
+        spec: Objective,
+        method: str,
+        bounds: Sequence[Tuple[float, float]],
+        maxiter: int,
+        seed: int,
+        x0: Sequence[float],
+        callback: Callable,
+    ) -> np.ndarray:
+        # Searches for the amounts with an iterative method, none of which
+        # may spend more than the funding. The search starts from an equal
+        # per-person UBI unless warm started, and the start is kept if
+        # nothing found beats it.
+        start = [self.equal_amount()] * 4 if x0 is None else x0
+        start = np.clip(self.feasible(start), *np.transpose(bounds))
+        spending = self.band_totals()[:4]
+        if method == "differential_evolution":
+            # Batched objectives evaluate each generation at once. Step
+            # objectives are flat across most of a first generation, so
+            # they are not stopped on its spread, only by maxiter or a
+            # plateau. Infeasible candidates are never evaluated, so the
+            # first generation is drawn within the funding, with the start.
+            vectorized = spec.vectorized and self.in_memory
+            init = self.random_amounts(
+                np.random.default_rng(seed), 15 * len(bounds), bounds
+            )
+            init[0] = start
+            x = differential_evolution(
+                evaluate,
+                bounds=bounds,
+                maxiter=maxiter,
+                seed=seed,
+                callback=callback,
+                init=init,
+                tol=0.01 if spec.convex else 0,
+                constraints=LinearConstraint(
+                    spending, -np.inf, self.ubi_funding
+                ),
+                polish=False,
+                vectorized=vectorized,
+                updating="deferred" if vectorized else "immediate",
+            ).x
+        else:
+            # Local methods take no constraints, so a candidate that
+            # overspends is evaluated where it is scaled back to the
+            # funding, plus its relative overspend.
+            scale = max(abs(self.ubi_funding), 1.0)
+
+            def penalised(x):
+                overspend = (spending @ x - self.ubi_funding) / scale
+                return evaluate(self.feasible(x)) + max(0, overspend)
+
+            x = minimize(
+                penalised,
+                x0=start,
+                method=method,
+                bounds=bounds,
+                options=dict(maxiter=maxiter),
+                callback=callback,
+            ).x
+        x = self.feasible(x)
+        return start if evaluate(start) < evaluate(x) else x
+
+    def solve(
+        self,
+        return_amounts: bool = False,
+        return_loss: bool = False,
+        method: str = "auto",
+        maxiter: int = int(1e3),
+        seed: int = None,
+        store: ResultStore = None,
+        callback: Callable = None,
+        return_trace: bool = False,
+        plateau: int = None,
+        min_improvement: float = 0.0,
+        trace_path: str = None,
+        x0: Sequence[float] = None,
+        objective: str = DEFAULT_OBJECTIVE,
+        polish: bool = True,
+        bounds: Sequence[Tuple[float, float]] = AMOUNT_BOUNDS,
+    ) -> dict:
+        spec = get_objective(objective)
+        if method == "auto":
+            method = spec.method(self.in_memory)
+        if method not in SOLVER_METHODS:
+            raise ValueError(
+                f"Unknown solver method {method!r}, expected one of "
+                f"{', '.join(SOLVER_METHODS)}"
+            )
+        if method == "linprog" and not (
+            spec.linear_program and self.in_memory
+        ):
+            raise ValueError(
+                f"{objective} cannot be solved as a linear program here."
+            )
+        if method == "linprog":
+            # Exact, so a warm start is neither used nor keyed.
+            x0 = None
+        inputs = solve_inputs(
+            self.flat_tax_rate,
+            method,
+            maxiter,
+            seed,
+            self.overrides,
+            plateau,
+            min_improvement,
+            (
+                self.dataset
+                if self.weights_key is None
+                else dict(dataset=self.dataset, weights=self.weights_key)
+            ),
+            x0,
+            self.year,
+            objective,
+            polish,
+            bounds,
+        )
+        if x0 is not None:
+            # Warm start, e.g. from a neighbouring rate's amounts.
+            x0 = np.clip(x0, *np.transpose(bounds))
+        self.trace = SolverTrace(plateau, min_improvement, trace_path)
+        stored = None if store is None else store.get("solve", inputs)
+        # Continuous solution before polishing, if solved here.
+        optimum = None
+        if stored is not None:
+            x = [stored["amounts"][band] for band in list(AGE_BANDS)[:4]]
+            senior = stored["amounts"]["senior"]
+        else:
+            # Solvers stay within the bounds, so evaluate only the units
+            # whose loss can change sign there.
+            evaluate = self.trace.objective(
+                self.objective_function(
+                    objective, bounds if self.in_memory else None
+                )
+            )
+
+            def on_generation(xk, *args, **kwargs):
+                stop = self.trace.record()
+                if callback is not None:
+                    callback(xk, *args, **kwargs)
+                return stop
+
+            with timed(self.timings, "solve"):
+                if method == "linprog":
+                    # Exact, so one evaluation records the optimum.
+                    x = self.active_set(
+                        objective, bounds
+                    ).solve_linear_program()
+                    evaluate(x)
+                    on_generation(x)
+                else:
+                    x = self._search(
+                        evaluate,
+                        spec,
+                        method,
+                        bounds,
+                        maxiter,
+                        seed,
+                        x0,
+                        on_generation,
+                    )
+            optimum = list(map(float, x))
+            if polish:
+                with timed(self.timings, "polish"):
+                    *x, senior = map(float, self.polish(x, objective, bounds))
+            else:
+                senior = self.get_senior_amount(*x)
         (
             self.young_child,
             self.older_child,
             self.young_adult,
             self.adult,
-        ) = differential_evolution(
-            lambda x: self.mean_percentage_loss(*x),
-            bounds=[(0, 15e4)] * 4,
-            maxiter=int(1e3),
-        ).x
-        self.senior = self.get_senior_amount(
-            self.young_child, self.older_child, self.young_adult, self.adult
-        )
+        ) = x
+        self.senior = senior
         self.reform = dict(
             **self.base_reform,
-            young_child_bi_amount=round(self.young_child),
-            older_child_bi_amount=round(self.older_child),
-            young_adult_bi_amount=round(self.young_adult),
-            older_adult_bi_amount=round(self.adult),
-            senior_bi_amount=round(self.senior),
+            **{
+                name: round(getattr(self, band))
+                for band, name in REFORM_AMOUNTS.items()
+            },
         )
-        if not return_amounts and not return_loss:
+        if store is not None and stored is None:
+            store.put(
+                "solve",
+                inputs,
+                dict(
+                    amounts=self.amounts(),
+                    loss=self.mean_percentage_loss(*self.amounts().values()),
+                    objective=self.objective_function(objective)(
+                        *self.amounts().values()
+                    ),
+                    reform=self.reform,
+                ),
+            )
+        if not return_amounts and not return_loss and not return_trace:
             return self.reform
-        
+
         data = dict(reform=self.reform)
 
         if return_amounts:
-            data["amounts"] = dict(
-                young_child=self.young_child,
-                older_child=self.older_child,
-                young_adult=self.young_adult,
-                adult=self.adult,
-                senior=self.senior,
-            )
-        
+            data["amounts"] = self.amounts()
+            data["unspent_funding"] = self.unspent_funding()
+
         if return_loss:
-            data["loss"] = self.mean_percentage_loss(
-                self.young_child, self.older_child, self.young_adult, self.adult
+            # Under every band's amount as published, senior included.
+            data["loss"] = self.mean_percentage_loss(*self.amounts().values())
+            if objective != DEFAULT_OBJECTIVE:
+                data["objective"] = self.objective_function(objective)(
+                    *self.amounts().values()
+                )
+
+        if return_trace:
+            data["trace"] = dict(
+                self.trace.to_dict(),
+                timings=dict(self.timings),
+                from_store=stored is not None,
             )
-        
+            if spec.linear_program and self.in_memory and optimum:
+                # At the continuous optimum, before polishing, where
+                # non-negative one-sided derivatives confirm it.
+                data["trace"]["sensitivities"] = self.sensitivities(
+                    *optimum, objective=objective
+                ).to_dict("index")
+
         return data
@@ -0,0 +1,110 @@
+"""
+Poverty rates and gaps for every age group from one pass over the people in
+a simulation.
+"""
+
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+from blank_slate_ubi_us.aggregation import GroupAggregator
+
+# Age groups as [lower, upper) bounds, matching is_child, is_wa_adult and
+# is_senior.
+AGE_GROUPS = {
+    "Child": (0, 18),
+    "Working-age": (18, 65),
+    "Senior": (65, np.inf),
+}
+
+POVERTY_COLUMNS = (
+    "population",
+    "poverty_rate",
+    "deep_poverty_rate",
+    "poverty_gap",
+    "deep_poverty_gap",
+)
+
+
+def poverty_by_age(
+    simulation,
+    groups: Dict[str, Tuple[float, float]] = AGE_GROUPS,
+    in_poverty_variable: str = "spm_unit_is_in_spm_poverty",
+    in_deep_poverty_variable: str = "spm_unit_is_in_deep_spm_poverty",
+    net_income_variable: str = "spm_unit_net_income",
+    threshold_variable: str = "spm_unit_spm_threshold",
+) -> pd.DataFrame:
+    """Poverty and deep poverty rates and gaps by age group and overall.
+
+    Poverty flags, gaps and weights are read once and summed by single
+    year of age, so any number of (possibly overlapping) age groups costs
+    no further passes over the microdata.
+
+    :param simulation: Simulation to measure poverty in.
+    :type simulation: Microsimulation
+    :param groups: Group name to [lower, upper) age bounds, defaults to
+        children, working-age adults and seniors.
+    :type groups: Dict[str, Tuple[float, float]]
+    :param in_poverty_variable: SPM unit poverty flag.
+    :type in_poverty_variable: str
+    :param in_deep_poverty_variable: SPM unit deep poverty flag.
+    :type in_deep_poverty_variable: str
+    :param net_income_variable: SPM unit resources compared to the threshold.
+    :type net_income_variable: str
+    :param threshold_variable: SPM unit poverty threshold.
+    :type threshold_variable: str
+    :return: DataFrame indexed by group, plus "All", with the weighted
+        population, poverty and deep poverty rates, and the aggregate
+        poverty and deep poverty gaps (each SPM unit's gap is split equally
+        between its members).
+    :rtype: pd.DataFrame
+    """
+    age = simulation.calc("age")
+    weight = age.weights.values.astype(float)
+    age_code = np.maximum(age.values, 0).astype(int)
+    in_poverty = simulation.calc(in_poverty_variable, map_to="person").values
+    in_deep_poverty = simulation.calc(
+        in_deep_poverty_variable, map_to="person"
+    ).values
+    threshold = simulation.calc(threshold_variable).values
+    shortfall = threshold - simulation.calc(net_income_variable).values
+    unit_size = simulation.map_result(age.values >= 0, "person", "spm_unit")
+    gap = simulation.map_result(
+        np.maximum(0, shortfall) / unit_size, "spm_unit", "person"
+    )
+    deep_gap = simulation.map_result(
+        np.maximum(0, shortfall - threshold / 2) / unit_size,
+        "spm_unit",
+        "person",
+    )
+    by_age = (
+        GroupAggregator(age_code, weight)
+        .sum(
+            dict(
+                population=np.ones_like(weight),
+                poor=in_poverty,
+                deep_poor=in_deep_poverty,
+                poverty_gap=gap,
+                deep_poverty_gap=deep_gap,
+            )
+        )
+        .values
+    )
+    # Cumulative totals by age, so each group is a difference of two rows.
+    cumulative = np.vstack(
+        [np.zeros(by_age.shape[1]), np.cumsum(by_age, axis=0)]
+    )
+    max_age = len(by_age)
+    bounds = dict(groups, All=(0, np.inf))
+    totals = pd.DataFrame(
+        [
+            cumulative[int(min(np.ceil(upper), max_age))]
+            - cumulative[int(min(np.ceil(lower), max_age))]
+            for lower, upper in bounds.values()
+        ],
+        index=list(bounds),
+        columns=["population", "poor", "deep_poor"]
+        + list(POVERTY_COLUMNS[3:]),
+    )
+    totals["poverty_rate"] = totals.poor / totals.population
+    totals["deep_poverty_rate"] = totals.deep_poor / totals.population
+    return totals[list(POVERTY_COLUMNS)]
@@ -0,0 +1,97 @@
+"""
+Declarative, hashable reform specifications.
+
+A ReformSpec is a set of parameter changes, parameter path to period to
+value. Equal specs compare and hash equal and share a stable content
+hash, ``key``, which keys reform classes, simulations, extracted arrays
+and stored results across the package.
+
+    spec = ReformSpec.from_values({"gov.usda.wic.abolish_wic": True}, 2025)
+    spec.key  # the same hex digest in every process and session
+"""
+
+from typing import Any, Dict, Iterator, List, Mapping, Tuple
+from blank_slate_ubi_us.periods import reform_period
+from blank_slate_ubi_us.store import _canonical, result_key
+
+
+class ReformSpec:
+    """Parameter changes, keyed by parameter path and then period.
+
+    :param changes: Parameter path to period (e.g. "year:2023:1") to value.
+    :type changes: Mapping[str, Mapping[str, Any]]
+    """
+
+    def __init__(self, changes: Mapping[str, Mapping[str, Any]]):
+        self._changes = {
+            path: dict(sorted(periods.items()))
+            for path, periods in sorted(changes.items())
+        }
+        self.key = result_key(self._changes)
+
+    @classmethod
+    def from_values(
+        cls, values: Mapping[str, Any], year: int = None
+    ) -> "ReformSpec":
+        """Spec setting each parameter to a value in one year.
+
+        :param values: Parameter path to value.
+        :type values: Mapping[str, Any]
+        :param year: Year, defaults to ``DEFAULT_YEAR``.
+        :type year: int, optional
+        :return: The spec.
+        :rtype: ReformSpec
+        """
+        period = reform_period(year)
+        return cls({path: {period: value} for path, value in values.items()})
+
+    def changes(self) -> Iterator[Tuple[str, str, Any]]:
+        """Each change as a (path, period, value) triple.
+
+        :return: Changes in path then period order.
+        :rtype: Iterator[Tuple[str, str, Any]]
+        """
+        for path, periods in self._changes.items():
+            for period, value in periods.items():
+                yield path, period, value
+
+    @property
+    def periods(self) -> List[str]:
+        """Periods the spec changes parameters in, in order."""
+        return sorted({period for _, period, _ in self.changes()})
+
+    def values(self, period: str = None) -> Dict[str, Any]:
+        """Parameter values set in one period.
+
+        :param period: Period, defaults to the first the spec changes.
+        :type period: str, optional
+        :return: Parameter path to value.
+        :rtype: Dict[str, Any]
+        """
+        if period is None:
+            period = self.periods[0] if self._changes else reform_period()
+        return {
+            path: periods[period]
+            for path, periods in self._changes.items()
+            if period in periods
+        }
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Changes as nested dicts, parameter path to period to value."""
+        return {path: dict(periods) for path, periods in self._changes.items()}
+
+    def __add__(self, other: "ReformSpec") -> "ReformSpec":
+        # Changes of the right-hand spec take precedence.
+        changes = self.to_dict()
+        for path, period, value in other.changes():
+            changes.setdefault(path, {})[period] = value
+        return ReformSpec(changes)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, ReformSpec) and other.key == self.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self) -> str:
+        return f"ReformSpec({_canonical(self._changes)!r})"
@@ -0,0 +1,440 @@
+"""
+A local HTTP service that answers solve and evaluate requests against warm
+policies.
+
+Each worker is a single-process executor that keeps recently used
+BlankSlatePolicy objects, and so their baseline and funded-income arrays,
+in memory. Policies in a worker share one SimulationCache, so the baseline
+arrays are built once per worker; lean policies release their simulations
+from it once their arrays are read. Requests are routed to workers by
+their funding reform, so a repeated question about the same reform skips
+building simulations.
+Identical concurrent requests share one computation.
+
+Endpoints, all taking and returning JSON:
+
+- ``POST /solve`` with ``flat_tax_rate`` and optionally ``overrides``
+  (parameter path to value), ``year``, ``objective``, ``method``,
+  ``maxiter``, ``seed`` and ``stream``. With ``stream`` set, the response
+  is newline-delimited JSON progress events, one per solver generation or
+  iteration, followed by the result. Exact ``linprog`` solves, the default
+  for the mean percentage loss, have no generations and send a single
+  progress event at the optimum.
+- ``POST /evaluate`` with ``flat_tax_rate``, optionally ``overrides`` and
+  ``year``, and ``amounts`` for young_child, older_child, young_adult and
+  adult. The response includes the mean loss and shares losing by age
+  band.
+- ``GET /status``.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+from typing import Any, Callable, Dict, List, Tuple
+import asyncio
+import json
+import queue
+import time
+from blank_slate_ubi_us.periods import SimulationCache
+from blank_slate_ubi_us.policy import (
+    AGE_BANDS,
+    BlankSlatePolicy,
+    funding_spec,
+)
+from blank_slate_ubi_us.loss_by_flat_tax import get_equal_ubi_loss
+from blank_slate_ubi_us.store import ResultStore, result_key
+
+# Policies kept warm in each worker process.
+MAX_WARM_POLICIES = 8
+
+SOLVE_OPTIONS = (
+    "method",
+    "objective",
+    "maxiter",
+    "seed",
+    "plateau",
+    "min_improvement",
+)
+
+_POLICIES: Dict[str, BlankSlatePolicy] = OrderedDict()
+
+_SIMULATIONS: SimulationCache = None
+
+
+def _simulations() -> SimulationCache:
+    # Built on first use, so each worker process gets its own.
+    global _SIMULATIONS
+    if _SIMULATIONS is None:
+        _SIMULATIONS = SimulationCache()
+    return _SIMULATIONS
+
+
+def _init_worker(simulation: Callable) -> None:
+    # Runs in each worker process as it starts.
+    global _SIMULATIONS
+    _SIMULATIONS = SimulationCache(simulation)
+
+
+def _reform_key(request: dict) -> str:
+    return funding_spec(
+        request["flat_tax_rate"], request.get("overrides"), request.get("year")
+    ).key
+
+
+def _warm_policy(request: dict) -> BlankSlatePolicy:
+    # Runs in a worker process.
+    key = _reform_key(request)
+    if key in _POLICIES:
+        _POLICIES.move_to_end(key)
+    else:
+        _POLICIES[key] = BlankSlatePolicy(
+            request["flat_tax_rate"],
+            request.get("overrides"),
+            lean=True,
+            simulation=_simulations(),
+            year=request.get("year"),
+        )
+        if len(_POLICIES) > MAX_WARM_POLICIES:
+            _POLICIES.popitem(last=False)
+    return _POLICIES[key]
+
+
+def _warm(request: dict) -> str:
+    _warm_policy(request)
+    return _reform_key(request)
+
+
+def _solve(request: dict, progress, store: ResultStore) -> dict:
+    # Runs in a worker process; progress is a manager queue, closed with
+    # None once the solve finishes.
+    try:
+        start = time.time()
+        policy = _warm_policy(request)
+        built = time.time()
+        iteration = 0
+
+        def callback(x, *args, **kwargs):
+            nonlocal iteration
+            iteration += 1
+            progress.put(
+                dict(
+                    event="progress",
+                    iteration=iteration,
+                    loss=policy.mean_percentage_loss(*x),
+                    seconds=time.time() - start,
+                )
+            )
+
+        options = {k: request[k] for k in SOLVE_OPTIONS if k in request}
+        result = policy.solve(
+            return_amounts=True,
+            return_loss=True,
+            store=store,
+            callback=callback,
+            **options,
+        )
+        return dict(
+            flat_tax_rate=request["flat_tax_rate"],
+            overrides=request.get("overrides") or {},
+            amounts=result["amounts"],
+            loss=result["loss"],
+            equal_loss=get_equal_ubi_loss(policy),
+            build_seconds=built - start,
+            solve_seconds=time.time() - built,
+        )
+    finally:
+        progress.put(None)
+
+
+def _evaluate(request: dict) -> dict:
+    policy = _warm_policy(request)
+    amounts = [request["amounts"][band] for band in list(AGE_BANDS)[:4]]
+    return dict(
+        flat_tax_rate=request["flat_tax_rate"],
+        overrides=request.get("overrides") or {},
+        amounts=dict(
+            zip(AGE_BANDS, amounts + [policy.get_senior_amount(*amounts)])
+        ),
+        loss=policy.mean_percentage_loss(*amounts),
+        equal_loss=get_equal_ubi_loss(policy),
+        by_band=policy.loss_distribution(*amounts)["by_band"].to_dict(
+            orient="index"
+        ),
+    )
+
+
+_NO_EVENT = object()
+
+
+def _next_event(progress) -> Any:
+    # Times out so that a crashed worker cannot block the server forever.
+    try:
+        return progress.get(timeout=1)
+    except queue.Empty:
+        return _NO_EVENT
+
+
+class _Job:
+    # A computation shared by every identical in-flight request.
+    def __init__(self):
+        self.events: List[dict] = []
+        self.listeners: List[asyncio.Queue] = []
+        self.result = asyncio.get_event_loop().create_future()
+
+    def publish(self, event: dict) -> None:
+        self.events.append(event)
+        for listener in self.listeners:
+            listener.put_nowait(event)
+
+    def subscribe(self) -> asyncio.Queue:
+        listener = asyncio.Queue()
+        for event in self.events:
+            listener.put_nowait(event)
+        self.listeners.append(listener)
+        return listener
+
+
+class SolveServer:
+    """Serves solve and evaluate requests from a pool of warm workers.
+
+    :param workers: Number of worker processes, defaults to 2.
+    :type workers: int
+    :param store: Result store for solves, defaults to none.
+    :type store: ResultStore, optional
+    :param simulation: Picklable simulation factory for the workers, e.g.
+        SyntheticMicrodata, defaults to PolicyEngine US.
+    :type simulation: Callable, optional
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        store: ResultStore = None,
+        simulation: Callable = None,
+    ):
+        self.executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                initializer=_init_worker,
+                initargs=(simulation,),
+            )
+            for _ in range(workers)
+        ]
+        self.store = store
+        self.manager = Manager()
+        self.jobs: Dict[str, _Job] = {}
+        self.requests = 0
+        self.coalesced = 0
+
+    def _executor(self, request: dict) -> ProcessPoolExecutor:
+        key = _reform_key(request)
+        return self.executors[int(key, 16) % len(self.executors)]
+
+    async def preload(self, requests: List[dict]) -> None:
+        """Builds policies in their workers before serving.
+
+        :param requests: Requests with ``flat_tax_rate`` and optionally
+            ``overrides``.
+        :type requests: List[dict]
+        """
+        loop = asyncio.get_event_loop()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(self._executor(r), _warm, r)
+                for r in requests
+            )
+        )
+
+    async def _run_solve(self, key: str, request: dict, job: _Job) -> None:
+        loop = asyncio.get_event_loop()
+        progress = self.manager.Queue()
+        future = loop.run_in_executor(
+            self._executor(request), _solve, request, progress, self.store
+        )
+        while True:
+            event = await loop.run_in_executor(None, _next_event, progress)
+            if event is None or (event is _NO_EVENT and future.done()):
+                break
+            if event is not _NO_EVENT:
+                job.publish(event)
+        try:
+            result = await future
+            job.publish(dict(event="result", **result))
+            job.result.set_result(result)
+        except Exception as e:
+            job.publish(dict(event="error", error=repr(e)))
+            job.result.set_exception(e)
+        finally:
+            del self.jobs[key]
+
+    def solve_job(self, request: dict) -> _Job:
+        """Starts a solve, or joins an identical one already running.
+
+        :param request: Solve request.
+        :type request: dict
+        :return: The shared job.
+        :rtype: _Job
+        """
+        request = {k: v for k, v in request.items() if k != "stream"}
+        key = result_key(request)
+        self.requests += 1
+        if key in self.jobs:
+            self.coalesced += 1
+        else:
+            self.jobs[key] = _Job()
+            asyncio.ensure_future(
+                self._run_solve(key, request, self.jobs[key])
+            )
+        return self.jobs[key]
+
+    async def evaluate(self, request: dict) -> dict:
+        """Evaluates given amounts on a warm policy.
+
+        :param request: Evaluate request.
+        :type request: dict
+        :return: Amounts including the residual senior amount, and losses.
+        :rtype: dict
+        """
+        return await asyncio.get_event_loop().run_in_executor(
+            self._executor(request), _evaluate, request
+        )
+
+    def status(self) -> dict:
+        """Counts of workers, in-flight solves and coalesced requests.
+
+        :return: Server status.
+        :rtype: dict
+        """
+        return dict(
+            workers=len(self.executors),
+            in_flight=len(self.jobs),
+            requests=self.requests,
+            coalesced=self.coalesced,
+        )
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            method, path, request = await _read_request(reader)
+            if method == "GET" and path == "/status":
+                _write_json(writer, 200, self.status())
+            elif method == "POST" and path == "/evaluate":
+                _write_json(writer, 200, await self.evaluate(request))
+            elif method == "POST" and path == "/solve":
+                job = self.solve_job(request)
+                if request.get("stream"):
+                    await _stream(writer, job.subscribe())
+                else:
+                    _write_json(writer, 200, await job.result)
+            else:
+                _write_json(writer, 404, dict(error=f"No route {path}"))
+        except (KeyError, ValueError) as e:
+            _write_json(writer, 400, dict(error=repr(e)))
+        except Exception as e:
+            _write_json(writer, 500, dict(error=repr(e)))
+        finally:
+            await writer.drain()
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765) -> None:
+        """Serves requests until cancelled.
+
+        :param host: Interface to listen on, defaults to localhost.
+        :type host: str
+        :param port: Port to listen on, defaults to 8765.
+        :type port: int
+        """
+        server = await asyncio.start_server(self._handle, host, port)
+        print(f"Serving on http://{host}:{port}")
+        try:
+            await server.serve_forever()
+        finally:
+            server.close()
+            self.close()
+
+    def close(self) -> None:
+        """Shuts down the workers."""
+        for executor in self.executors:
+            executor.shutdown(wait=False)
+        self.manager.shutdown()
+
+
+async def _read_request(reader) -> Tuple[str, str, dict]:
+    method, path, _ = (await reader.readline()).decode().split(" ", 2)
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode().strip()
+        if not line:
+            break
+        name, value = line.split(":", 1)
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    body = await reader.readexactly(length) if length else b"{}"
+    return method, path, json.loads(body)
+
+
+def _json_bytes(value: Any) -> bytes:
+    return json.dumps(value, default=lambda v: v.item()).encode()
+
+
+def _write_json(writer, status: int, value: Any) -> None:
+    body = _json_bytes(value)
+    writer.write(
+        f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n".encode() + body
+    )
+
+
+async def _stream(writer, events: asyncio.Queue) -> None:
+    writer.write(
+        b"HTTP/1.1 200 OK\r\n"
+        b"Content-Type: application/x-ndjson\r\n"
+        b"Transfer-Encoding: chunked\r\n"
+        b"Connection: close\r\n\r\n"
+    )
+    while True:
+        event = await events.get()
+        line = _json_bytes(event) + b"\n"
+        writer.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        await writer.drain()
+        if event["event"] in ("result", "error"):
+            break
+    writer.write(b"0\r\n\r\n")
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Error"}
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    workers: int = 2,
+    preload: List[float] = (),
+    store: ResultStore = None,
+) -> None:
+    """Runs a solve server until interrupted.
+
+    :param host: Interface to listen on, defaults to localhost.
+    :type host: str
+    :param port: Port to listen on, defaults to 8765.
+    :type port: int
+    :param workers: Number of worker processes, defaults to 2.
+    :type workers: int
+    :param preload: Flat tax rates to build policies for before serving.
+    :type preload: List[float]
+    :param store: Result store for solves, defaults to none.
+    :type store: ResultStore, optional
+    """
+
+    async def main():
+        server = SolveServer(workers, store)
+        await server.preload(
+            [dict(flat_tax_rate=float(rate)) for rate in preload]
+        )
+        await server.serve(host, port)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,127 @@
+"""
+Content-addressed store of solved reforms and their metrics.
+
+Results are kept in a SQLite file and keyed by a hash of every input they
+depend on: the baseline and funding reform parameters, the age bands, the
+solver settings and the policyengine-us version. A model version bump
+therefore changes every key, and ``prune`` removes the stale rows.
+"""
+
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Optional
+import hashlib
+import json
+import sqlite3
+import time
+
+DEFAULT_PATH = Path.home() / ".cache" / "blank_slate_ubi_us" / "results.db"
+
+
+def _canonical(value: Any) -> Any:
+    # Floats are rounded so that rates from np.arange hash like literals.
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, 9)
+    return value
+
+
+def result_key(inputs: dict) -> str:
+    """Stable hash of the inputs of a result.
+
+    :param inputs: JSON-serializable inputs.
+    :type inputs: dict
+    :return: Hex digest.
+    :rtype: str
+    """
+    return hashlib.sha256(
+        json.dumps(_canonical(inputs), sort_keys=True).encode()
+    ).hexdigest()
+
+
+class ResultStore:
+    """Results of solves and sweeps, keyed by a hash of their inputs.
+
+    :param path: SQLite file, created if missing, defaults to
+        ``~/.cache/blank_slate_ubi_us/results.db``.
+    :type path: str, optional
+    """
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or DEFAULT_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, kind TEXT, model_version TEXT, "
+                "created REAL, inputs TEXT, result TEXT)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=60)
+        conn.isolation_level = None
+        return conn
+
+    def get(self, kind: str, inputs: dict) -> Optional[dict]:
+        """Looks up a result.
+
+        :param kind: Kind of result, e.g. "solve" or "sweep".
+        :type kind: str
+        :param inputs: Inputs the result depends on.
+        :type inputs: dict
+        :return: The stored result, or None if there is none.
+        :rtype: Optional[dict]
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT result FROM results WHERE key = ?",
+                (result_key(dict(inputs, kind=kind)),),
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, kind: str, inputs: dict, result: dict) -> None:
+        """Stores a result, replacing any result with the same inputs.
+
+        :param kind: Kind of result, e.g. "solve" or "sweep".
+        :type kind: str
+        :param inputs: Inputs the result depends on, including a
+            "model_version" entry.
+        :type inputs: dict
+        :param result: JSON-serializable result.
+        :type result: dict
+        """
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    result_key(dict(inputs, kind=kind)),
+                    kind,
+                    inputs.get("model_version"),
+                    time.time(),
+                    json.dumps(_canonical(inputs), sort_keys=True),
+                    json.dumps(result, default=lambda value: value.item()),
+                ),
+            )
+
+    def prune(self, model_version: str) -> int:
+        """Deletes results computed with any other model version.
+
+        :param model_version: policyengine-us version to keep.
+        :type model_version: str
+        :return: Number of deleted results.
+        :rtype: int
+        """
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "DELETE FROM results WHERE model_version IS NOT ?",
+                (model_version,),
+            ).rowcount
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
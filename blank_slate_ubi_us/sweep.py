@@ -0,0 +1,451 @@
+"""
+Flat tax sweeps: solve the blank slate policy at many flat tax rates and
+tabulate losses and, optionally, poverty and inequality changes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, List, Sequence
+import numpy as np
+import pandas as pd
+from blank_slate_ubi_us.periods import SimulationCache
+from blank_slate_ubi_us.policy import BlankSlatePolicy, solve_inputs
+from blank_slate_ubi_us.store import ResultStore
+from blank_slate_ubi_us.loss_by_flat_tax import get_equal_ubi_loss
+from blank_slate_ubi_us.metrics_by_flat_tax import get_metrics
+
+OUTPUT_FORMATS = ("csv", "json", "parquet")
+
+# Columns whose shape decides where an adaptive sweep refines.
+REFINE_COLUMNS = ("optimal_loss", "poverty_rate_change")
+
+
+def sweep_row(
+    flat_tax: float,
+    metrics: bool = True,
+    store: ResultStore = None,
+    trace_path: str = None,
+    simulation: Callable = None,
+    year: int = None,
+    **solve_kwargs,
+) -> dict:
+    """Solves the blank slate policy at one flat tax rate.
+
+    :param flat_tax: Flat tax rate.
+    :type flat_tax: float
+    :param metrics: Whether to compute poverty and Gini changes, which
+        requires a reformed simulation, defaults to True.
+    :type metrics: bool
+    :param store: Result store to read from and write to, defaults to none.
+    :type store: ResultStore, optional
+    :param trace_path: JSONL file to write the convergence trace to.
+    :type trace_path: str, optional
+    :param simulation: Simulation factory passed to ``BlankSlatePolicy``,
+        e.g. synthetic microdata, defaults to PolicyEngine US.
+    :type simulation: Callable, optional
+    :param year: Year to analyse, defaults to 2023 reforms at the
+        simulation's default period.
+    :type year: int, optional
+    :param solve_kwargs: Solver options passed to ``BlankSlatePolicy.solve``.
+    :return: Row with the year if given, the flat tax, equal and optimal
+        losses, the optimal amounts, the share of people losing and the
+        median and 90th percentile loss, the change in mean loss per $1bn
+        more funding at the optimum, solver evaluation counts and stage
+        timings and, if requested, the poverty rate and Gini changes.
+    :rtype: dict
+    """
+    inputs = _row_inputs(flat_tax, metrics, simulation, solve_kwargs, year)
+    if store is not None:
+        row = store.get("sweep", inputs)
+        if row is not None:
+            return row
+    # Metrics need the baseline simulation, so only release it without them.
+    policy = BlankSlatePolicy(
+        flat_tax_rate=flat_tax,
+        lean=not metrics,
+        simulation=simulation,
+        year=year,
+    )
+    result = policy.solve(
+        return_amounts=True,
+        return_loss=True,
+        return_trace=True,
+        store=store,
+        trace_path=trace_path,
+        **solve_kwargs,
+    )
+    trace = result["trace"]
+    row = dict(
+        **({} if year is None else dict(year=year)),
+        flat_tax=float(flat_tax),
+        equal_loss=get_equal_ubi_loss(policy),
+        optimal_loss=result["loss"],
+        **result["amounts"],
+        unspent_funding=result["unspent_funding"],
+        evaluations=trace["evaluations"],
+        generations=trace["n_generations"],
+        stopped_early=trace["stopped_early"],
+        **_loss_columns(policy),
+        loss_per_funding_billion=policy.sensitivities().loc[
+            "funding", "marginal"
+        ],
+        **{f"{stage}_seconds": t for stage, t in trace["timings"].items()},
+    )
+    if metrics:
+        poverty_change, gini_change = get_metrics(policy, result["reform"])
+        row.update(poverty_rate_change=poverty_change, gini_change=gini_change)
+    if store is not None:
+        store.put("sweep", inputs, row)
+    return row
+
+
+def _loss_columns(policy: BlankSlatePolicy) -> dict:
+    distribution = policy.loss_distribution(*policy.amounts().values())
+    overall = distribution["by_band"].loc["all"]
+    return dict(
+        share_losing=overall["share_losing_over_0"],
+        share_losing_over_5pct=overall["share_losing_over_0.05"],
+        median_loss=distribution["quantiles"][0.5],
+        p90_loss=distribution["quantiles"][0.9],
+    )
+
+
+def _row_inputs(
+    flat_tax: float,
+    metrics: bool,
+    simulation: Callable,
+    solve_kwargs: dict,
+    year: int = None,
+) -> dict:
+    return dict(
+        solve_inputs(
+            flat_tax,
+            dataset=getattr(simulation, "dataset_key", None),
+            year=year,
+            **solve_kwargs,
+        ),
+        metrics=metrics,
+    )
+
+
+def _print_row(row: dict) -> None:
+    message = "" if "year" not in row else f"Year: {row['year']}, "
+    message += (
+        f"Flat tax: {row['flat_tax']:.0%}, "
+        f"equal loss: {row['equal_loss']:.2%}, "
+        f"optimal loss: {row['optimal_loss']:.2%}"
+    )
+    if "poverty_rate_change" in row:
+        message += (
+            f", poverty rate change: {row['poverty_rate_change']:.2%}, "
+            f"gini change: {row['gini_change']:.2%}"
+        )
+    print(message)
+
+
+def run_sweep(
+    flat_taxes: Iterable[float],
+    workers: int = 1,
+    metrics: bool = True,
+    store: ResultStore = None,
+    simulation: Callable = None,
+    year: int = None,
+    **solve_kwargs,
+) -> pd.DataFrame:
+    """Solves the blank slate policy at each flat tax rate.
+
+    :param flat_taxes: Flat tax rates.
+    :type flat_taxes: Iterable[float]
+    :param workers: Number of worker processes, defaults to 1 (serial).
+    :type workers: int
+    :param metrics: Whether to compute poverty and Gini changes, defaults
+        to True.
+    :type metrics: bool
+    :param store: Result store, so repeated or interrupted sweeps skip
+        rates already solved with the same inputs. Defaults to none.
+    :type store: ResultStore, optional
+    :param simulation: Simulation factory passed to ``BlankSlatePolicy``,
+        defaults to PolicyEngine US.
+    :type simulation: Callable, optional
+    :param year: Year to analyse, defaults to 2023 reforms at the
+        simulation's default period.
+    :type year: int, optional
+    :param solve_kwargs: Solver options passed to ``BlankSlatePolicy.solve``.
+    :return: One row per flat tax rate, as returned by ``sweep_row``.
+    :rtype: pd.DataFrame
+    """
+    flat_taxes = [float(rate) for rate in flat_taxes]
+    rows = {}
+    if store is not None:
+        for rate in flat_taxes:
+            inputs = _row_inputs(rate, metrics, simulation, solve_kwargs, year)
+            row = store.get("sweep", inputs)
+            if row is not None:
+                rows[rate] = row
+    pending = [rate for rate in flat_taxes if rate not in rows]
+
+    def finish(rate: float, row: dict) -> None:
+        rows[rate] = row
+        _print_row(row)
+
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                rate: executor.submit(
+                    sweep_row,
+                    rate,
+                    metrics,
+                    store,
+                    simulation=simulation,
+                    year=year,
+                    **solve_kwargs,
+                )
+                for rate in pending
+            }
+            for rate, future in futures.items():
+                finish(rate, future.result())
+    else:
+        for rate in pending:
+            row = sweep_row(
+                rate,
+                metrics,
+                store,
+                simulation=simulation,
+                year=year,
+                **solve_kwargs,
+            )
+            finish(rate, row)
+    return pd.DataFrame([rows[rate] for rate in flat_taxes])
+
+
+def _year_rows(
+    year: int,
+    flat_taxes: List[float],
+    metrics: bool,
+    store: ResultStore,
+    simulation: Callable,
+    solve_kwargs: dict,
+) -> pd.DataFrame:
+    # Runs in a worker; every rate of the year shares the baseline
+    # simulation and its arrays through one cache.
+    return run_sweep(
+        flat_taxes,
+        metrics=metrics,
+        store=store,
+        simulation=SimulationCache(simulation),
+        year=year,
+        **solve_kwargs,
+    )
+
+
+def run_year_sweep(
+    years: Iterable[int],
+    flat_taxes: Iterable[float],
+    workers: int = 1,
+    metrics: bool = True,
+    store: ResultStore = None,
+    simulation: Callable = None,
+    **solve_kwargs,
+) -> pd.DataFrame:
+    """Solves the blank slate policy at each flat tax rate in each year.
+
+    Years run in parallel workers. Within a year, the baseline simulation
+    and the arrays extracted from it are built once and reused by every
+    rate, so only the funded simulation is built per year and rate.
+
+    :param years: Years, e.g. ``range(2023, 2031)``.
+    :type years: Iterable[int]
+    :param flat_taxes: Flat tax rates.
+    :type flat_taxes: Iterable[float]
+    :param workers: Number of worker processes, defaults to 1 (serial).
+    :type workers: int
+    :param metrics: Whether to compute poverty and Gini changes, defaults
+        to True.
+    :type metrics: bool
+    :param store: Result store, defaults to none.
+    :type store: ResultStore, optional
+    :param simulation: Simulation factory passed to ``BlankSlatePolicy``,
+        defaults to PolicyEngine US.
+    :type simulation: Callable, optional
+    :param solve_kwargs: Solver options passed to ``BlankSlatePolicy.solve``.
+    :return: One row per year and rate, as returned by ``sweep_row``.
+    :rtype: pd.DataFrame
+    """
+    years = [int(year) for year in years]
+    flat_taxes = [float(rate) for rate in flat_taxes]
+    args = (flat_taxes, metrics, store, simulation, solve_kwargs)
+    if workers > 1 and len(years) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_year_rows, year, *args) for year in years
+            ]
+            tables = [future.result() for future in futures]
+    else:
+        tables = [_year_rows(year, *args) for year in years]
+    return pd.concat(tables, ignore_index=True)
+
+
+def interval_errors(
+    x: np.ndarray, y: np.ndarray, scale: float = None
+) -> np.ndarray:
+    """Estimated error of linear interpolation on each interval of a curve.
+
+    The second derivative is estimated by divided differences over each
+    triple of neighbouring points, and an interval of width h with
+    curvature f'' is given the interpolation error bound h**2 |f''| / 8,
+    taking the larger curvature of the triples it belongs to.
+
+    :param x: Sorted points.
+    :type x: np.ndarray
+    :param y: Values at the points.
+    :type y: np.ndarray
+    :param scale: Value the errors are divided by, defaults to the range
+        of ``y``.
+    :type scale: float, optional
+    :return: One error per interval, infinite where the curve has too few
+        points to estimate curvature.
+    :rtype: np.ndarray
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if len(x) < 3:
+        return np.full(max(len(x) - 1, 0), np.inf)
+    if scale is None:
+        scale = np.ptp(y)
+    slope = np.diff(y) / np.diff(x)
+    curvature = np.abs(2 * np.diff(slope) / (x[2:] - x[:-2]))
+    # Interval i belongs to triples i - 1 and i.
+    padded = np.concatenate([[0], curvature, [0]])
+    curvature = np.maximum(padded[:-1], padded[1:])
+    errors = np.diff(x) ** 2 * curvature / 8
+    return errors / scale if scale > 0 else np.zeros_like(errors)
+
+
+def adaptive_sweep(
+    start: float = 0.0,
+    stop: float = 0.5,
+    coarse_step: float = 0.1,
+    min_step: float = 0.01,
+    tolerance: float = 0.005,
+    budget: int = None,
+    columns: Sequence[str] = REFINE_COLUMNS,
+    workers: int = 1,
+    metrics: bool = True,
+    store: ResultStore = None,
+    simulation: Callable = None,
+    **solve_kwargs,
+) -> pd.DataFrame:
+    """Sweeps flat tax rates on a coarse grid, then bisects only the
+    intervals where linear interpolation of the result curves is off by
+    more than a tolerance.
+
+    New rates are rounded to multiples of ``min_step``, so they are the
+    same rates a fixed sweep at that step would solve and share its
+    stored results.
+
+    :param start: Lowest flat tax rate, defaults to 0.
+    :type start: float
+    :param stop: Highest flat tax rate, defaults to 0.5.
+    :type stop: float
+    :param coarse_step: Step of the initial grid, defaults to 0.1.
+    :type coarse_step: float
+    :param min_step: Narrowest interval to bisect, defaults to 0.01.
+    :type min_step: float
+    :param tolerance: Largest acceptable interpolation error, as a share of
+        each column's range, defaults to 0.005.
+    :type tolerance: float
+    :param budget: Most rates to solve in total, defaults to no limit
+        beyond ``min_step``.
+    :type budget: int, optional
+    :param columns: Columns to refine on, defaults to the optimal loss and
+        the poverty rate change. Columns missing from the rows, e.g.
+        metrics when they are skipped, are ignored.
+    :type columns: Sequence[str]
+    :param workers: Number of worker processes per round, defaults to 1.
+    :type workers: int
+    :param metrics: Whether to compute poverty and Gini changes, defaults
+        to True.
+    :type metrics: bool
+    :param store: Result store, defaults to none.
+    :type store: ResultStore, optional
+    :param simulation: Simulation factory passed to ``BlankSlatePolicy``,
+        defaults to PolicyEngine US.
+    :type simulation: Callable, optional
+    :param solve_kwargs: Solver options passed to ``BlankSlatePolicy.solve``.
+    :return: One row per solved rate, sorted by flat tax, as returned by
+        ``sweep_row``, with the refinement round that added it.
+    :rtype: pd.DataFrame
+    """
+
+    def on_grid(rates: np.ndarray) -> List[float]:
+        steps = np.round((np.asarray(rates) - start) / min_step)
+        return list(np.round(start + steps * min_step, 9))
+
+    n_coarse = max(int(round((stop - start) / coarse_step)), 1)
+    pending = sorted(set(on_grid(np.linspace(start, stop, n_coarse + 1))))
+    if budget is not None:
+        pending = pending[: max(budget, 2)]
+    tables = []
+    round_number = 0
+    while pending:
+        table = run_sweep(
+            pending,
+            workers=workers,
+            metrics=metrics,
+            store=store,
+            simulation=simulation,
+            **solve_kwargs,
+        )
+        tables.append(table.assign(refinement=round_number))
+        df = pd.concat(tables).sort_values("flat_tax")
+        x = df.flat_tax.values
+        errors = np.zeros(len(x) - 1)
+        for column in columns:
+            if column in df:
+                errors = np.maximum(
+                    errors, interval_errors(x, df[column].values)
+                )
+        # Worst intervals first, skipping those already at the minimum.
+        solved = set(x)
+        candidates = [
+            (error, rate)
+            for error, rate in zip(errors, on_grid((x[:-1] + x[1:]) / 2))
+            if error > tolerance and rate not in solved
+        ]
+        pending = [rate for _, rate in sorted(candidates, reverse=True)]
+        if budget is not None:
+            pending = pending[: max(0, budget - len(x))]
+        round_number += 1
+    return df.reset_index(drop=True)
+
+
+def write_table(df: pd.DataFrame, path: str, format: str = None) -> None:
+    """Writes a results table, inferring the format from the extension.
+
+    :param df: Table to write.
+    :type df: pd.DataFrame
+    :param path: Output path, or "-" for standard output.
+    :type path: str
+    :param format: One of "csv", "json" or "parquet", defaults to the
+        extension of the path, or csv.
+    :type format: str, optional
+    """
+    if format is None:
+        suffix = Path(path).suffix.lstrip(".")
+        format = suffix if suffix in OUTPUT_FORMATS else "csv"
+    if format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unknown output format {format!r}, expected one of "
+            f"{', '.join(OUTPUT_FORMATS)}"
+        )
+    if path == "-":
+        if format == "parquet":
+            raise ValueError("Parquet output needs a file path.")
+        path = None
+    if format == "csv":
+        text = df.to_csv(path, index=False)
+    elif format == "json":
+        text = df.to_json(path, orient="records", indent=2)
+    else:
+        text = df.to_parquet(path, index=False)
+    if path is None:
+        print(text)
@@ -0,0 +1,338 @@
+"""
+Synthetic microdata that stands in for PolicyEngine US simulations.
+
+SyntheticMicrodata generates SPM units and their members at any scale and,
+called with a reform like ``Microsimulation(reform=...)``, returns a
+SyntheticSimulation that implements the ``calc``, ``calculate`` and
+``map_result`` surface this package uses. A stylised tax-benefit model
+reads the parameter values of reforms made by ``create_parameter_reform``,
+so funding reforms respond to the flat tax rate and program abolitions
+and solved reforms pay their UBI amounts.
+
+Households and SPM units are the same entity in synthetic data.
+
+    data = SyntheticMicrodata(n_units=100_000)
+    policy = BlankSlatePolicy(0.4, simulation=data)
+"""
+
+from typing import Any, Dict, Tuple
+import numpy as np
+from microdf import MicroSeries
+from blank_slate_ubi_us.policy import AGE_BANDS, UBI_PARAMETERS
+
+# Bump when the generator changes, so stored results are not reused.
+GENERATOR_VERSION = 1
+
+POPULATION = 330e6
+
+STATES = (
+    "AL AK AZ AR CA CO CT DE DC FL GA HI ID IL IN IA KS KY LA ME MD MA MI "
+    "MN MS MO MT NE NV NH NJ NM NY NC ND OH OK OR PA RI SC SD TN TX UT VT "
+    "VA WA WV WI WY"
+).split()
+
+UNIT_ENTITIES = ("spm_unit", "household", "tax_unit", "family")
+
+PROGRAMS = ("ssi", "snap", "wic", "tanf", "spm_unit_capped_housing_subsidy")
+
+FLAT_TAX = "gov.contrib.ubi_center.flat_tax."
+
+
+class SyntheticMicrodata:
+    """A synthetic population of SPM units and people.
+
+    :param n_units: Number of SPM units, defaults to 100,000.
+    :type n_units: int
+    :param seed: Random seed, defaults to 0.
+    :type seed: int
+    """
+
+    def __init__(self, n_units: int = 100_000, seed: int = 0):
+        self.n_units = n_units
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        senior_unit = rng.random(n_units) < 0.2
+        self.adults = 1 + (rng.random(n_units) < 0.5)
+        self.children = np.where(
+            senior_unit,
+            0,
+            rng.choice(5, n_units, p=[0.55, 0.18, 0.16, 0.08, 0.03]),
+        )
+        self.size = self.adults + self.children
+        self.unit = np.repeat(np.arange(n_units), self.size)
+        starts = np.cumsum(self.size) - self.size
+        position = np.arange(len(self.unit)) - starts[self.unit]
+        is_adult = position < self.adults[self.unit]
+        n_people = len(self.unit)
+        self.age = np.where(
+            is_adult,
+            np.where(
+                senior_unit[self.unit],
+                rng.integers(65, 91, n_people),
+                rng.integers(18, 65, n_people),
+            ),
+            rng.integers(0, 18, n_people),
+        ).astype(np.int16)
+        weight = rng.uniform(0.5, 1.5, n_units)
+        self.weight = weight * POPULATION / (weight * self.size).sum()
+        working = is_adult & (self.age < 65)
+        employed = rng.random(n_people) < np.where(working, 0.75, 0.1)
+        self.employment_income = np.where(
+            is_adult & employed, rng.lognormal(10.5, 0.9, n_people), 0
+        )
+        self.self_employment_income = np.where(
+            is_adult & (rng.random(n_people) < 0.08),
+            rng.lognormal(10, 1.1, n_people),
+            0,
+        )
+        self.social_security = np.where(
+            self.age >= 65,
+            np.maximum(0, rng.normal(20_000, 6_000, n_people)),
+            0,
+        )
+        self.other_income = np.where(
+            rng.random(n_units) < 0.3, rng.lognormal(8.5, 1.5, n_units), 0
+        )
+        self.threshold = 13_200 * (self.adults + 0.7 * self.children) ** 0.7
+        self.state = np.array(STATES)[
+            rng.choice(
+                len(STATES), n_units, p=rng.dirichlet(np.full(len(STATES), 2))
+            )
+        ]
+        self.takes_up_tanf = rng.random(n_units) < 0.3
+        self.housing_assisted = rng.random(n_units) < 0.05
+
+    @property
+    def dataset_key(self) -> str:
+        return f"synthetic:{GENERATOR_VERSION}:{self.n_units}:{self.seed}"
+
+    def __reduce__(self):
+        # Workers regenerate the data rather than receiving its arrays.
+        return SyntheticMicrodata, (self.n_units, self.seed)
+
+    def __call__(
+        self, reform: type = None, ubi: Dict[str, float] = None
+    ) -> "SyntheticSimulation":
+        """Simulates the population under a reform.
+
+        :param reform: Reform made by ``create_parameter_reform``, defaults
+            to current law.
+        :type reform: type, optional
+        :param ubi: Annual amount per person in each AGE_BANDS band.
+        :type ubi: Dict[str, float], optional
+        :return: Synthetic simulation.
+        :rtype: SyntheticSimulation
+        """
+        parameters = getattr(reform, "parameter_values", None) or {}
+        return SyntheticSimulation(self, parameters, ubi or {})
+
+
+class SyntheticSimulation:
+    """A simulation of synthetic microdata under fixed parameter values.
+
+    :param data: Synthetic population.
+    :type data: SyntheticMicrodata
+    :param parameters: Parameter path to value.
+    :type parameters: Dict[str, Any]
+    :param ubi: Annual amount per person in each AGE_BANDS band.
+    :type ubi: Dict[str, float]
+    """
+
+    def __init__(
+        self,
+        data: SyntheticMicrodata,
+        parameters: Dict[str, Any],
+        ubi: Dict[str, float],
+    ):
+        self.data = data
+        self.parameters = parameters
+        self.ubi = ubi
+        self._cache: Dict[str, Tuple[np.ndarray, str]] = {}
+
+    def _abolished(self, path: str) -> bool:
+        return bool(self.parameters.get(path, False))
+
+    def _unit_sum(self, values: np.ndarray) -> np.ndarray:
+        return np.bincount(
+            self.data.unit, weights=values, minlength=self.data.n_units
+        )
+
+    def _compute(self, variable: str) -> Tuple[np.ndarray, str]:
+        d = self.data
+        if variable == "age":
+            return d.age, "person"
+        if variable == "people":
+            return np.ones(len(d.unit)), "person"
+        if variable == "person_weight":
+            return d.weight[d.unit], "person"
+        if variable in ("spm_unit_weight", "household_weight"):
+            return d.weight, "spm_unit"
+        if variable in ("employment_income", "self_employment_income"):
+            return getattr(d, variable), "person"
+        if variable == "is_child":
+            return d.age < 18, "person"
+        if variable == "is_wa_adult":
+            return (d.age >= 18) & (d.age < 65), "person"
+        if variable == "is_senior":
+            return d.age >= 65, "person"
+        if variable == "state_code":
+            return d.state, "spm_unit"
+        if variable == "spm_unit_spm_threshold":
+            return d.threshold, "spm_unit"
+        if variable == "spm_unit_market_income":
+            earnings = d.employment_income + d.self_employment_income
+            return self._unit_sum(earnings) + d.other_income, "spm_unit"
+        if variable == "social_security":
+            return self._unit_sum(d.social_security), "spm_unit"
+        if variable == "spm_unit_taxes":
+            return self._taxes(), "spm_unit"
+        if variable in PROGRAMS:
+            return self._program(variable), "spm_unit"
+        if variable == "spm_unit_benefits":
+            benefits = self.calc("social_security").values
+            for program in PROGRAMS:
+                benefits = benefits + self.calc(program).values
+            return benefits, "spm_unit"
+        if variable == "ubi":
+            amounts = np.zeros(len(d.age))
+            for band, (lower, upper) in AGE_BANDS.items():
+                in_band = (d.age >= lower) & (d.age < upper)
+                amounts[in_band] = self.ubi.get(
+                    band, self.parameters.get(UBI_PARAMETERS[band], 0)
+                )
+            return self._unit_sum(amounts), "spm_unit"
+        if variable in ("spm_unit_net_income", "household_net_income"):
+            return (
+                self.calc("spm_unit_market_income").values
+                + self.calc("spm_unit_benefits").values
+                - self.calc("spm_unit_taxes").values
+                + self.calc("ubi").values
+            ), "spm_unit"
+        if variable == "spm_unit_oecd_equiv_net_income":
+            equivalence = 1 + 0.5 * (d.adults - 1) + 0.3 * d.children
+            net_income = self.calc("spm_unit_net_income").values
+            return net_income / equivalence, "spm_unit"
+        if variable == "spm_unit_is_in_spm_poverty":
+            net_income = self.calc("spm_unit_net_income").values
+            return net_income < d.threshold, "spm_unit"
+        if variable == "spm_unit_is_in_deep_spm_poverty":
+            net_income = self.calc("spm_unit_net_income").values
+            return net_income < d.threshold / 2, "spm_unit"
+        raise ValueError(f"Synthetic data has no variable {variable!r}")
+
+    def _taxes(self) -> np.ndarray:
+        d = self.data
+        market_income = self.calc("spm_unit_market_income").values
+        taxes = 0.04 * market_income  # State and local.
+        if not self._abolished(FLAT_TAX + "abolish_federal_income_tax"):
+            taxable = np.maximum(0, market_income - 13_850 * d.adults)
+            income_tax = (
+                0.1 * np.minimum(taxable, 22_000 * d.adults)
+                + 0.22 * np.clip(taxable - 22_000 * d.adults, 0, 150_000)
+                + 0.35 * np.maximum(0, taxable - 172_000 * d.adults)
+            )
+            # Child tax credit, refundable up to $1,600 per child.
+            taxes += np.maximum(
+                income_tax - 2_000 * d.children, -1_600 * d.children
+            )
+        if not self._abolished(FLAT_TAX + "abolish_payroll_tax"):
+            taxes += self._unit_sum(0.0765 * d.employment_income)
+        if not self._abolished(FLAT_TAX + "abolish_self_emp_tax"):
+            taxes += self._unit_sum(0.1413 * d.self_employment_income)
+        taxes += self.parameters.get(FLAT_TAX + "rate", 0) * market_income
+        return taxes
+
+    def _program(self, program: str) -> np.ndarray:
+        d = self.data
+        resources = (
+            self.calc("spm_unit_market_income").values
+            + self.calc("social_security").values
+        )
+        if program == "snap":
+            if self._abolished("gov.usda.snap.abolish_snap"):
+                return np.zeros(d.n_units)
+            eligible = resources < 1.3 * d.threshold
+            snap = np.maximum(0, 2_800 * d.size**0.85 - 0.3 * resources)
+            if self.parameters.get(
+                "gov.usda.snap.emergency_allotment.allowed", True
+            ):
+                snap = snap + 1_140
+            return np.where(eligible, snap, 0)
+        if program == "ssi":
+            if self._abolished("gov.ssa.ssi.abolish_ssi"):
+                return np.zeros(d.n_units)
+            seniors = self._unit_sum((d.age >= 65).astype(float))
+            return np.maximum(0, seniors * 10_000 - 0.5 * resources)
+        if program == "wic":
+            if self._abolished("gov.usda.wic.abolish_wic"):
+                return np.zeros(d.n_units)
+            young = self._unit_sum((d.age < 5).astype(float))
+            return np.where(resources < 1.85 * d.threshold, 600 * young, 0)
+        if program == "tanf":
+            if self._abolished("gov.hhs.tanf.abolish_tanf"):
+                return np.zeros(d.n_units)
+            eligible = (
+                d.takes_up_tanf
+                & (d.children > 0)
+                & (resources < d.threshold / 2)
+            )
+            return np.where(eligible, 4_000, 0)
+        if self._abolished("gov.hud.abolition"):
+            return np.zeros(d.n_units)
+        eligible = d.housing_assisted & (resources < d.threshold)
+        return np.where(eligible, 8_000, 0)
+
+    def _array(self, variable: str) -> Tuple[np.ndarray, str]:
+        if variable not in self._cache:
+            self._cache[variable] = self._compute(variable)
+        return self._cache[variable]
+
+    def map_result(
+        self, values: np.ndarray, source: str, target: str, how: str = None
+    ) -> np.ndarray:
+        """Maps values between people and SPM units, summing people's values
+        within each unit and copying units' values to each member.
+
+        :param values: Values for each source entity.
+        :type values: np.ndarray
+        :param source: "person", "spm_unit" or "household".
+        :type source: str
+        :param target: "person", "spm_unit" or "household".
+        :type target: str
+        :return: Values for each target entity.
+        :rtype: np.ndarray
+        """
+        values = np.asarray(values)
+        source = "spm_unit" if source in UNIT_ENTITIES else source
+        target = "spm_unit" if target in UNIT_ENTITIES else target
+        if source == target:
+            return values
+        if source == "person":
+            return self._unit_sum(values.astype(float))
+        return values[self.data.unit]
+
+    def calc(
+        self, variable: str, map_to: str = None, period: Any = None
+    ) -> MicroSeries:
+        """Computes a variable.
+
+        :param variable: Variable name.
+        :type variable: str
+        :param map_to: Entity to map the result to, defaults to the
+            variable's own entity.
+        :type map_to: str, optional
+        :param period: Ignored; synthetic data has a single period.
+        :return: Weighted values.
+        :rtype: MicroSeries
+        """
+        values, entity = self._array(variable)
+        if map_to is not None:
+            values = self.map_result(values, entity, map_to)
+            entity = "spm_unit" if map_to in UNIT_ENTITIES else map_to
+        if entity == "person":
+            weights = self.data.weight[self.data.unit]
+        else:
+            weights = self.data.weight
+        return MicroSeries(values, weights=weights)
+
+    calculate = calc
@@ -0,0 +1,136 @@
+"""
+Inverse questions: the flat tax rate at which a result of the optimal
+blank slate policy crosses a target, found with Brent's method instead of
+a full sweep.
+
+    # Lowest rate at which the optimal UBI does not raise poverty.
+    target_flat_tax("poverty_rate_change", 0)
+    # Rate at which the mean loss falls to 5%.
+    target_flat_tax("optimal_loss", 0.05)
+"""
+
+from typing import Callable, Dict
+import numpy as np
+import pandas as pd
+from scipy.optimize import brentq
+from blank_slate_ubi_us.objectives import DEFAULT_OBJECTIVE, get_objective
+from blank_slate_ubi_us.periods import SimulationCache
+from blank_slate_ubi_us.policy import AGE_BANDS
+from blank_slate_ubi_us.store import ResultStore
+from blank_slate_ubi_us.sweep import _print_row, sweep_row
+
+TARGET_METRICS = (
+    "optimal_loss",
+    "equal_loss",
+    "poverty_rate_change",
+    "gini_change",
+)
+
+# Metrics that need a reformed simulation at every rate.
+REFORM_METRICS = ("poverty_rate_change", "gini_change")
+
+
+def target_flat_tax(
+    metric: str,
+    target: float = 0.0,
+    lower: float = 0.0,
+    upper: float = 0.5,
+    xtol: float = 0.001,
+    warm_start: bool = True,
+    store: ResultStore = None,
+    simulation: Callable = None,
+    year: int = None,
+    **solve_kwargs,
+) -> Dict:
+    """Finds the flat tax rate at which a result of the optimal policy
+    equals a target.
+
+    The metric must be above the target at one end of the bracket and
+    below it at the other. Each function evaluation is a ``sweep_row``
+    solve; the baseline simulation is shared between them and, with
+    ``warm_start``, each iterative solve starts from the amounts of the
+    nearest rate solved so far. Exact ``linprog`` solves, the default for
+    the mean percentage loss, are never warm started, so their results and
+    store keys do not depend on the order rates were searched in.
+
+    :param metric: Column of ``sweep_row`` to target, one of
+        ``TARGET_METRICS``.
+    :type metric: str
+    :param target: Value to hit, defaults to 0.
+    :type target: float
+    :param lower: Lowest rate of the bracket, defaults to 0.
+    :type lower: float
+    :param upper: Highest rate of the bracket, defaults to 0.5.
+    :type upper: float
+    :param xtol: Precision of the rate, defaults to 0.001 (0.1pp).
+    :type xtol: float
+    :param warm_start: Whether to start each iterative solve from the
+        nearest solved rate's amounts, defaults to True.
+    :type warm_start: bool
+    :param store: Result store, defaults to none.
+    :type store: ResultStore, optional
+    :param simulation: Simulation factory passed to ``BlankSlatePolicy``,
+        defaults to PolicyEngine US.
+    :type simulation: Callable, optional
+    :param year: Year to analyse, defaults to 2023 reforms at the
+        simulation's default period.
+    :type year: int, optional
+    :param solve_kwargs: Solver options passed to ``BlankSlatePolicy.solve``.
+    :return: The rate, the metric there, the tightest solved bracket around
+        the crossing, the number of solves, and every solved row.
+    :rtype: Dict
+    """
+    if metric not in TARGET_METRICS:
+        raise ValueError(
+            f"Unknown metric {metric!r}, expected one of "
+            f"{', '.join(TARGET_METRICS)}"
+        )
+    method = solve_kwargs.get("method", "auto")
+    if method == "auto":
+        method = get_objective(
+            solve_kwargs.get("objective", DEFAULT_OBJECTIVE)
+        ).method()
+    warm_start = warm_start and method != "linprog"
+    factory = SimulationCache(simulation)
+    rows = {}
+
+    def distance(rate: float) -> float:
+        rate = float(rate)
+        if rate not in rows:
+            options = dict(solve_kwargs)
+            if warm_start and rows:
+                nearest = rows[min(rows, key=lambda r: abs(r - rate))]
+                options["x0"] = [nearest[band] for band in list(AGE_BANDS)[:4]]
+            rows[rate] = sweep_row(
+                rate,
+                metric in REFORM_METRICS,
+                store,
+                simulation=factory,
+                year=year,
+                **options,
+            )
+            _print_row(rows[rate])
+        return rows[rate][metric] - target
+
+    if np.sign(distance(lower)) == np.sign(distance(upper)):
+        raise ValueError(
+            f"{metric} does not cross {target} between rates {lower} and "
+            f"{upper}: it is {rows[float(lower)][metric]} and "
+            f"{rows[float(upper)][metric]}."
+        )
+    rate = brentq(distance, lower, upper, xtol=xtol)
+    value = distance(rate) + target
+    df = pd.DataFrame(rows.values()).sort_values("flat_tax")
+    side = np.sign(df[metric].values - target)
+    # A noisy metric can cross more than once; take the crossing found.
+    crossings = np.flatnonzero(side[:-1] != side[1:])
+    rates = df.flat_tax.values
+    crossing = crossings[np.argmin(np.abs(rates[crossings] - rate))]
+    return dict(
+        flat_tax=float(rate),
+        value=float(value),
+        target=target,
+        bracket=tuple(map(float, rates[crossing : crossing + 2])),
+        evaluations=len(rows),
+        rows=df.reset_index(drop=True),
+    )
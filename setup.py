@@ -8,10 +8,14 @@ setup(
         "pandas",
         "numpy",
         "scipy",
+        "microdf-python",
         "openfisca-us",
         "plotly",
         "ubicenter",
         "black",
         "argparse",
     ],
+    entry_points={
+        "console_scripts": ["blank-slate=blank_slate_ubi_us.cli:main"],
+    },
 )
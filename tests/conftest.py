@@ -0,0 +1,13 @@
+import pytest
+from blank_slate_ubi_us.policy import BlankSlatePolicy
+from blank_slate_ubi_us.synthetic import SyntheticMicrodata
+
+
+@pytest.fixture(scope="session")
+def microdata():
+    return SyntheticMicrodata(n_units=2_000)
+
+
+@pytest.fixture
+def policy(microdata):
+    return BlankSlatePolicy(0.4, simulation=microdata)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+go = pytest.importorskip("plotly.graph_objects")
+
+from blank_slate_ubi_us.charts.artifacts import ChartBundle
+
+
+def _figure(title):
+    x = np.arange(100)
+    return go.Figure(
+        go.Scatter(x=x, y=np.sqrt(x)),
+        layout=dict(title=title, template="plotly_white"),
+    )
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_chart_bundle_round_trip(tmp_path, compress):
+    figures = dict(a=_figure("A"), b=_figure("B"))
+    bundle = ChartBundle(figures)
+    # Both charts share one layout template.
+    assert len(bundle.templates) == 1
+    path = tmp_path / "bundle.json.gz"
+    bundle.save(str(path), compress)
+    loaded = ChartBundle.load(str(path))
+    for name, figure in figures.items():
+        unpacked = loaded.to_json(name)
+        # Traces as plotly holds them, arrays decoded, since to_dict encodes
+        # arrays as typed buffers.
+        traces = [trace.to_plotly_json() for trace in figure.data]
+        assert len(unpacked["data"]) == len(traces)
+        for trace, original in zip(unpacked["data"], traces):
+            assert set(trace) == set(original)
+            for key, value in original.items():
+                if isinstance(value, np.ndarray):
+                    np.testing.assert_array_equal(trace[key], value)
+                else:
+                    assert trace[key] == value
+        assert unpacked["layout"] == figure.to_dict()["layout"]
@@ -0,0 +1,91 @@
+from functools import partial
+import numpy as np
+import pandas as pd
+import pytest
+from blank_slate_ubi_us.aggregation import GroupAggregator, quantile_rank
+from blank_slate_ubi_us.chunked import (
+    ArraySource,
+    ChunkedPolicy,
+    chunked_poverty_by_age,
+    chunked_quantile_aggregate,
+    write_arrays,
+)
+from blank_slate_ubi_us.poverty import poverty_by_age
+
+AMOUNTS = dict(
+    young_child=3000, older_child=2500, young_adult=2000, adult=2000
+)
+
+
+def test_write_arrays_round_trip(policy, tmp_path):
+    write_arrays(policy.df, tmp_path)
+    source = ArraySource.from_directory(tmp_path, chunk_size=300)
+    assert set(source.columns) == set(policy.df.columns)
+    assert "spm_threshold" in source.columns
+    assert len(source) == len(policy.df)
+
+
+def test_chunked_poverty_matches_in_memory(policy, tmp_path):
+    write_arrays(policy.df, tmp_path)
+    source = ArraySource.from_directory(tmp_path, chunk_size=300)
+    pd.testing.assert_frame_equal(
+        chunked_poverty_by_age(source),
+        poverty_by_age(policy.baseline),
+        check_exact=False,
+        rtol=1e-9,
+    )
+
+
+def test_chunked_policy_matches_in_memory(policy, tmp_path):
+    write_arrays(policy.df, tmp_path)
+    chunked = ChunkedPolicy(
+        ArraySource.from_directory(tmp_path, chunk_size=300), 0.4
+    )
+    assert np.isclose(chunked.ubi_funding, policy.ubi_funding, rtol=1e-9)
+    amounts = AMOUNTS.values()
+    assert np.isclose(
+        chunked.get_senior_amount(*amounts),
+        policy.get_senior_amount(*amounts),
+        rtol=1e-9,
+    )
+    assert np.isclose(
+        chunked.mean_percentage_loss(*amounts),
+        policy.mean_percentage_loss(*amounts),
+        rtol=1e-9,
+    )
+    reformed = chunked_poverty_by_age(
+        chunked.source, partial(chunked.chunk_net_income, **AMOUNTS)
+    )
+    net_income = policy.net_income(*amounts).values
+    weight = policy.df.weight * policy.df.count_person
+    poverty_rate = (weight * (net_income < policy.df.spm_threshold)).sum()
+    assert np.isclose(
+        reformed.poverty_rate["All"], poverty_rate / weight.sum(), rtol=1e-9
+    )
+
+
+@pytest.mark.parametrize("ties", [False, True])
+def test_chunked_quantile_aggregate_matches_in_memory(ties):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(
+        dict(
+            income=rng.lognormal(10, 1, 5_000),
+            weight=rng.uniform(1, 100, 5_000),
+        )
+    )
+    if ties:
+        # Many rows tied at a boundary, as zero incomes are.
+        frame.loc[frame.index < 1_500, "income"] = 0
+    source = ArraySource.from_frame(frame, chunk_size=700)
+
+    def ratio(chunk):
+        return chunk["income"] / 1e3
+
+    result = chunked_quantile_aggregate(
+        source, "income", dict(income="income", ratio=ratio)
+    )
+    decile = quantile_rank(frame.income.values, frame.weight.values)
+    expected = GroupAggregator(
+        decile - 1, frame.weight.values, np.arange(1, 11)
+    ).aggregate(dict(income=frame.income.values, ratio=frame.income / 1e3))
+    pd.testing.assert_frame_equal(result, expected, check_exact=False)
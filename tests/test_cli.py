@@ -0,0 +1,71 @@
+import json
+import pandas as pd
+import pytest
+from blank_slate_ubi_us import policy as policy_module
+from blank_slate_ubi_us.cli import build_parser, main
+
+
+@pytest.fixture(autouse=True)
+def synthetic(monkeypatch, microdata):
+    # Commands build policies on the default simulation.
+    monkeypatch.setattr(policy_module, "Microsimulation", microdata)
+
+
+def test_solve_writes_the_row_and_solver_options(tmp_path):
+    path = tmp_path / "solve.json"
+    main(["solve", "--rate", "0.4", "-o", str(path)])
+    row = json.loads(path.read_text())
+    assert row["flat_tax"] == 0.4
+    assert row["optimal_loss"] <= row["equal_loss"]
+    assert row["senior"] >= 0
+    assert row["solver"]["objective"] == "mean_percentage_loss"
+
+
+def test_sweep_writes_a_row_per_rate(tmp_path):
+    path = tmp_path / "sweep.csv"
+    main(
+        [
+            "sweep",
+            "--start",
+            "0.3",
+            "--stop",
+            "0.4",
+            "--step",
+            "0.05",
+            "--no-metrics",
+            "--cache-dir",
+            str(tmp_path),
+            "-o",
+            str(path),
+        ]
+    )
+    df = pd.read_csv(path)
+    assert list(df.flat_tax) == pytest.approx([0.3, 0.35, 0.4])
+    assert (tmp_path / "results.db").exists()
+
+
+def test_frontier_writes_feasible_amounts(tmp_path):
+    path = tmp_path / "frontier.csv"
+    main(
+        [
+            "frontier",
+            "--population",
+            "16",
+            "--generations",
+            "5",
+            "--seed",
+            "0",
+            "-o",
+            str(path),
+        ]
+    )
+    df = pd.read_csv(path)
+    assert len(df) > 0
+    assert (df.senior >= 0).all()
+
+
+def test_parser_rejects_unknown_choices(capsys):
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["solve", "--objective", "unknown"])
+    with pytest.raises(SystemExit, match="--adaptive"):
+        main(["sweep", "--adaptive", "--years", "2024", "--no-metrics"])
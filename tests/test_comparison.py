@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+# The chart helpers the comparison charts share need the PolicyEngine
+# chart stack.
+pytest.importorskip("openfisca_tools")
+pytest.importorskip("policyengine")
+
+from blank_slate_ubi_us.aggregation import quantile_rank
+from blank_slate_ubi_us.charts.comparison import ReformComparison
+from blank_slate_ubi_us.charts.config import USResultsConfig
+
+
+@pytest.fixture
+def comparison(policy):
+    policy.solve()
+    return ReformComparison(
+        policy.baseline,
+        dict(
+            optimal=policy.net_income(*policy.amounts().values()).values,
+            funded=policy.df.funded_net_income.values,
+        ),
+        USResultsConfig,
+    )
+
+
+def test_decile_data_matches_direct_sums(comparison, policy):
+    df = comparison.decile_data()
+    assert len(df) == 20
+    baseline = policy.baseline
+    income = baseline.calc("spm_unit_oecd_equiv_net_income")
+    people = baseline.calc("people", map_to="spm_unit").values
+    decile = quantile_rank(income.values, income.weights.values * people)
+    gain = policy.df.funded_net_income - policy.df.baseline_net_income
+    in_decile = decile == 1
+    weight = policy.df.weight[in_decile]
+    expected = (gain[in_decile] * weight).sum() / (
+        policy.df.baseline_net_income[in_decile] * weight
+    ).sum()
+    funded = df[df.reform == "funded"].set_index("Decile")
+    assert funded["Relative change"][1] == pytest.approx(expected)
+
+
+def test_outcome_shares_sum_to_one(comparison):
+    for df, group in (
+        (comparison.intra_decile_data(), "decile"),
+        (comparison.program_data(), "program"),
+    ):
+        totals = df.groupby(["reform", group]).fraction.sum()
+        assert np.allclose(totals.dropna(), 1)
+
+
+def test_state_gains_add_up(comparison, policy):
+    df = comparison.state_data()
+    gain = policy.df.funded_net_income - policy.df.baseline_net_income
+    funded = df[df.reform == "funded"]
+    assert funded["Net gain"].sum() == pytest.approx(
+        (gain * policy.df.weight).sum()
+    )
+
+
+def test_age_data_covers_every_reform(comparison):
+    df = comparison.age_data()
+    assert set(df.reform) == {"optimal", "funded"}
+    # The funding reform alone leaves people worse off on average.
+    assert df[df.reform == "funded"]["Average increase"].mean() < 0
@@ -0,0 +1,53 @@
+import json
+import pytest
+
+# Importing the exporter imports every chart builder.
+for module in (
+    "openfisca_tools",
+    "policyengine",
+    "policyengine_us",
+    "ubicenter",
+):
+    pytest.importorskip(module)
+
+from blank_slate_ubi_us.charts.export import (
+    MANIFEST,
+    artifact_name,
+    export_charts,
+    input_key,
+    read_manifest,
+)
+
+
+def test_artifact_names_include_the_year():
+    assert artifact_name(0.4) == "flat_tax_0.4000.json.gz"
+    assert artifact_name(0.4, 2025) == "year_2025_flat_tax_0.4000.json.gz"
+
+
+def test_input_key_depends_on_every_input():
+    keys = {
+        input_key(0.4, ["budget"]),
+        input_key(0.41, ["budget"]),
+        input_key(0.4, ["budget", "age"]),
+        input_key(0.4, ["budget"], dict(objective="poverty_rate")),
+        input_key(0.4, ["budget"], year=2025),
+    }
+    assert len(keys) == 5
+    # Chart order does not matter, and "auto" is keyed as the method it
+    # resolves to.
+    assert input_key(0.4, ["age", "budget"]) == input_key(
+        0.4, ["budget", "age"]
+    )
+    assert input_key(0.4, ["budget"]) == input_key(
+        0.4, ["budget"], dict(method="linprog")
+    )
+
+
+def test_export_skips_up_to_date_artifacts(tmp_path):
+    assert read_manifest(str(tmp_path)) == {}
+    name = artifact_name(0.4)
+    (tmp_path / name).write_bytes(b"")
+    manifest = {name: dict(input_key=input_key(0.4, ["budget"]))}
+    (tmp_path / MANIFEST).write_text(json.dumps(manifest))
+    # Nothing to rebuild, so no worker or simulation is started.
+    assert export_charts([0.4], str(tmp_path), ["budget"]) == manifest
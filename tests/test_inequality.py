@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from microdf import MicroSeries
+from blank_slate_ubi_us.aggregation import quantile_rank
+from blank_slate_ubi_us.inequality import IncomeDistribution
+
+
+@pytest.fixture
+def income(microdata):
+    return microdata().calc("spm_unit_net_income", map_to="person")
+
+
+def test_gini_matches_microdf(income):
+    distribution = IncomeDistribution.from_microseries(income)
+    assert np.isclose(distribution.gini(), income.gini(), rtol=1e-9)
+
+
+def test_quantile_rank_matches_microdf():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(10, 1, 5_000)
+    weights = rng.uniform(0.5, 1.5, 5_000)
+    series = MicroSeries(values, weights=weights)
+    np.testing.assert_array_equal(
+        quantile_rank(values, weights), series.decile_rank().values
+    )
+    np.testing.assert_array_equal(
+        quantile_rank(values, weights, 100), series.percentile_rank().values
+    )
@@ -0,0 +1,63 @@
+import json
+import numpy as np
+from blank_slate_ubi_us.instrumentation import SolverTrace, timed
+
+
+def test_timed_accumulates():
+    timings = {}
+    for _ in range(2):
+        with timed(timings, "stage"):
+            pass
+    assert set(timings) == {"stage"}
+    assert timings["stage"] >= 0
+
+
+def test_trace_counts_single_and_batched_evaluations(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    trace = SolverTrace(path=str(path))
+    objective = trace.objective(lambda *x: np.sum(x, axis=0))
+    objective(np.array([1.0, 2.0]))
+    assert not trace.record()
+    objective(np.array([[0.0, 5.0], [1.0, 1.0]]))
+    trace.record()
+    summary = trace.to_dict()
+    assert summary["evaluations"] == 3
+    assert summary["n_generations"] == 2
+    first, second = summary["generations"]
+    assert first["best_loss"] == 3
+    assert second["best_loss"] == 1
+    assert second["mean_loss"] == 3.5
+    assert second["spread"] == 2.5
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines == summary["generations"]
+
+
+def test_trace_stops_on_a_plateau():
+    trace = SolverTrace(plateau=2, min_improvement=0.1)
+    objective = trace.objective(lambda x: x)
+    stops = []
+    for loss in (5.0, 4.0, 3.95, 3.92, 3.9):
+        objective([loss])
+        stops.append(trace.record())
+    assert stops == [False, False, False, True, True]
+    assert trace.to_dict()["stopped_early"]
+
+
+def test_trace_of_a_solve(policy):
+    result = policy.solve(
+        method="differential_evolution",
+        maxiter=5,
+        seed=0,
+        polish=False,
+        return_loss=True,
+        return_trace=True,
+    )
+    trace = result["trace"]
+    best = [entry["best_loss"] for entry in trace["generations"]]
+    assert best == sorted(best, reverse=True)
+    assert best[-1] <= result["loss"] + 1e-12
+    evaluations = [entry["evaluations"] for entry in trace["generations"]]
+    assert evaluations == sorted(evaluations)
+    # Every generation evaluates candidates.
+    assert len(set(evaluations)) == len(evaluations)
+    assert trace["evaluations"] >= evaluations[-1]
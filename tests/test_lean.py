@@ -0,0 +1,56 @@
+import gc
+import weakref
+import pytest
+from blank_slate_ubi_us.periods import SimulationCache
+from blank_slate_ubi_us.policy import (
+    BlankSlatePolicy,
+    create_baseline_reform,
+    create_funding_reform,
+)
+
+
+@pytest.fixture
+def built(microdata):
+    # Weak references to every simulation the factory builds.
+    references = []
+
+    def factory(reform=None):
+        simulation = microdata(reform)
+        references.append(weakref.ref(simulation))
+        return simulation
+
+    factory.references = references
+    return factory
+
+
+def test_lean_policy_releases_its_simulations(built):
+    policy = BlankSlatePolicy(0.4, lean=True, simulation=built)
+    gc.collect()
+    assert len(built.references) == 2
+    assert all(reference() is None for reference in built.references)
+    assert policy.memory_report()["simulations_held"] == []
+
+
+def test_lean_policies_release_simulations_from_a_cache(built):
+    cache = SimulationCache(built)
+    policies = [
+        BlankSlatePolicy(rate, lean=True, simulation=cache)
+        for rate in (0.3, 0.4)
+    ]
+    gc.collect()
+    assert create_baseline_reform() not in cache
+    assert create_funding_reform(0.4) not in cache
+    assert all(reference() is None for reference in built.references)
+    assert policies[0].memory_report()["simulations_held"] == []
+    # The baseline arrays are kept, so the second policy only simulated its
+    # funding reform.
+    assert len(built.references) == 3
+
+
+def test_lean_policy_solves_as_a_full_one(microdata):
+    lean = BlankSlatePolicy(0.4, lean=True, simulation=microdata)
+    full = BlankSlatePolicy(0.4, simulation=microdata)
+    assert lean.ubi_funding == pytest.approx(full.ubi_funding, rel=1e-6)
+    lean_amounts = lean.solve(return_amounts=True)["amounts"]
+    full_amounts = full.solve(return_amounts=True)["amounts"]
+    assert lean_amounts == pytest.approx(full_amounts, abs=1)
@@ -0,0 +1,14 @@
+import pytest
+from blank_slate_ubi_us.objectives import OBJECTIVES
+
+
+@pytest.mark.parametrize("objective", OBJECTIVES)
+def test_solve_is_feasible_and_beats_equal_amounts(policy, objective):
+    result = policy.solve(
+        objective=objective, maxiter=50, seed=0, return_amounts=True
+    )
+    amounts = list(result["amounts"].values())
+    assert min(amounts) >= 0
+    assert result["unspent_funding"] >= 0
+    evaluate = policy.objective_function(objective)
+    assert evaluate(*amounts) <= evaluate(*[policy.equal_amount()] * 4)
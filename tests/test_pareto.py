@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from blank_slate_ubi_us.policy import BlankSlatePolicy
+from blank_slate_ubi_us.pareto import (
+    OBJECTIVES,
+    non_dominated,
+    pareto_frontier,
+)
+
+
+def test_non_dominated():
+    points = np.array([[1, 3], [2, 2], [3, 1], [2, 3], [3, 3]])
+    assert list(non_dominated(points)) == [True, True, True, False, False]
+
+
+@pytest.fixture(scope="module")
+def frontier(microdata):
+    policy = BlankSlatePolicy(0.4, simulation=microdata)
+    return policy, pareto_frontier(
+        policy, population=32, generations=30, seed=0
+    )
+
+
+def test_frontier_is_feasible(frontier):
+    policy, df = frontier
+    assert (df[list(policy.amounts())] >= 0).all().all()
+    spent = df[list(policy.amounts())].values @ policy.band_totals()
+    assert spent == pytest.approx(np.full(len(df), policy.ubi_funding))
+
+
+def test_frontier_is_non_dominated_and_sorted(frontier):
+    policy, df = frontier
+    points = df[list(OBJECTIVES)].values
+    assert len(df) > 1
+    assert non_dominated(points).all()
+    assert df.mean_percentage_loss.is_monotonic_increasing
+    assert df.poverty_rate.is_monotonic_decreasing
+
+
+def test_frontier_improves_on_equal_amounts(frontier):
+    policy, df = frontier
+    equal = policy.objectives([[policy.equal_amount()] * 4])[0]
+    points = df[list(OBJECTIVES)].values
+    assert not (
+        (equal <= points).all(axis=1) & (equal < points).any(axis=1)
+    ).any()
+    assert (points <= equal).all(axis=1).any()
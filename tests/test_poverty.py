@@ -0,0 +1,25 @@
+import numpy as np
+from blank_slate_ubi_us.poverty import AGE_GROUPS, poverty_by_age
+
+
+def test_poverty_by_age_matches_person_rates(microdata):
+    simulation = microdata()
+    result = poverty_by_age(simulation)
+    age = simulation.calc("age")
+    weight = age.weights.values
+    for variable, column in [
+        ("spm_unit_is_in_spm_poverty", "poverty_rate"),
+        ("spm_unit_is_in_deep_spm_poverty", "deep_poverty_rate"),
+    ]:
+        poor = simulation.calc(variable, map_to="person").values
+        groups = dict(AGE_GROUPS, All=(0, np.inf))
+        for name, (lower, upper) in groups.items():
+            members = (age.values >= lower) & (age.values < upper)
+            assert np.isclose(
+                result.population[name], weight[members].sum(), rtol=1e-9
+            )
+            assert np.isclose(
+                result[column][name],
+                np.average(poor[members], weights=weight[members]),
+                rtol=1e-9,
+            )
@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+from blank_slate_ubi_us.periods import SimulationCache, reform_period
+from blank_slate_ubi_us.policy import (
+    UBI_PARAMETERS,
+    BlankSlatePolicy,
+    create_solved_reform,
+    funding_parameters,
+    funding_spec,
+)
+from blank_slate_ubi_us.reforms import ReformSpec
+
+
+def test_key_ignores_order():
+    values = funding_parameters(0.4)
+    reversed_values = dict(reversed(list(values.items())))
+    assert (
+        ReformSpec.from_values(values, 2025).key
+        == ReformSpec.from_values(reversed_values, 2025).key
+    )
+
+
+def test_key_depends_on_values_and_year():
+    keys = {
+        funding_spec(0.4).key,
+        funding_spec(0.41).key,
+        funding_spec(0.4, year=2025).key,
+        funding_spec(0.4, {"gov.usda.wic.abolish_wic": False}).key,
+    }
+    assert len(keys) == 4
+    # No year means the default year.
+    assert funding_spec(0.4).key == funding_spec(0.4, year=2023).key
+
+
+def test_key_is_stable_across_processes():
+    code = (
+        "from blank_slate_ubi_us.policy import funding_spec;"
+        "print(funding_spec(0.4, year=2025).key)"
+    )
+    keys = {
+        subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=dict(os.environ, PYTHONHASHSEED=str(seed)),
+        ).stdout.strip()
+        for seed in (1, 2)
+    }
+    assert keys == {funding_spec(0.4, year=2025).key}
+
+
+def test_solved_reform_is_specific_to_its_year():
+    reform = dict(funding_parameters(0.4), senior_bi_amount=1_000)
+    solved = create_solved_reform(reform, 2024)
+    assert solved.period == reform_period(2024)
+    assert solved.parameter_values[UBI_PARAMETERS["senior"]] == 1_000
+    assert create_solved_reform(reform, 2025) is not create_solved_reform(
+        reform, 2024
+    )
+
+
+def test_reformed_simulation_pays_the_solved_amounts(microdata):
+    policy = BlankSlatePolicy(
+        0.4, simulation=SimulationCache(microdata), year=2025
+    )
+    reform = policy.solve()
+    reformed = policy.reformed_simulation(reform)
+    assert reformed.year == 2025
+    amounts = np.array(list(policy.amounts().values()))
+    assert reformed.calc("ubi").sum() == pytest.approx(
+        policy.band_totals() @ amounts
+    )
+    # Built once by the policy's SimulationCache.
+    assert policy.reformed_simulation(reform).simulation is reformed.simulation
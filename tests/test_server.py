@@ -0,0 +1,100 @@
+import asyncio
+import json
+import pytest
+from blank_slate_ubi_us.server import SolveServer, _reform_key, _stream
+
+
+@pytest.fixture(scope="module")
+def server(microdata):
+    server = SolveServer(workers=2, simulation=microdata)
+    yield server
+    server.close()
+
+
+class Writer:
+    # Collects what a handler writes.
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data: bytes) -> None:
+        self.data += data
+
+    async def drain(self) -> None:
+        pass
+
+
+def ndjson_events(data: bytes) -> list:
+    # Events of a chunked ndjson response.
+    _, body = data.split(b"\r\n\r\n", 1)
+    events = []
+    while True:
+        size, body = body.split(b"\r\n", 1)
+        if int(size, 16) == 0:
+            return events
+        events.append(json.loads(body[: int(size, 16)]))
+        body = body[int(size, 16) + 2 :]
+
+
+def test_requests_for_a_reform_share_a_worker(server):
+    request = dict(flat_tax_rate=0.4, year=2024)
+    executor = server._executor(request)
+    assert (
+        executor
+        is server.executors[
+            int(_reform_key(request), 16) % len(server.executors)
+        ]
+    )
+    # Solve options do not change the funding reform.
+    assert server._executor(dict(request, method="powell")) is executor
+    others = {
+        id(server._executor(dict(flat_tax_rate=rate / 100)))
+        for rate in range(20, 50)
+    }
+    assert len(others) == len(server.executors)
+
+
+def test_identical_solves_are_coalesced(server):
+    async def solve_twice():
+        request = dict(flat_tax_rate=0.4)
+        first = server.solve_job(request)
+        second = server.solve_job(dict(request, stream=True))
+        assert second is first
+        assert server.status()["in_flight"] == 1
+        return await first.result
+
+    coalesced = server.coalesced
+    result = asyncio.run(solve_twice())
+    assert server.coalesced == coalesced + 1
+    assert server.status()["in_flight"] == 0
+    assert result["loss"] <= result["equal_loss"]
+    assert min(result["amounts"].values()) >= 0
+
+
+def test_solve_streams_progress_then_the_result(server):
+    async def stream():
+        job = server.solve_job(
+            dict(flat_tax_rate=0.3, method="powell", maxiter=3)
+        )
+        writer = Writer()
+        await _stream(writer, job.subscribe())
+        return writer.data
+
+    data = asyncio.run(stream())
+    assert b"Content-Type: application/x-ndjson" in data
+    events = ndjson_events(data)
+    assert events[-1]["event"] == "result"
+    assert events[0]["event"] == "progress"
+    iterations = [e["iteration"] for e in events if e["event"] == "progress"]
+    assert iterations == list(range(1, len(iterations) + 1))
+
+
+def test_evaluate_returns_the_residual_senior_amount(server):
+    amounts = dict(
+        young_child=1e3, older_child=2e3, young_adult=3e3, adult=4e3
+    )
+    result = asyncio.run(
+        server.evaluate(dict(flat_tax_rate=0.4, amounts=amounts))
+    )
+    assert result["amounts"]["adult"] == 4e3
+    assert result["amounts"]["senior"] > 0
+    assert set(result["by_band"]) >= set(amounts)
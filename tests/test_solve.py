@@ -0,0 +1,104 @@
+import numpy as np
+from blank_slate_ubi_us.policy import AGE_BANDS, BlankSlatePolicy
+from blank_slate_ubi_us.store import ResultStore
+
+
+def test_linear_program_beats_differential_evolution(policy):
+    exact = policy.solve(method="linprog", polish=False, return_loss=True)
+    search = policy.solve(
+        method="differential_evolution",
+        maxiter=20,
+        seed=0,
+        polish=False,
+        return_loss=True,
+    )
+    assert exact["loss"] <= search["loss"] + 1e-12
+    assert np.isclose(exact["loss"], search["loss"], rtol=0.05)
+
+
+def test_polish_stays_within_funding(policy):
+    result = policy.solve(return_amounts=True, return_loss=True)
+    amounts = result["amounts"]
+    assert all(float(amount).is_integer() for amount in amounts.values())
+    seniors = (policy.df.count_senior * policy.df.weight).sum()
+    assert 0 <= result["unspent_funding"] < seniors
+    spent = sum(
+        amount * (policy.df[f"count_{band}"] * policy.df.weight).sum()
+        for band, amount in amounts.items()
+    )
+    assert np.isclose(
+        spent + result["unspent_funding"], policy.ubi_funding, rtol=1e-12
+    )
+    assert np.isclose(
+        result["loss"], policy.mean_percentage_loss(*amounts.values())
+    )
+
+
+def test_store_hits(policy, microdata, tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    first = policy.solve(store=store, return_amounts=True, return_trace=True)
+    assert not first["trace"]["from_store"]
+    assert len(store) == 1
+    again = BlankSlatePolicy(0.4, simulation=microdata).solve(
+        store=store, return_amounts=True, return_trace=True
+    )
+    assert again["trace"]["from_store"]
+    assert again["amounts"] == first["amounts"]
+    # A warm start does not change an exact solve, or its key.
+    warm = policy.solve(
+        store=store, x0=[1000] * 4, return_amounts=True, return_trace=True
+    )
+    assert warm["trace"]["from_store"]
+    assert len(store) == 1
+
+
+def test_reweight_matches_fresh_policy(policy, microdata):
+    weights = policy.df.weight.values * np.random.default_rng(1).uniform(
+        0.8, 1.2, len(policy.df)
+    )
+    reweighted = policy.reweight(weights, return_amounts=True)
+    fresh = BlankSlatePolicy(0.4, simulation=microdata)
+    fresh.df["weight"] = weights
+    fresh.ubi_funding = fresh.get_ubi_funding()
+    assert reweighted["amounts"] == fresh.solve(return_amounts=True)["amounts"]
+
+
+def test_reweight_solves_unsolved_policy(policy):
+    assert policy.young_child == 0
+    reform = policy.reweight(policy.df.weight.values)
+    assert reform is not None
+    assert any(policy.amounts()[band] for band in AGE_BANDS)
+
+
+def test_sensitivities_are_one_sided_derivatives(policy):
+    policy.solve()
+    x = list(policy.amounts().values())[:4]
+    sensitivities = policy.sensitivities()
+    objective = policy.objective_function("mean_percentage_loss")
+    loss, h = objective(*x), 0.01
+    for i, band in enumerate(list(AGE_BANDS)[:4]):
+        up, down = list(x), list(x)
+        up[i] += h
+        down[i] -= h
+        step = sensitivities.step[band] / h
+        assert np.isclose(
+            (objective(*up) - loss) * step, sensitivities.increase[band]
+        )
+        assert np.isclose(
+            (objective(*down) - loss) * step, sensitivities.decrease[band]
+        )
+    # More funding, through the senior amount, lowers the loss.
+    assert sensitivities.marginal["funding"] < 0
+
+
+def test_optimum_sensitivities_confirm_it(policy):
+    trace = policy.solve(return_trace=True)["trace"]
+    for band in list(AGE_BANDS)[:4]:
+        row = trace["sensitivities"][band]
+        assert row["increase"] >= -1e-12
+        assert row["decrease"] >= -1e-12
+
+
+def test_unpolished_solve_spends_all_funding(policy):
+    result = policy.solve(polish=False, return_amounts=True)
+    assert np.isclose(result["unspent_funding"], 0, atol=1e-3)
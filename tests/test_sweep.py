@@ -0,0 +1,59 @@
+import numpy as np
+from blank_slate_ubi_us.sweep import (
+    adaptive_sweep,
+    interval_errors,
+    sweep_row,
+)
+
+
+def test_interval_errors_vanish_on_lines():
+    x = np.linspace(0, 0.5, 6)
+    assert np.allclose(interval_errors(x, 3 * x + 1), 0)
+    assert np.all(interval_errors(x, x**2) > 0)
+    assert np.all(np.isinf(interval_errors(x[:2], x[:2])))
+
+
+def sweep(microdata, **kwargs):
+    return adaptive_sweep(
+        start=0.2,
+        stop=0.5,
+        coarse_step=0.15,
+        min_step=0.025,
+        columns=("optimal_loss",),
+        metrics=False,
+        simulation=microdata,
+        **kwargs,
+    )
+
+
+def test_adaptive_sweep_refines_on_the_grid(microdata):
+    df = sweep(microdata, tolerance=0)
+    assert df.refinement.max() > 0
+    assert list(df.flat_tax) == sorted(set(df.flat_tax))
+    steps = (df.flat_tax - 0.2) / 0.025
+    assert np.allclose(steps, np.round(steps))
+    # Coarse rates are solved first.
+    coarse = df[df.refinement == 0].flat_tax
+    assert np.allclose(coarse, [0.2, 0.35, 0.5])
+
+
+def test_adaptive_sweep_stops_at_tolerance(microdata):
+    df = sweep(microdata, tolerance=np.inf)
+    assert len(df) == 3
+    assert (df.refinement == 0).all()
+
+
+def test_adaptive_sweep_keeps_to_its_budget(microdata):
+    assert len(sweep(microdata, tolerance=0, budget=5)) == 5
+    # Two rates are solved however small the budget, and never refined.
+    df = sweep(microdata, tolerance=0, budget=1)
+    assert list(df.flat_tax) == [0.2, 0.35]
+    assert (df.refinement == 0).all()
+
+
+def test_sweep_row_metrics_come_from_the_solved_reform(microdata):
+    row = sweep_row(0.4, simulation=microdata, year=2025)
+    assert row["year"] == 2025
+    # The UBI cuts poverty and inequality in the synthetic population.
+    assert row["poverty_rate_change"] < 0
+    assert row["gini_change"] < 0
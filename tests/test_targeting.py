@@ -0,0 +1,35 @@
+import pytest
+from blank_slate_ubi_us.sweep import sweep_row
+from blank_slate_ubi_us.targeting import target_flat_tax
+
+
+def test_target_flat_tax_finds_the_crossing(microdata):
+    low, high = (
+        sweep_row(rate, metrics=False, simulation=microdata)["optimal_loss"]
+        for rate in (0.3, 0.5)
+    )
+    target = (low + high) / 2
+    result = target_flat_tax(
+        "optimal_loss",
+        target,
+        lower=0.3,
+        upper=0.5,
+        xtol=0.005,
+        simulation=microdata,
+    )
+    assert 0.3 < result["flat_tax"] < 0.5
+    lower, upper = result["bracket"]
+    assert lower <= result["flat_tax"] <= upper
+    assert upper - lower <= 0.05
+    rows = result["rows"].set_index("flat_tax").optimal_loss
+    assert (rows[lower] - target) * (rows[upper] - target) <= 0
+    assert result["evaluations"] == len(result["rows"])
+
+
+def test_target_flat_tax_needs_a_crossing(microdata):
+    with pytest.raises(ValueError, match="does not cross"):
+        target_flat_tax(
+            "optimal_loss", -1, lower=0.3, upper=0.5, simulation=microdata
+        )
+    with pytest.raises(ValueError, match="Unknown metric"):
+        target_flat_tax("unknown", simulation=microdata)